@@ -23,6 +23,8 @@ This file contains Complemake and other core classes.
 
 from __future__ import absolute_import
 
+import hashlib
+import io
 import os
 import platform as pyplatform
 import sys
@@ -87,6 +89,24 @@ def get_user_apps_home():
 
 _os_is_windows = None
 
+def hash_file(file_path):
+   """Computes the SHA-1 hash of a file’s contents, reading it one chunk at a time.
+
+   str file_path
+      Path to the file.
+   str return
+      Hash of the file, as a hexadecimal string.
+   """
+
+   hash = hashlib.sha1()
+   with io.open(file_path, 'rb') as file:
+      while True:
+         chunk = file.read(1024 * 1024)
+         if not chunk:
+            break
+         hash.update(chunk)
+   return hash.hexdigest()
+
 def os_is_windows():
    """Returns True if Complemake is running under Windows, or False otherwise.
 
@@ -111,3 +131,96 @@ def makedirs(path):
    except OSError:
       if not os.path.isdir(path):
          raise
+
+def replace_file(src_file_path, dst_file_path):
+   """Implementation of os.replace() for both Python 2.7 and 3.x. Atomic, except on Windows under Python 2.7.
+
+   str src_file_path
+      Path to the file to rename.
+   str dst_file_path
+      Path to the file to replace, if it exists.
+   """
+
+   if hasattr(os, 'replace'):
+      os.replace(src_file_path, dst_file_path)
+   else:
+      if os_is_windows() and os.path.exists(dst_file_path):
+         os.unlink(dst_file_path)
+      os.rename(src_file_path, dst_file_path)
+
+def which(file_name):
+   """Returns the path to the executable that would be run for the specified command name, searching the
+   directories in the PATH environment variable like a shell would.
+
+   str file_name
+      Name of, or path to, the executable.
+   str return
+      Path to the executable, or None if it could not be found.
+   """
+
+   if os.path.dirname(file_name):
+      # Not subject to PATH lookup.
+      return file_name if os.path.isfile(file_name) else None
+   if os_is_windows() and not os.path.splitext(file_name)[1]:
+      exts = os.environ.get('PATHEXT', '.EXE').split(os.pathsep)
+   else:
+      exts = ('', )
+   for dir in os.environ.get('PATH', os.defpath).split(os.pathsep):
+      for ext in exts:
+         file_path = os.path.join(dir, file_name + ext)
+         if os.path.isfile(file_path) and os.access(file_path, os.X_OK):
+            return file_path
+   return None
+
+##############################################################################################################
+
+class FileLock(object):
+   """Exclusive lock on a file, used to serialize access to a resource shared by multiple processes. The lock
+   is acquired by entering a with statement on the object, and released when the with statement is exited.
+   """
+
+   # File object for the lock file, while the lock is held.
+   _file = None
+   # Path to the lock file.
+   _file_path = None
+
+   def __init__(self, file_path):
+      """Constructor.
+
+      str file_path
+         Path to the lock file. It will be created if it doesn’t exist.
+      """
+
+      self._file = None
+      self._file_path = file_path
+
+   def __enter__(self):
+      makedirs(os.path.dirname(self._file_path))
+      self._file = io.open(self._file_path, 'ab')
+      if os_is_windows():
+         import msvcrt
+         # The byte range to lock starts at the current position.
+         self._file.seek(0)
+         while True:
+            try:
+               # This retries for 10 seconds before giving up.
+               msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+               break
+            except (IOError, OSError):
+               pass
+      else:
+         import fcntl
+         fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+      return self
+
+   def __exit__(self, exc_type, exc_value, traceback):
+      if os_is_windows():
+         import msvcrt
+         self._file.seek(0)
+         msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+      else:
+         import fcntl
+         fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+      self._file.close()
+      self._file = None
+      return False
@@ -22,6 +22,7 @@ import argparse
 import os
 
 import comk
+import comk.configuration
 
 
 ##############################################################################################################
@@ -58,10 +59,22 @@ class Parser(object):
       self._parser = argparse.ArgumentParser(add_help=False)
 
       # Flags that apply to all commands.
+      self._parser.add_argument(
+         '-c', '--configuration', choices=comk.configuration.Configuration.names(), default='debug',
+         help='Build configuration, which determines the optimization level and whether debug code and ' +
+              'debug information are generated. Configurations other than “debug” store their outputs in ' +
+              'a subdirectory of the output directory named after the configuration. Defaults to “debug”.'
+      )
       self._parser.add_argument(
          '--help', action='help',
          help='Show this informative message and exit.'
       )
+      self._parser.add_argument(
+         '--lto', action='store_true',
+         help='Build binaries with link-time optimization, caching its outcome to speed up subsequent ' +
+              'links where supported. Outputs are stored in a subdirectory of the output directory named ' +
+              'after the configuration, followed by “-lto”.'
+      )
       self._parser.add_argument(
          '-n', '--dry-run', action='store_true',
          help='Don’t actually run any external commands. Useful to test if anything needs to be built.'
@@ -71,12 +84,27 @@ class Parser(object):
          help='Location where all Complemake output for the project should be stored. Defaults to the ' +
               'project’s directory.'
       )
+      self._parser.add_argument(
+         '--pgo-train', metavar='TEST', action='append',
+         help='Build with profile-guided optimization, running the test target named TEST, built with ' +
+              'instrumented binaries, to collect the profile data; can be specified multiple times. ' +
+              'Instrumented and optimized outputs are stored in subdirectories of the output directory ' +
+              'named after the configuration, followed by “-pgo-instr” and “-pgo” respectively.'
+      )
       self._parser.add_argument(
          '-p', '--project', metavar='PROJECT.comk',
          help='Complemake project (.comk) containing instructions on how to build targets. If omitted and ' +
               'the current directory contains a single file matching *.comk, that file will be used as the ' +
               'project.'
       )
+      self._parser.add_argument(
+         '--reproducible', action='store_true',
+         help='Generate outputs that don’t depend on the location of the project or of the shared ' +
+              'directory, nor on the time of the build, so that identical sources yield identical outputs ' +
+              'in any directory and on any machine with the same tools; this also allows --compile-cache ' +
+              'to share objects between copies of the project. Sets SOURCE_DATE_EPOCH to 0 if not already ' +
+              'set. Doesn’t affect outputs that are already up to date.'
+      )
       if comk.os_is_windows():
          default_shared_dir = 'Complemake'
          user_apps_home_description = 'common repository for application-specific data (typically ' + \
@@ -92,11 +120,23 @@ class Parser(object):
                   default_shared_dir, user_apps_home_description
                )
       )
+      self._parser.add_argument(
+         '--split-dwarf', action='store_true',
+         help='If the configuration generates debug information, keep most of it out of the linker’s ' +
+              'way by storing it in a separate file for each object file, and have the linker compress the ' +
+              'rest and index it for GDB. Only supported by GCC and Clang targeting ELF; the index is only ' +
+              'generated if the linker is mold, lld or gold. Doesn’t affect object files that are already ' +
+              'up to date.'
+      )
       self._parser.add_argument(
          '-s', '--system-type', metavar='SYSTEM-TYPE',
          help='Use SYSTEM-TYPE as the system type for which to build; examples: x86_64-pc-linux-gnu, ' +
               'i686-pc-win32. If omitted, detect a default for the machine on which Complemake is being run.'
       )
+      self._parser.add_argument(
+         '--tool-ar', metavar='/path/to/ar',
+         help='Use /path/to/ar as the static library archiver.'
+      )
       self._parser.add_argument(
          '--tool-c++', metavar='/path/to/c++', dest='tool_cxx',
          help='Use /path/to/c++ as the C++ compiler (and linker driver, unless --tool-ld is also specified).'
@@ -115,6 +155,17 @@ class Parser(object):
       subparsers.required = True
 
       build_subparser = subparsers.add_parser(Command.BUILD)
+      build_subparser.add_argument(
+         '--compile-cache', action='store_true',
+         help='Store compiled object files in a cache in the shared directory, and restore them from it ' +
+              'instead of compiling sources again with the same compiler, arguments and included files. ' +
+              'Only supported by GCC and Clang; not used with --pgo-train or --split-dwarf.'
+      )
+      build_subparser.add_argument(
+         '--compile-cache-size', metavar='SIZE', type=self.get_size,
+         help='Evict the least recently used object files from the compile cache once it exceeds SIZE ' +
+              'bytes. SIZE can have a K, M or G suffix. Defaults to 5G.'
+      )
       build_subparser.add_argument(
          '--force', action='store_true', dest='force_build',
          help='Unconditionally rebuild all targets.'
@@ -132,22 +183,82 @@ class Parser(object):
          '-k', '--keep-going', action='store_true',
          help='Continue building targets even if other independent targets fail.'
       )
+      build_subparser.add_argument(
+         '--log-compress', action='store_true',
+         help='Save build logs compressed with gzip, as .log.gz files.'
+      )
+      build_subparser.add_argument(
+         '--log-prune-age', metavar='DAYS', type=float,
+         help='After building, delete build logs that haven’t been written to for more than DAYS days.'
+      )
+      build_subparser.add_argument(
+         '--log-prune-size', metavar='SIZE', type=self.get_size,
+         help='After building, delete the oldest build logs until the total size of the remaining ones is ' +
+              'at most SIZE bytes. SIZE can have a K, M or G suffix.'
+      )
+      build_subparser.add_argument(
+         '--log-size-max', metavar='SIZE', type=self.get_size,
+         help='Stop saving the output of a job to its build log once the log reaches SIZE bytes, noting that ' +
+              'the log was truncated. SIZE can have a K, M or G suffix.'
+      )
       build_subparser.add_argument(
          '-f', '--target-file', metavar='/generated/file', action='append', dest='target_files', default=[],
          help='Specify once or more to indicate which target files should be built. ' +
               'If no -f or -t arguments are provided, all targets declared in the Complemake project ' +
               '(.comk) will be built.'
       )
+      build_subparser.add_argument(
+         '-O', '--output-sync', action='store_true',
+         help='Hold back the error output of each job while it runs, and print it in a single block once the ' +
+              'job completes, so that output from concurrently running jobs is not interleaved.'
+      )
+      build_subparser.add_argument(
+         '--plan', choices=('json', ),
+         help='Don’t build anything; instead, print to stdout the list of jobs that would be run, why, which ' +
+              'other jobs each one would wait for, and their expected duration based on previous builds, ' +
+              'followed by a simulation of the build time with the selected --jobs. Implies --dry-run.'
+      )
+      build_subparser.add_argument(
+         '--remote-cache', metavar='URL',
+         help='Share the caches enabled with --compile-cache and --test-cache with other machines via the ' +
+              'HTTP server at URL, which must support GET and PUT of files (e.g. ' +
+              'complemake-cache-server.py). Requires at least one of those options. If the server can’t be ' +
+              'reached, the build continues using only the local caches.'
+      )
+      build_subparser.add_argument(
+         '--remote-cache-mode', choices=('read', 'read-write', 'write'), default='read-write',
+         help='Whether to only download artifacts from the remote cache, only upload them to it, or both. ' +
+              'Defaults to read-write.'
+      )
+      build_subparser.add_argument(
+         '--remote-cache-timeout', metavar='SECONDS', type=float, default=5.0,
+         help='Give up on the remote cache if it doesn’t respond within SECONDS seconds. Defaults to 5.'
+      )
       build_subparser.add_argument(
          '-t', '--target-name', action='append', dest='target_names', default=[],
          help='Specify once or more to indicate which named targets should be built. ' +
               'If no -f or -t arguments are provided, all targets declared in the Complemake project ' +
               '(.comk) will be built.'
       )
+      build_subparser.add_argument(
+         '--test-cache', action='store_true',
+         help='Store the results of passing tests in a cache in the shared directory, and replay them ' +
+              'instead of running a test again with the same executable, libraries, script, expected ' +
+              'output and environment. Ignored with --force-test.'
+      )
       build_subparser.add_argument(
          '-u', '--update-deps', action='store_true',
          help='Update all dependencies (e.g. pull git repo) before building.'
       )
+      build_subparser.add_argument(
+         '-w', '--worker', metavar='HOST:PORT', action='append', dest='workers', default=[],
+         type=self.get_worker_address,
+         help='Specify once or more to send C++ compile jobs to the complemake-worker.py daemon listening ' +
+              'at HOST:PORT, in addition to running --jobs jobs locally. Sources are preprocessed locally, so ' +
+              'workers only need the same compiler; workers whose compiler has a different version or ' +
+              'target are not used. Jobs fall back to compiling locally if a worker can’t be reached. Only ' +
+              'supported by GCC and Clang; not used with --pgo-train or --split-dwarf.'
+      )
 
       clean_subparser = subparsers.add_parser(Command.CLEAN)
 
@@ -163,6 +274,11 @@ class Parser(object):
 
       query_subparser = subparsers.add_parser(Command.QUERY)
       query_group = query_subparser.add_mutually_exclusive_group(required=True)
+      query_group.add_argument(
+         '--build-log', metavar='TARGET', dest='query_build_log',
+         help='Print the build log of TARGET, which can be a target name, a target file path or the path to ' +
+              'a build log, compressed or not.'
+      )
       query_group.add_argument(
          '--exec-env', dest='query_exec_env', action='store_true',
          help='Print any environment variable assignments needed to execute binaries build by the project.'
@@ -175,7 +291,48 @@ class Parser(object):
       else:
          return os.path.normpath(os.path.join(comk.get_user_apps_home(), shared_dir))
 
+   @staticmethod
+   def get_size(size):
+      """Parses a size in bytes, optionally followed by a K, M or G (binary) multiplier suffix.
+
+      str size
+         Size to parse.
+      int return
+         Size in bytes.
+      """
+
+      multiplier = 1
+      if size[-1:].upper() in ('K', 'M', 'G'):
+         multiplier = 1024 ** ('KMG'.index(size[-1].upper()) + 1)
+         size = size[:-1]
+      try:
+         return int(size) * multiplier
+      except ValueError:
+         raise argparse.ArgumentTypeError('invalid size: {}'.format(size))
+
+   @staticmethod
+   def get_worker_address(address):
+      """Parses the address of a distributed compilation worker.
+
+      str address
+         Address to parse, in “host:port” format.
+      tuple(str, int) return
+         Host and port.
+      """
+
+      host, sep, port = address.rpartition(':')
+      if not sep or not host or not port.isdigit():
+         raise argparse.ArgumentTypeError('invalid worker address (expected host:port): {}'.format(address))
+      return host, int(port)
+
    def parse_args(self, *args, **kwargs):
-      """See argparse.ArgumentParser.parse_args()."""
+      """See argparse.ArgumentParser.parse_args(). Also rejects combinations of arguments that have no effect.
+      """
 
-      return self._parser.parse_args(*args, **kwargs)
+      parsed_args = self._parser.parse_args(*args, **kwargs)
+      if parsed_args.command is Command.BUILD and parsed_args.remote_cache and \
+         not parsed_args.compile_cache and not parsed_args.test_cache \
+      :
+         # Exits the program.
+         self._parser.error('--remote-cache requires --compile-cache and/or --test-cache')
+      return parsed_args
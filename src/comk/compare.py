@@ -0,0 +1,188 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Incremental comparison of test outputs.
+
+Comparisons are performed one chunk at a time, so that large outputs can be compared without loading them in
+memory, and stop at the first difference, whose position is reported as offset, line and column.
+"""
+
+import io
+
+
+##############################################################################################################
+
+class Comparator(object):
+   """Compares two operands (bytes or str) one pair of chunks at a time, keeping track of the position of the
+   first difference.
+   """
+
+   # Column (1-based) of the first character following the matched part of the operands.
+   _column = None
+   # Line (1-based) of the first character following the matched part of the operands.
+   _line = None
+   # See Comparator.mismatch.
+   _mismatch = None
+   # Length of the matched part of the operands.
+   _offset = None
+
+   def __init__(self):
+      """Constructor."""
+
+      self._column = 1
+      self._line = 1
+      self._mismatch = None
+      self._offset = 0
+
+   def _advance(self, matched):
+      """Updates the position past the specified matching part of the operands.
+
+      object matched
+         Part of the operands that matched.
+      """
+
+      if isinstance(matched, bytes):
+         lf = b'\n'
+      else:
+         lf = '\n'
+      lines = matched.count(lf)
+      if lines:
+         self._line += lines
+         self._column = len(matched) - matched.rfind(lf)
+      else:
+         self._column += len(matched)
+      self._offset += len(matched)
+
+   def compare(self, chunk1, chunk2):
+      """Compares the next chunk of each operand. The chunks must have the same length, unless one of them is
+      the last one of its operand.
+
+      object chunk1
+         Next chunk of the first operand.
+      object chunk2
+         Next chunk of the second operand.
+      bool return
+         True if the operands are still equal, or False if they differ.
+      """
+
+      if self._mismatch:
+         return False
+      if chunk1 == chunk2:
+         self._advance(chunk1)
+         return True
+      # Locate the first difference; this only happens once per comparison.
+      size = min(len(chunk1), len(chunk2))
+      i = 0
+      while i < size and chunk1[i] == chunk2[i]:
+         i += 1
+      self._advance(chunk1[:i])
+      self._mismatch = (self._offset, self._line, self._column)
+      return False
+
+   def _get_mismatch(self):
+      return self._mismatch
+
+   mismatch = property(_get_mismatch, doc="""
+      Position of the first difference between the operands, as a (offset, line, column) tuple, with offset
+      0-based and line and column 1-based; None if no difference has been found so far.
+   """)
+
+##############################################################################################################
+
+class StreamComparator(Comparator):
+   """Compares a stream of bytes, received in chunks of any size, against the contents of a file."""
+
+   # File being compared against.
+   _file = None
+
+   def __init__(self, file_path):
+      """Constructor.
+
+      str file_path
+         Path to the file to compare against.
+      """
+
+      Comparator.__init__(self)
+
+      self._file = io.open(file_path, 'rb')
+
+   def close(self):
+      """Completes the comparison, checking that the file doesn’t continue past the end of the stream.
+
+      tuple(int, int, int) return
+         See Comparator.mismatch.
+      """
+
+      if not self._mismatch:
+         remaining = self._file.read(1)
+         if remaining:
+            self.compare(remaining, b'')
+      self._file.close()
+      return self._mismatch
+
+   def feed(self, chunk):
+      """Compares the next chunk of the stream.
+
+      bytes chunk
+         Next chunk of the stream.
+      bool return
+         True if the stream and the file are still equal, or False if they differ.
+      """
+
+      if self._mismatch:
+         return False
+      return self.compare(self._file.read(len(chunk)), chunk)
+
+##############################################################################################################
+
+# Size of the chunks read from files being compared.
+CHUNK_SIZE = 64 * 1024
+
+def compare_files(file_path1, file_path2):
+   """Compares the contents of two files.
+
+   str file_path1
+      Path to the first file.
+   str file_path2
+      Path to the second file.
+   tuple(int, int, int) return
+      Position of the first difference (see Comparator.mismatch), or None if the files are equal.
+   """
+
+   comparator = StreamComparator(file_path1)
+   with io.open(file_path2, 'rb') as file2:
+      while True:
+         chunk = file2.read(CHUNK_SIZE)
+         if not chunk or not comparator.feed(chunk):
+            break
+   return comparator.close()
+
+def compare_objects(o1, o2):
+   """Compares two bytes or str instances.
+
+   object o1
+      First operand.
+   object o2
+      Second operand.
+   tuple(int, int, int) return
+      Position of the first difference (see Comparator.mismatch), or None if the operands are equal.
+   """
+
+   comparator = Comparator()
+   comparator.compare(o1, o2)
+   return comparator.mismatch
@@ -0,0 +1,77 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.compare."""
+
+import os
+import tempfile
+import unittest
+
+import comk.compare as cc
+import comk.testing
+
+
+##############################################################################################################
+
+class CompareObjectsTest(unittest.TestCase):
+   def runTest(self):
+      self.assertIsNone(cc.compare_objects(b'', b''))
+      self.assertIsNone(cc.compare_objects(b'a\nb', b'a\nb'))
+      self.assertEqual(cc.compare_objects(b'a\nbc', b'a\nbd'), (3, 2, 2))
+      self.assertEqual(cc.compare_objects('a\nb', 'a\nb\n'), (3, 2, 2))
+      self.assertEqual(cc.compare_objects('ab\n', 'ab'), (2, 1, 3))
+
+##############################################################################################################
+
+class CompareFilesTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def write_file(self, name, contents):
+      file_path = os.path.join(self._dir, name)
+      with open(file_path, 'wb') as f:
+         f.write(contents)
+      return file_path
+
+   def runTest(self):
+      # Make sure that the comparison spans multiple chunks.
+      contents = b'0123456789abcde\n' * (cc.CHUNK_SIZE // 8)
+      a = self.write_file('a', contents)
+      self.assertIsNone(cc.compare_files(a, self.write_file('same', contents)))
+      b = self.write_file('b', contents[:cc.CHUNK_SIZE + 17] + b'X' + contents[cc.CHUNK_SIZE + 18:])
+      self.assertEqual(cc.compare_files(a, b), (cc.CHUNK_SIZE + 17, cc.CHUNK_SIZE // 16 + 2, 2))
+      c = self.write_file('c', contents + b'more')
+      self.assertEqual(cc.compare_files(a, c), (len(contents), len(contents) // 16 + 1, 1))
+      self.assertEqual(cc.compare_files(c, a), (len(contents), len(contents) // 16 + 1, 1))
+
+##############################################################################################################
+
+class StreamComparatorTest(unittest.TestCase):
+   def runTest(self):
+      file_path = tempfile.mktemp()
+      try:
+         with open(file_path, 'wb') as f:
+            f.write(b'line 1\nline 2\n')
+         comparator = cc.StreamComparator(file_path)
+         self.assertTrue(comparator.feed(b'li'))
+         self.assertTrue(comparator.feed(b'ne 1\nli'))
+         self.assertFalse(comparator.feed(b'ne 3\n'))
+         self.assertEqual(comparator.close(), (12, 2, 6))
+
+         comparator = cc.StreamComparator(file_path)
+         self.assertTrue(comparator.feed(b'line 1\n'))
+         self.assertEqual(comparator.close(), (7, 2, 1))
+      finally:
+         os.unlink(file_path)
@@ -0,0 +1,639 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Content-addressed cache of compiled object files, shared by all projects.
+
+The cache works like ccache’s “direct mode”: compiling a source with a given command line first yields a
+manifest key, computed from the identity of the compiler executable, the working directory and the exact
+command-line arguments. The manifest stored under that key lists, for each object compiled with that command
+line, the hash of every file that went into it (the source and all the headers it included, as reported by the
+dependency file generated by the compiler); if all of them still match, the cached object and the error output
+of the compiler are restored, without running the compiler at all.
+
+The cache is stored in a directory in which each entry is spread over a few files; their modification times
+are updated whenever they’re used, so that once the cache exceeds its maximum size the least recently used
+files can be evicted. Changes to the cache are serialized via a lock file, so multiple instances of
+Complemake can share it.
+
+If a comk.remotecache.RemoteCache is provided, manifests and objects missing from the local directory are
+downloaded from it, and new ones are uploaded to it, so that objects compiled on one machine can be reused on
+others. Since manifest keys include the working directory, this requires building from the same path on every
+machine, as is usually the case for continuous integration.
+"""
+
+import hashlib
+import io
+import json
+import locale
+import os
+import re
+import shutil
+
+import comk
+import comk.job
+import comk.toolcache
+
+
+##############################################################################################################
+
+class CompileCache(object):
+   """Cache of compiled object files."""
+
+   # Path to the directory containing the cache.
+   _dir = None
+   # Hashes of files computed so far, as (modification time, size, hash) tuples (path -> tuple).
+   _file_hashes = None
+   # Logger instance.
+   _log = None
+   # Remote cache, if any.
+   _remote_cache = None
+   # Maximum size of the cache, in bytes.
+   _size_max = None
+
+   # Name of the lock file, in the cache directory.
+   LOCK_FILE = 'lock'
+   # Maximum count of entries kept in each manifest, i.e. of combinations of included files that can be
+   # cached for a single command line.
+   MANIFEST_ENTRIES_MAX = 16
+   # Name of the file, in the cache directory, storing the current size of the cache.
+   SIZE_FILE = 'size'
+   # Default maximum size of the cache, in bytes.
+   SIZE_MAX_DEFAULT = 5 * 1024 * 1024 * 1024
+   # Fraction of the maximum size that the cache is shrunk to when evicting files.
+   SIZE_EVICTION_TARGET = 0.9
+   # Changing this invalidates all existing entries; must be changed whenever the format of the cache, or
+   # the way keys are computed, changes.
+   VERSION = '2'
+
+   def __init__(self, log, dir, size_max = None, remote_cache = None):
+      """Constructor.
+
+      comk.logging.Logger log
+         Logger instance.
+      str dir
+         Path to the directory containing the cache. It will be created if it doesn’t exist.
+      int size_max
+         Maximum size of the cache, in bytes. Defaults to CompileCache.SIZE_MAX_DEFAULT.
+      comk.remotecache.RemoteCache remote_cache
+         Remote cache to download manifests and objects from and upload them to, or None to only use the local
+         directory.
+      """
+
+      self._dir = dir
+      self._file_hashes = {}
+      self._log = log
+      self._remote_cache = remote_cache
+      self._size_max = size_max or self.SIZE_MAX_DEFAULT
+
+   def _evict(self):
+      """Deletes the least recently used files in the cache, until its size is below
+      CompileCache.SIZE_EVICTION_TARGET times the maximum. Must be called while holding the lock.
+
+      int return
+         Actual size of the cache after the eviction.
+      """
+
+      log = self._log
+      files = []
+      size = 0
+      for dir_path, dir_names, file_names in os.walk(self._dir):
+         if dir_path == self._dir:
+            # Skip the bookkeeping files.
+            continue
+         for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            try:
+               st = os.stat(file_path)
+            except (comk.FileNotFoundErrorCompat, OSError):
+               continue
+            files.append((st.st_mtime, st.st_size, file_path))
+            size += st.st_size
+      files.sort()
+      size_target = int(self._size_max * self.SIZE_EVICTION_TARGET)
+      evicted = 0
+      for mtime, file_size, file_path in files:
+         if size <= size_target:
+            break
+         try:
+            os.unlink(file_path)
+         except (comk.FileNotFoundErrorCompat, OSError):
+            continue
+         size -= file_size
+         evicted += 1
+      log(log.HIGH, 'compile-cache: evicted {} files, size now {} bytes', evicted, size)
+      return size
+
+   def _get_entry_file_path(self, key, suffix):
+      """Returns the path to a file in the cache.
+
+      str key
+         Key of the manifest or object.
+      str suffix
+         Suffix identifying the file among those for the same key.
+      str return
+         Path to the file.
+      """
+
+      # Spread files over subdirectories to keep directories small.
+      return os.path.join(self._dir, key[:2], key + suffix)
+
+   def _get_file_hash(self, file_path):
+      """Returns the hash of a file’s contents. Hashes are reused for as long as the file’s modification time
+      and size don’t change.
+
+      str file_path
+         Path to the file.
+      str return
+         Hash of the file, or None if the file can’t be read.
+      """
+
+      try:
+         st = os.stat(file_path)
+      except (comk.FileNotFoundErrorCompat, OSError):
+         return None
+      cached = self._file_hashes.get(file_path)
+      if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+         return cached[2]
+      try:
+         digest = comk.hash_file(file_path)
+      except (IOError, OSError):
+         return None
+      self._file_hashes[file_path] = (st.st_mtime, st.st_size, digest)
+      return digest
+
+   def get_key(self, args, cwd, prefix_map = None):
+      """Computes the manifest key for a compiler command line.
+
+      iterable(str+) args
+         Command-line arguments, starting with the compiler’s executable.
+      str cwd
+         Directory from which the compiler is run.
+      iterable(tuple(str, str)*) prefix_map
+         If not None, the compiler replaces these absolute path prefixes in its outputs, as returned by
+         comk.core.Core.get_path_prefix_map(); the outputs then don’t depend on cwd, so the same replacements
+         are made in args instead of making cwd part of the key, allowing objects to be shared by copies of a
+         project in different directories.
+      str return
+         Key, or None if the compiler executable or a response file can’t be found, in which case the
+         compilation can’t be cached.
+      """
+
+      exe_signature = comk.toolcache.get_exe_signature(args[0])
+      if not exe_signature:
+         return None
+      if prefix_map is None:
+         location = cwd
+         prefix_res = []
+      else:
+         location = ''
+         # Replace longer prefixes first, and only whole path components.
+         prefix_res = [
+            (re.compile(re.escape(prefix) + r'(?=[/\\=]|$)'), replacement)
+            for prefix, replacement in reversed(prefix_map)
+         ]
+      hash = hashlib.sha1('\0'.join((
+         self.VERSION, exe_signature[0], str(exe_signature[1]), str(exe_signature[2]), location,
+         # Compilers use this instead of the current time to expand __DATE__ and __TIME__.
+         os.environ.get('SOURCE_DATE_EPOCH', ''),
+         # These add directories to the include search path, just like -I.
+         os.environ.get('CPATH', ''),
+         os.environ.get('CPLUS_INCLUDE_PATH', ''),
+      )).encode('utf-8'))
+      for arg in args:
+         relocated_arg = arg
+         for prefix_re, replacement in prefix_res:
+            relocated_arg = prefix_re.sub(replacement, relocated_arg)
+         hash.update(b'\0' + relocated_arg.encode('utf-8'))
+         if arg.startswith('@'):
+            # Hash the contents of the response file, since they are the real arguments.
+            rsp_hash = self._get_file_hash(os.path.join(cwd, arg[1:]))
+            if not rsp_hash:
+               return None
+            hash.update(b'\0' + rsp_hash.encode('ascii'))
+      return hash.hexdigest()
+
+   def _get_object_key(self, key, input_hashes):
+      """Computes the key of an object, based on its manifest key and the hashes of all its inputs.
+
+      str key
+         Manifest key.
+      dict(str: str) input_hashes
+         Hash of each input file (path -> hash).
+      str return
+         Object key.
+      """
+
+      hash = hashlib.sha1(key.encode('ascii'))
+      for file_path in sorted(input_hashes.keys()):
+         hash.update('\0{}\0{}'.format(file_path, input_hashes[file_path]).encode('utf-8'))
+      return hash.hexdigest()
+
+   def lookup(self, key, cwd):
+      """Looks for an object compiled with the command line that generated the specified manifest key, from
+      inputs identical to the current ones.
+
+      str key
+         Manifest key, as returned by CompileCache.get_key().
+      str cwd
+         Directory from which the compiler is run; relative input paths in the manifest are relative to it.
+      str return
+         Object key to pass to CompileCache.restore(), or None if no matching object is cached.
+      """
+
+      entry = self._match_manifest(self._read_manifest(key), cwd)
+      if entry:
+         # Mark the manifest as recently used, like CompileCache.restore() does for the object; otherwise
+         # the manifests of the most used command lines would be the first files to be evicted.
+         try:
+            os.utime(self._get_entry_file_path(key, '.manifest'), None)
+         except (comk.FileNotFoundErrorCompat, OSError):
+            pass
+         return entry['object']
+      if not self._remote_cache:
+         return None
+      contents = self._remote_cache.get(key + '.manifest')
+      if contents is None:
+         return None
+      try:
+         manifest = json.loads(contents.decode('utf-8'))
+      except ValueError:
+         return None
+      if not isinstance(manifest, list):
+         return None
+      entry = self._match_manifest(manifest, cwd)
+      if not entry:
+         return None
+      # Remember the entry locally, so the next lookup won’t need the remote cache.
+      with comk.FileLock(os.path.join(self._dir, self.LOCK_FILE)):
+         size = self._read_size()
+         try:
+            size += self._write_manifest_entry(key, entry)[0]
+         except (IOError, OSError):
+            pass
+         self._update_size(size)
+      return entry['object']
+
+   def _match_manifest(self, manifest, cwd):
+      """Returns the first manifest entry whose inputs all match the current ones.
+
+      list(dict(str: object)*) manifest
+         Manifest entries, as returned by CompileCache._read_manifest().
+      str cwd
+         Directory from which the compiler is run; relative input paths in the manifest are relative to it.
+      dict(str: object) return
+         Matching entry, or None if none match.
+      """
+
+      for entry in manifest:
+         if not isinstance(entry, dict) or 'object' not in entry or not isinstance(entry.get('inputs'), dict):
+            # Ignore malformed entries, which could come from a remote cache.
+            continue
+         for file_path, file_hash in entry['inputs'].items():
+            if self._get_file_hash(os.path.join(cwd, file_path)) != file_hash:
+               break
+         else:
+            return entry
+      return None
+
+   @staticmethod
+   def parse_depfile(file_path):
+      """Parses a makefile-style dependency file, as generated by GCC’s -MD, returning the files that the
+      target(s) in it depend on.
+
+      str file_path
+         Path to the dependency file.
+      list(str*) return
+         Prerequisites, in order of appearance and without duplicates.
+      """
+
+      with io.open(file_path, 'rb') as file:
+         contents = file.read().decode('utf-8', 'replace')
+      # Join continuation lines.
+      contents = re.sub(r'\\\r?\n', ' ', contents)
+      prerequisites = []
+      seen = set()
+      for line in contents.splitlines():
+         # Look for “: ” rather than “:” to skip Windows drive letters in the target.
+         colon = line.find(': ')
+         if colon < 0:
+            if not line.endswith(':'):
+               continue
+            colon = len(line) - 1
+         for match in re.finditer(r'(?:\\.|[^\s\\])+', line[colon + 1:]):
+            prerequisite = re.sub(r'\\([ #])', r'\1', match.group()).replace('$$', '$')
+            if prerequisite not in seen:
+               seen.add(prerequisite)
+               prerequisites.append(prerequisite)
+      return prerequisites
+
+   def _read_manifest(self, key):
+      """Reads the manifest for a key.
+
+      str key
+         Manifest key.
+      list(dict(str: object)*) return
+         Manifest entries, most recent first; each of them has keys “object” (object key) and “inputs” (hash
+         of each input file, path -> hash).
+      """
+
+      try:
+         with io.open(self._get_entry_file_path(key, '.manifest'), 'rb') as file:
+            manifest = json.loads(file.read().decode('utf-8'))
+      except (comk.FileNotFoundErrorCompat, IOError, OSError, ValueError):
+         return []
+      if not isinstance(manifest, list):
+         return []
+      return manifest
+
+   def _download_object(self, object_key):
+      """Downloads an object and its error output from the remote cache into the local directory.
+
+      str object_key
+         Object key.
+      bool return
+         True if the object was downloaded, or False otherwise.
+      """
+
+      object_contents = self._remote_cache.get(object_key + '.object')
+      if object_contents is None:
+         return False
+      stderr = self._remote_cache.get(object_key + '.stderr')
+      if stderr is None:
+         return False
+      log = self._log
+      downloaded = True
+      with comk.FileLock(os.path.join(self._dir, self.LOCK_FILE)):
+         size = self._read_size()
+         try:
+            size += self._write_entry_file(object_key, '.object', contents=object_contents)
+            size += self._write_entry_file(object_key, '.stderr', contents=stderr)
+         except (IOError, OSError) as x:
+            log(log.QUIET, 'complemake: unable to store {} in the compile cache: {}', object_key, x)
+            downloaded = False
+         self._update_size(size)
+      return downloaded
+
+   def restore(self, object_key, object_file_path):
+      """Copies a cached object to its destination.
+
+      str object_key
+         Object key, as returned by CompileCache.lookup().
+      str object_file_path
+         Path to copy the object to.
+      str return
+         Error output of the compiler when the object was compiled, or None if the object could not be
+         restored (e.g. because it was evicted in the meantime).
+      """
+
+      log = self._log
+      cached_object_file_path = self._get_entry_file_path(object_key, '.object')
+      stderr_file_path = self._get_entry_file_path(object_key, '.stderr')
+      if self._remote_cache and not (
+         os.path.exists(cached_object_file_path) and os.path.exists(stderr_file_path)
+      ):
+         self._download_object(object_key)
+      try:
+         with io.open(stderr_file_path, 'rb') as stderr_file:
+            stderr = stderr_file.read()
+         comk.makedirs(os.path.dirname(object_file_path))
+         temp_file_path = '{}.{}.tmp'.format(object_file_path, os.getpid())
+         shutil.copyfile(cached_object_file_path, temp_file_path)
+         comk.replace_file(temp_file_path, object_file_path)
+         # Mark the entry as recently used.
+         os.utime(cached_object_file_path, None)
+         os.utime(stderr_file_path, None)
+      except (comk.FileNotFoundErrorCompat, IOError, OSError) as x:
+         log(log.HIGH, 'compile-cache: unable to restore {}: {}', object_key, x)
+         return None
+      return stderr.decode(locale.getpreferredencoding(), 'replace')
+
+   def store(self, key, cwd, depfile_path, object_file_path, stderr, compile_start_time = None):
+      """Adds a freshly compiled object to the cache, unless any of its inputs was modified after the
+      compilation started: the object could then have been built from an older version of the input than the
+      one that would be hashed.
+
+      str key
+         Manifest key, as returned by CompileCache.get_key() for the command line that compiled the object.
+      str cwd
+         Directory from which the compiler was run.
+      str depfile_path
+         Path to the dependency file generated by the compiler along with the object.
+      str object_file_path
+         Path to the object file.
+      bytes stderr
+         Error output of the compiler.
+      float compile_start_time
+         Time at which the compiler was started, as returned by time.time(); if None, inputs are not checked
+         for modifications.
+      """
+
+      log = self._log
+      try:
+         input_file_paths = self.parse_depfile(depfile_path)
+      except (comk.FileNotFoundErrorCompat, IOError, OSError) as x:
+         log(log.HIGH, 'compile-cache: not storing {}: {}', object_file_path, x)
+         return
+      input_hashes = {}
+      for input_file_path in input_file_paths:
+         full_input_file_path = os.path.join(cwd, input_file_path)
+         file_hash = self._get_file_hash(full_input_file_path)
+         if not file_hash:
+            log(
+               log.HIGH, 'compile-cache: not storing {}: unable to read {}', object_file_path, input_file_path
+            )
+            return
+         # _get_file_hash() just checked the modification time of the file, and remembered it.
+         if compile_start_time is not None and \
+            self._file_hashes[full_input_file_path][0] >= compile_start_time \
+         :
+            log(
+               log.HIGH, 'compile-cache: not storing {}: {} was modified during the compilation',
+               object_file_path, input_file_path
+            )
+            return
+         input_hashes[input_file_path] = file_hash
+      object_key = self._get_object_key(key, input_hashes)
+      log(log.HIGH, 'compile-cache: storing {} as {}', object_file_path, object_key)
+      with comk.FileLock(os.path.join(self._dir, self.LOCK_FILE)):
+         size = self._read_size()
+         manifest_contents = None
+         try:
+            size += self._write_entry_file(object_key, '.object', object_file_path=object_file_path)
+            size += self._write_entry_file(object_key, '.stderr', contents=stderr)
+            size_delta, manifest_contents = self._write_manifest_entry(
+               key, {'object': object_key, 'inputs': input_hashes}
+            )
+            size += size_delta
+         except (IOError, OSError) as x:
+            log(log.QUIET, 'complemake: unable to store {} in the compile cache: {}', object_file_path, x)
+         self._update_size(size)
+      if self._remote_cache and manifest_contents:
+         # Upload the manifest last, so that other machines can’t find it before the object it references.
+         # The local manifest is uploaded as a whole, replacing any entries added by other machines since it
+         # was downloaded; this only causes some missed hits for them.
+         with io.open(object_file_path, 'rb') as object_file:
+            self._remote_cache.put(object_key + '.object', object_file.read())
+         self._remote_cache.put(object_key + '.stderr', stderr)
+         self._remote_cache.put(key + '.manifest', manifest_contents)
+
+   def _update_size(self, size):
+      """Updates the size of the cache tracked in CompileCache.SIZE_FILE, evicting files if it exceeds the
+      maximum. Must be called while holding the lock.
+
+      int size
+         Size of the cache, in bytes.
+      """
+
+      if size > self._size_max:
+         size = self._evict()
+      self._write_size(size)
+
+   def _read_size(self):
+      """Returns the size of the cache, as tracked in CompileCache.SIZE_FILE. Must be called while holding the
+      lock.
+
+      int return
+         Size of the cache, in bytes.
+      """
+
+      try:
+         with io.open(os.path.join(self._dir, self.SIZE_FILE), 'rb') as file:
+            return int(file.read().strip() or 0)
+      except (comk.FileNotFoundErrorCompat, IOError, OSError, ValueError):
+         return 0
+
+   def _write_entry_file(self, key, suffix, object_file_path = None, contents = None):
+      """Atomically writes a file in the cache, either copying another file or writing the specified
+      contents. Must be called while holding the lock.
+
+      str key
+         Key of the manifest or object.
+      str suffix
+         Suffix identifying the file among those for the same key.
+      str object_file_path
+         Path to the file to copy.
+      bytes contents
+         Contents to write, if object_file_path is None.
+      int return
+         Change in the size of the cache.
+      """
+
+      file_path = self._get_entry_file_path(key, suffix)
+      try:
+         size_delta = -os.path.getsize(file_path)
+      except (comk.FileNotFoundErrorCompat, OSError):
+         size_delta = 0
+      comk.makedirs(os.path.dirname(file_path))
+      temp_file_path = '{}.{}.tmp'.format(file_path, os.getpid())
+      if object_file_path:
+         shutil.copyfile(object_file_path, temp_file_path)
+      else:
+         with io.open(temp_file_path, 'wb') as file:
+            file.write(contents)
+      comk.replace_file(temp_file_path, file_path)
+      return size_delta + os.path.getsize(file_path)
+
+   def _write_manifest_entry(self, key, entry):
+      """Adds an entry to the top of a manifest, replacing any entry for the same object and dropping the
+      least recently added ones past CompileCache.MANIFEST_ENTRIES_MAX. Must be called while holding the lock.
+
+      str key
+         Manifest key.
+      dict(str: object) entry
+         Manifest entry.
+      tuple(int, bytes) return
+         Change in the size of the cache, and new contents of the manifest file.
+      """
+
+      manifest = [
+         other_entry for other_entry in self._read_manifest(key)
+         if not isinstance(other_entry, dict) or other_entry.get('object') != entry['object']
+      ]
+      manifest.insert(0, entry)
+      del manifest[self.MANIFEST_ENTRIES_MAX:]
+      contents = json.dumps(manifest, sort_keys=True).encode('utf-8')
+      return self._write_entry_file(key, '.manifest', contents=contents), contents
+
+   def _write_size(self, size):
+      """Updates the size of the cache tracked in CompileCache.SIZE_FILE. Must be called while holding the
+      lock.
+
+      int size
+         Size of the cache, in bytes.
+      """
+
+      with io.open(os.path.join(self._dir, self.SIZE_FILE), 'wb') as file:
+         file.write(str(size).encode('ascii'))
+
+##############################################################################################################
+
+class CachedCompilationJob(comk.job.SynchronousJob):
+   """Stands in for a compilation job whose outcome was restored from the compile cache, replaying the error
+   output that the compiler generated when the object was originally compiled.
+   """
+
+   # Logger instance.
+   _log = None
+   # Command summary to print out in quiet mode.
+   _quiet_cmd = None
+   # Error output of the compiler.
+   _stderr = None
+   # Path to the file where the error output will be saved.
+   _stderr_file_path = None
+
+   def __init__(self, on_complete_fn, quiet_cmd, log, stderr, stderr_file_path):
+      """Constructor.
+
+      callable on_complete_fn
+         Function to be called when the job completes.
+      iterable(str, str*) quiet_cmd
+         “Quiet mode” command of the compilation job; its tool name will be replaced.
+      comk.logging.Logger log
+         Object to which the error output will be logged.
+      str stderr
+         Error output of the compiler.
+      str stderr_file_path
+         Path to the file where the error output will be saved.
+      """
+
+      comk.job.SynchronousJob.__init__(self, on_complete_fn)
+
+      self._log = log
+      self._quiet_cmd = ['CACHED'] + list(quiet_cmd[1:])
+      self._stderr = stderr
+      self._stderr_file_path = stderr_file_path
+
+   def get_quiet_command(self):
+      """See SynchronousJob.get_quiet_command()."""
+
+      return self._quiet_cmd
+
+   def get_verbose_command(self):
+      """See SynchronousJob.get_verbose_command()."""
+
+      return 'restore {} from compile cache'.format(' '.join(self._quiet_cmd[1:]))
+
+   def run(self):
+      """See SynchronousJob.run()."""
+
+      log = self._log
+      with log.buffered_output(), log.open_build_log(self._stderr_file_path) as stderr:
+         for line in self._stderr.splitlines(True):
+            log(None, '{}', line.rstrip('\r\n'))
+            stderr.write(line)
+      return 0
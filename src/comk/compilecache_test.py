@@ -0,0 +1,244 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.compilecache."""
+
+import io
+import os
+import unittest
+
+import comk.compilecache as ccc
+import comk.logging
+import comk.testing
+
+
+##############################################################################################################
+
+def age_files(dir, seconds):
+   for dir_path, dir_names, file_names in os.walk(dir):
+      for file_name in file_names:
+         file_path = os.path.join(dir_path, file_name)
+         os.utime(file_path, (os.path.getatime(file_path), os.path.getmtime(file_path) - seconds))
+
+def write_file(file_path, contents):
+   with io.open(file_path, 'wb') as file:
+      file.write(contents)
+
+##############################################################################################################
+
+class ParseDepfileTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      depfile_path = os.path.join(self._dir, 'main.d')
+      write_file(depfile_path, (
+         b'int/src/main.cxx.o: src/main.cxx include/a.hxx \\\n'
+         b' include/with\\ space.hxx include/a.hxx\n'
+         b'include/a.hxx:\n'
+      ))
+      self.assertEqual(ccc.CompileCache.parse_depfile(depfile_path), [
+         'src/main.cxx', 'include/a.hxx', 'include/with space.hxx'
+      ])
+
+##############################################################################################################
+
+class CompileCacheTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def store(self, cache, key, object_contents, stderr):
+      object_file_path = os.path.join(self._dir, 'main.o')
+      write_file(object_file_path, object_contents)
+      cache.store(key, self._dir, os.path.join(self._dir, 'main.d'), object_file_path, stderr)
+
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache = ccc.CompileCache(log, os.path.join(self._dir, 'cache'))
+      exe_file_path = os.path.join(self._dir, 'cxx')
+      write_file(exe_file_path, b'v1')
+      os.chmod(exe_file_path, 0o755)
+      write_file(os.path.join(self._dir, 'main.cxx'), b'#include "a.hxx"\n')
+      write_file(os.path.join(self._dir, 'a.hxx'), b'int i;\n')
+      write_file(os.path.join(self._dir, 'main.d'), b'main.o: main.cxx a.hxx\n')
+      restored_file_path = os.path.join(self._dir, 'restored.o')
+      args = [exe_file_path, '-c', '-omain.o', 'main.cxx']
+
+      key = cache.get_key(args, self._dir)
+      self.assertIsNone(cache.lookup(key, self._dir))
+      self.store(cache, key, b'object 1', b'warning\n')
+
+      # Another instance should find the object, and restore it along with the compiler’s output.
+      cache = ccc.CompileCache(log, os.path.join(self._dir, 'cache'))
+      self.assertEqual(cache.get_key(args, self._dir), key)
+      object_key = cache.lookup(key, self._dir)
+      self.assertIsNotNone(object_key)
+      self.assertEqual(cache.restore(object_key, restored_file_path), 'warning\n')
+      with io.open(restored_file_path, 'rb') as restored:
+         self.assertEqual(restored.read(), b'object 1')
+
+      # Different arguments or a different compiler result in a different key.
+      self.assertNotEqual(cache.get_key(args + ['-O2'], self._dir), key)
+      write_file(exe_file_path, b'version 2')
+      self.assertNotEqual(cache.get_key(args, self._dir), key)
+      write_file(exe_file_path, b'v1')
+
+      # Changing an included header results in a miss; both versions can then be cached at the same time.
+      write_file(os.path.join(self._dir, 'a.hxx'), b'long i;\n')
+      self.assertIsNone(cache.lookup(key, self._dir))
+      self.store(cache, key, b'object 2', b'')
+      object_key2 = cache.lookup(key, self._dir)
+      self.assertNotEqual(object_key2, object_key)
+      self.assertEqual(cache.restore(object_key2, restored_file_path), '')
+      write_file(os.path.join(self._dir, 'a.hxx'), b'int i;\n')
+      self.assertEqual(cache.lookup(key, self._dir), object_key)
+
+##############################################################################################################
+
+class CompileCacheModifiedInputTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      cache = ccc.CompileCache(
+         comk.logging.Logger(comk.logging.LogGenerator()), os.path.join(self._dir, 'cache')
+      )
+      exe_file_path = os.path.join(self._dir, 'cxx')
+      write_file(exe_file_path, b'v1')
+      os.chmod(exe_file_path, 0o755)
+      write_file(os.path.join(self._dir, 'main.cxx'), b'#include "a.hxx"\n')
+      write_file(os.path.join(self._dir, 'a.hxx'), b'int i;\n')
+      write_file(os.path.join(self._dir, 'main.d'), b'main.o: main.cxx a.hxx\n')
+      object_file_path = os.path.join(self._dir, 'main.o')
+      write_file(object_file_path, b'object')
+      key = cache.get_key([exe_file_path, '-c', 'main.cxx'], self._dir)
+      a_hxx_mtime = os.path.getmtime(os.path.join(self._dir, 'a.hxx'))
+
+      # The header changed while the compiler was running, so which version went into the object is unknown.
+      cache.store(key, self._dir, os.path.join(self._dir, 'main.d'), object_file_path, b'', a_hxx_mtime)
+      self.assertIsNone(cache.lookup(key, self._dir))
+
+      cache.store(key, self._dir, os.path.join(self._dir, 'main.d'), object_file_path, b'', a_hxx_mtime + 1)
+      self.assertIsNotNone(cache.lookup(key, self._dir))
+
+##############################################################################################################
+
+class CompileCacheIncludePathEnvTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      cache = ccc.CompileCache(
+         comk.logging.Logger(comk.logging.LogGenerator()), os.path.join(self._dir, 'cache')
+      )
+      exe_file_path = os.path.join(self._dir, 'cxx')
+      write_file(exe_file_path, b'v1')
+      os.chmod(exe_file_path, 0o755)
+      args = [exe_file_path, '-c', 'main.cxx']
+
+      for env_var in 'CPATH', 'CPLUS_INCLUDE_PATH':
+         if env_var in os.environ:
+            self.addCleanup(os.environ.__setitem__, env_var, os.environ.pop(env_var))
+         else:
+            self.addCleanup(os.environ.pop, env_var, None)
+      key = cache.get_key(args, self._dir)
+      os.environ['CPATH'] = '/include'
+      cpath_key = cache.get_key(args, self._dir)
+      self.assertNotEqual(cpath_key, key)
+      del os.environ['CPATH']
+      os.environ['CPLUS_INCLUDE_PATH'] = '/include'
+      self.assertNotIn(cache.get_key(args, self._dir), (key, cpath_key))
+
+##############################################################################################################
+
+class CompileCacheRelocatableKeyTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      cache = ccc.CompileCache(
+         comk.logging.Logger(comk.logging.LogGenerator()), os.path.join(self._dir, 'cache')
+      )
+      exe_file_path = os.path.join(self._dir, 'cxx')
+      write_file(exe_file_path, b'v1')
+      os.chmod(exe_file_path, 0o755)
+
+      def get_key(project_path, shared_dir, relocatable):
+         args = [
+            exe_file_path, '-ffile-prefix-map={}=.'.format(project_path),
+            '-ffile-prefix-map={}=/comk-shared'.format(shared_dir), '-I' + shared_dir + '/dep/include',
+            '-I' + project_path + '/include', '-c', 'main.cxx'
+         ]
+         if relocatable:
+            prefix_map = [(project_path, '.'), (shared_dir, '/comk-shared')]
+         else:
+            prefix_map = None
+         return cache.get_key(args, project_path, prefix_map)
+
+      # Without a prefix map, the location of the project is part of the key.
+      self.assertNotEqual(get_key('/a/prj', '/a/.comk', False), get_key('/b/prj', '/b/.comk', False))
+      # With a prefix map, the locations are replaced, but only as whole path components.
+      key = get_key('/a/prj', '/a/.comk', True)
+      self.assertEqual(get_key('/b/prj', '/b/.comk', True), key)
+      self.assertNotEqual(get_key('/b/prj', '/b/.comk', False), key)
+      # A directory that merely starts with the same characters as the project is not relocated.
+      self.assertNotEqual(
+         cache.get_key([exe_file_path, '-I/a/prj2'], '/a/prj', [('/a/prj', '.')]),
+         cache.get_key([exe_file_path, '-I/b/prj2'], '/b/prj', [('/b/prj', '.')])
+      )
+
+##############################################################################################################
+
+class CompileCacheEvictionTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache = ccc.CompileCache(log, os.path.join(self._dir, 'cache'), 2500)
+      exe_file_path = os.path.join(self._dir, 'cxx')
+      write_file(exe_file_path, b'v1')
+      os.chmod(exe_file_path, 0o755)
+      write_file(os.path.join(self._dir, 'main.d'), b'main.o: main.cxx\n')
+      object_file_path = os.path.join(self._dir, 'main.o')
+      write_file(object_file_path, b'x' * 1000)
+      keys = []
+      for i in range(3):
+         write_file(os.path.join(self._dir, 'main.cxx'), 'int i{};\n'.format(i).encode('utf-8'))
+         keys.append(cache.get_key([exe_file_path, '-D{}'.format(i)], self._dir))
+         cache.store(keys[i], self._dir, os.path.join(self._dir, 'main.d'), object_file_path, b'')
+         # Make sure that each entry is more recent than the previous one.
+         age_files(os.path.join(self._dir, 'cache'), 10)
+
+      # The oldest entry must have been evicted to make room for the last one.
+      self.assertIsNone(cache.lookup(keys[0], self._dir))
+      self.assertIsNotNone(cache.lookup(keys[2], self._dir))
+
+##############################################################################################################
+
+class CompileCacheEvictionAfterHitTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache = ccc.CompileCache(log, os.path.join(self._dir, 'cache'), 2500)
+      exe_file_path = os.path.join(self._dir, 'cxx')
+      write_file(exe_file_path, b'v1')
+      os.chmod(exe_file_path, 0o755)
+      write_file(os.path.join(self._dir, 'main.d'), b'main.o: main.cxx\n')
+      write_file(os.path.join(self._dir, 'main.cxx'), b'int i;\n')
+      object_file_path = os.path.join(self._dir, 'main.o')
+      write_file(object_file_path, b'x' * 1000)
+      keys = []
+      for i in range(3):
+         keys.append(cache.get_key([exe_file_path, '-D{}'.format(i)], self._dir))
+      for i in range(2):
+         cache.store(keys[i], self._dir, os.path.join(self._dir, 'main.d'), object_file_path, b'')
+         age_files(os.path.join(self._dir, 'cache'), 10)
+
+      # Using the oldest entry makes it the most recently used, manifest included.
+      object_key = cache.lookup(keys[0], self._dir)
+      self.assertIsNotNone(object_key)
+      self.assertIsNotNone(cache.restore(object_key, os.path.join(self._dir, 'restored.o')))
+      cache.store(keys[2], self._dir, os.path.join(self._dir, 'main.d'), object_file_path, b'')
+
+      # The entry that was not used must have been evicted instead of the one that was.
+      self.assertIsNone(cache.lookup(keys[1], self._dir))
+      object_key = cache.lookup(keys[0], self._dir)
+      self.assertIsNotNone(object_key)
+      self.assertIsNotNone(cache.restore(object_key, os.path.join(self._dir, 'restored.o')))
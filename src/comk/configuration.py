@@ -0,0 +1,137 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2015-2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+
+"""Build configurations, selecting how much to optimize and debug the generated code."""
+
+import os
+
+
+##############################################################################################################
+
+class Configuration(object):
+   """Build configuration. Instances are only available as Configuration.DEBUG, Configuration.RELEASE, etc.
+
+   Each configuration other than the default (Configuration.DEBUG) generates its outputs, including metadata
+   and logs, in a subdirectory of the output directory named after the configuration, so that switching
+   between configurations doesn’t invalidate the outputs of other configurations.
+   """
+
+   # See Configuration.debug_info.
+   _debug_info = None
+   # Configuration instances, by name.
+   _instances = {}
+   # See Configuration.name.
+   _name = None
+   # See Configuration.optimize.
+   _optimize = None
+
+   def __init__(self, name, optimize, debug_info):
+      """Constructor.
+
+      str name
+         Name of the configuration.
+      bool optimize
+         True to optimize the generated code and disable debug code, or False to do the opposite.
+      bool debug_info
+         True to generate debug information.
+      """
+
+      self._debug_info = debug_info
+      self._name = name
+      self._optimize = optimize
+      self._instances[name] = self
+
+   def __repr__(self):
+      return self._name
+
+   def _get_debug_info(self):
+      return self._debug_info
+
+   debug_info = property(_get_debug_info, doc="""True if debug information is generated.""")
+
+   @classmethod
+   def from_name(cls, name):
+      """Returns the configuration with the specified name.
+
+      str name
+         Name of the configuration.
+      comk.configuration.Configuration return
+         Corresponding configuration.
+      """
+
+      configuration = cls._instances.get(name)
+      if not configuration:
+         raise ValueError('unknown configuration: {}'.format(name))
+      return configuration
+
+   def get_output_dir(self, base_output_dir, lto=False, pgo=None):
+      """Returns the directory where outputs for this configuration are generated.
+
+      str base_output_dir
+         Output directory selected by the user.
+      bool lto
+         If True, the outputs are built with link-time optimization, which requires a separate directory.
+      int pgo
+         Profile-guided optimization phase the outputs are built for (PGO_INSTRUMENT or PGO_OPTIMIZE), which
+         requires a separate directory, or None if profile-guided optimization is not used.
+      str return
+         Output directory for the configuration.
+      """
+
+      subdir = self._name
+      if lto:
+         subdir += '-lto'
+      if pgo == PGO_INSTRUMENT:
+         subdir += '-pgo-instr'
+      elif pgo == PGO_OPTIMIZE:
+         subdir += '-pgo'
+      elif not lto and self is Configuration.DEBUG:
+         return base_output_dir
+      return os.path.join(base_output_dir, subdir)
+
+   def _get_name(self):
+      return self._name
+
+   name = property(_get_name, doc="""Name of the configuration.""")
+
+   @classmethod
+   def names(cls):
+      """Returns the names of all the configurations.
+
+      list(str+) return
+         Configuration names, sorted.
+      """
+
+      return sorted(cls._instances.keys())
+
+   def _get_optimize(self):
+      return self._optimize
+
+   optimize = property(_get_optimize, doc="""
+      True if the generated code is optimized and debug code (e.g. assertions) is disabled, or False to
+      generate unoptimized code with debug code enabled.
+   """)
+
+# Profile-guided optimization phases (see comk.core.Core.pgo).
+PGO_INSTRUMENT = 1
+PGO_OPTIMIZE   = 2
+
+Configuration.DEBUG                   = Configuration('debug',                   False, True )
+Configuration.RELEASE                 = Configuration('release',                 True,  False)
+Configuration.RELEASE_WITH_DEBUG_INFO = Configuration('release-with-debug-info', True,  True )
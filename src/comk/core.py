@@ -23,12 +23,15 @@ import re
 import shutil
 import sys
 
+import comk.configuration
 import comk.job
 import comk.logging
 import comk.metadata
 import comk.platform
 import comk.project
 import comk.target
+import comk.tool
+import comk.toolcache
 
 if sys.hexversion >= 0x03000000:
    basestring = str
@@ -55,6 +58,14 @@ class Core(object):
       core.build((target, ))
    """
 
+   # See Core.build_order.
+   _build_order = None
+   # See Core.build_plan.
+   _build_plan = None
+   # See Core.compile_cache.
+   _compile_cache = None
+   # See Core.configuration.
+   _configuration = None
    # See Core.cross_build.
    _cross_build = None
    # See Core.dry_run.
@@ -78,25 +89,49 @@ class Core(object):
    _keep_going = None
    # See Core.log.
    _log = None
+   # See Core.lto.
+   _lto = None
    # See Core.metadata.
    _metadata = None
    # Targets defined in the project that have a name assigned (name -> Target).
    _named_targets = None
    # See Core.output_dir.
    _output_dir = None
+   # See Core.pgo.
+   _pgo = None
+   # See Core.pgo_profile_dir.
+   _pgo_profile_dir = None
+   # See Core.reproducible.
+   _reproducible = None
    # See Core.shared_dir.
    _shared_dir = None
+   # See Core.split_dwarf.
+   _split_dwarf = None
    # Platform under which targets will be executed.
    _target_platform = None
+   # See Core.test_cache.
+   _test_cache = None
    # All targets explicitly or implicitly defined in the project.
    _targets = None
 
    BIN_DIR = 'bin'
+   # Name of the directory, in the shared directory, containing the compile cache (see comk.compilecache).
+   COMPILE_CACHE_DIR = 'compile-cache'
    INCLUDE_DIR = 'include'
    INT_DIR = 'int'
    LIB_DIR = 'lib'
    LOG_DIR = 'log'
+   # Name of the directory, in INT_DIR, where linkers cache the outcome of link-time optimization.
+   LTO_CACHE_DIR = 'lto-cache'
+   # Name of the directory, in INT_DIR, where instrumented binaries store profile data.
+   PGO_PROFILE_DIR = 'pgo-profile'
+   # Path that replaces the shared directory in paths embedded in the outputs of reproducible builds.
+   REPRODUCIBLE_SHARED_DIR = '/comk-shared'
    METADATA_FILE = '.comk-metadata'
+   # Name of the directory, in the shared directory, containing the test cache (see comk.testcache).
+   TEST_CACHE_DIR = 'test-cache'
+   # Name of the tool cache file (see comk.toolcache) in the shared directory.
+   TOOL_CACHE_FILE = 'tool-cache.yml'
 
    # Special value used with get_target_by_*() to indicate that a target not found should result in an
    # exception.
@@ -105,6 +140,10 @@ class Core(object):
    def __init__(self):
       """Constructor."""
 
+      self._build_order = None
+      self._build_plan = None
+      self._compile_cache = None
+      self._configuration = comk.configuration.Configuration.DEBUG
       self._cross_build = None
       self._dry_run = False
       self._external_dependencies = dict()
@@ -116,13 +155,19 @@ class Core(object):
       self._job_runner = comk.job.Runner(self)
       self._keep_going = False
       self._log = comk.logging.Logger(comk.logging.LogGenerator())
+      self._lto = False
       self._metadata = None
       self._named_targets = {}
       self._output_dir = ''
+      self._pgo = None
+      self._pgo_profile_dir = None
       self._project_path = ''
+      self._reproducible = False
       self._shared_dir = None
+      self._split_dwarf = False
       self._target_platform = None
       self._targets = set()
+      self._test_cache = None
 
    def add_external_dependency(self, dep, repo):
       """Records an external dependency.
@@ -173,6 +218,47 @@ class Core(object):
 
       self._targets.add(target)
 
+   def _get_build_order(self):
+      return self._build_order
+
+   build_order = property(_get_build_order, doc="""
+      List of all the targets explicitly or implicitly defined in the project, sorted so that each target comes
+      after all of its dependencies. Computed by validate_dependency_graph().
+   """)
+
+   def _get_build_plan(self):
+      return self._build_plan
+
+   def _set_build_plan(self, build_plan):
+      self._build_plan = build_plan
+
+   build_plan = property(_get_build_plan, _set_build_plan, doc="""
+      comk.plan.BuildPlan instance that will record every job enqueued by the targets being built, or None if
+      no build plan is being generated. Only meaningful in “dry run” mode.
+   """)
+
+   def _get_compile_cache(self):
+      return self._compile_cache
+
+   def _set_compile_cache(self, compile_cache):
+      self._compile_cache = compile_cache
+
+   compile_cache = property(_get_compile_cache, _set_compile_cache, doc="""
+      comk.compilecache.CompileCache instance used to skip compiling sources that were already compiled with
+      the same command line and the same inputs, or None to always compile them. Defaults to None.
+   """)
+
+   def _get_configuration(self):
+      return self._configuration
+
+   def _set_configuration(self, configuration):
+      self._configuration = configuration
+
+   configuration = property(_get_configuration, _set_configuration, doc="""
+      Build configuration (comk.configuration.Configuration instance) that determines how targets are
+      compiled and linked. Defaults to comk.configuration.Configuration.DEBUG.
+   """)
+
    def _get_cross_build(self):
       return self._cross_build
 
@@ -359,6 +445,55 @@ class Core(object):
          raise comk.project.TargetReferenceError('undefined target: {}'.format(name))
       return target
 
+   def get_path_prefix_map(self):
+      """Returns the replacements that reproducible builds make in the absolute paths they embed in their
+      outputs (e.g. in debug information), so that the outputs don’t depend on where the project and the
+      shared directory are located.
+
+      list(tuple(str, str)*) return
+         Absolute path prefixes and their replacements, in order of increasing prefix length; since
+         compilers give precedence to the last matching replacement, this allows the shared directory to be
+         inside the project.
+      """
+
+      prefix_map = [(os.path.abspath(self._project_path or os.curdir), '.')]
+      if self._shared_dir:
+         prefix_map.append((os.path.abspath(self._shared_dir), self.REPRODUCIBLE_SHARED_DIR))
+      prefix_map.sort(key=lambda prefix_and_replacement: len(prefix_and_replacement[0]))
+      return prefix_map
+
+   def get_reproducible_path(self, path):
+      """Returns the form of a path to pass to tools in reproducible builds: relative to the project, unless
+      it’s in the shared directory, in which case it’s left absolute so that it matches the replacement
+      returned by Core.get_path_prefix_map().
+
+      str path
+         Path to convert.
+      str return
+         Converted path.
+      """
+
+      abs_path = self.inproject_path(path)
+      if self._shared_dir:
+         shared_dir = os.path.abspath(self._shared_dir)
+         if abs_path == shared_dir or abs_path.startswith(shared_dir + os.sep):
+            return abs_path
+      try:
+         return os.path.relpath(abs_path, os.path.abspath(self._project_path or os.curdir))
+      except ValueError:
+         # On Windows, a path on a different drive can’t be made relative.
+         return abs_path
+
+   def _init_target_platform_tool_cache(self):
+      """Makes the target platform use the tool cache in the shared directory, unless it already has a tool
+      cache (e.g. because it’s shared with a parent Core).
+      """
+
+      if self._shared_dir and not self._target_platform.tool_cache:
+         self._target_platform.tool_cache = comk.toolcache.ToolCache.load(
+            os.path.join(self._shared_dir, self.TOOL_CACHE_FILE), self._log
+         )
+
    def inproject_path(self, path):
       """Prepends the project’s path to a non-absolute path, leaving absolute paths unchanged.
 
@@ -393,6 +528,14 @@ class Core(object):
 
    log = property(_get_log, doc="""Output log.""")
 
+   def _get_lto(self):
+      return self._lto
+
+   def _set_lto(self, lto):
+      self._lto = lto
+
+   lto = property(_get_lto, _set_lto, doc="""If True, binaries are built with link-time optimization.""")
+
    def _get_metadata(self):
       return self._metadata
 
@@ -423,6 +566,7 @@ class Core(object):
       # Ensure we have a target platform.
       if not self._target_platform:
          self._target_platform = comk.platform.Platform.detect_host()
+         self._init_target_platform_tool_cache()
          self._cross_build = False
 
       parser = comk.project.Parser(self)
@@ -449,6 +593,29 @@ class Core(object):
       except (comk.FileNotFoundErrorCompat, OSError):
          self._metadata = comk.metadata.MetadataStore(self, metadata_file_path)
 
+   def _get_pgo(self):
+      return self._pgo
+
+   def _set_pgo(self, pgo):
+      self._pgo = pgo
+
+   pgo = property(_get_pgo, _set_pgo, doc="""
+      Profile-guided optimization phase targets are built for: comk.configuration.PGO_INSTRUMENT to generate
+      binaries that collect profile data in Core.pgo_profile_dir, comk.configuration.PGO_OPTIMIZE to optimize
+      binaries using that profile data, or None to not use profile-guided optimization.
+   """)
+
+   def _get_pgo_profile_dir(self):
+      return self._pgo_profile_dir
+
+   def _set_pgo_profile_dir(self, pgo_profile_dir):
+      self._pgo_profile_dir = pgo_profile_dir
+
+   pgo_profile_dir = property(_get_pgo_profile_dir, _set_pgo_profile_dir, doc="""
+      Directory where profile data for profile-guided optimization is stored. Only used if Core.pgo is not
+      None.
+   """)
+
    def prepare_external_dependencies(self, update=False):
       """Updates all external dependencies and collects any transitive dependencies.
 
@@ -471,11 +638,28 @@ class Core(object):
 
       print('Dependencies')
       print('------------')
-      for target in self._named_targets.values():
+      # Print the targets in build order, so that each target’s dependencies have already been listed by the
+      # time it’s printed.
+      for target in self._build_order:
          print(str(target))
          target.dump_dependencies('  ')
       print('')
 
+   def prune_build_logs(self, age_max=None, total_size_max=None):
+      """Deletes the build logs older than age_max, then the oldest remaining ones until their total size is
+      within total_size_max.
+
+      float age_max
+         Maximum age of a build log, in seconds, or None if logs don’t expire.
+      int total_size_max
+         Maximum total size of the build logs, in bytes, or None if unlimited.
+      """
+
+      log = self._log
+      log_dir = os.path.join(self._output_dir, self.LOG_DIR)
+      for file_path in comk.logging.prune_build_logs(log_dir, age_max, total_size_max):
+         log(log.LOW, 'prune: deleting {}', file_path)
+
    def _get_project_path(self):
       return self._project_path
 
@@ -484,6 +668,18 @@ class Core(object):
 
    project_path = property(_get_project_path, _set_project_path, doc="""Base path of the project.""")
 
+   def _get_reproducible(self):
+      return self._reproducible
+
+   def _set_reproducible(self, reproducible):
+      self._reproducible = reproducible
+
+   reproducible = property(_get_reproducible, _set_reproducible, doc="""
+      If True, outputs don’t embed the absolute paths of the project or of the shared directory, nor the time
+      of the build, so that building the same sources in different directories or on different machines
+      yields identical outputs (as long as the same tools are used). See Core.get_path_prefix_map().
+   """)
+
    def set_target_platform(self, o):
       """Assigns a target platform, setting self.cross_build accordingly.
 
@@ -505,6 +701,7 @@ class Core(object):
          ).format(type(o)))
       self._target_platform = o
       self._cross_build = (o.system_type() != self._host_platform.system_type())
+      self._init_target_platform_tool_cache()
 
    def _get_shared_dir(self):
       return self._shared_dir
@@ -516,6 +713,18 @@ class Core(object):
       Path where Complemake stores data shared across projects.
    """)
 
+   def _get_split_dwarf(self):
+      return self._split_dwarf
+
+   def _set_split_dwarf(self, split_dwarf):
+      self._split_dwarf = split_dwarf
+
+   split_dwarf = property(_get_split_dwarf, _set_split_dwarf, doc="""
+      If True and the configuration generates debug information, most of it is stored in a separate file for
+      each object file, instead of going through the linker, and binaries are linked with compressed debug
+      information and an index to speed up loading it in GDB.
+   """)
+
    def spawn_child(self):
       """Creates and returns a new instance of Core with similar configuration as self.
 
@@ -524,15 +733,22 @@ class Core(object):
       """
 
       child = Core()
+      child._compile_cache               = self._compile_cache
+      child._configuration               = self._configuration
       child._dry_run                     = self._dry_run
       child._force_build                 = self._force_build
       child._force_test                  = self._force_test
       child._job_runner.running_jobs_max = self._job_runner.running_jobs_max
+      child._job_runner.worker_pool      = self._job_runner.worker_pool
       child._keep_going                  = self._keep_going
       # TODO: inject a “log prefixer” to allow distinguishing the child’s log output from self’s.
       child._log                         = self._log
+      child._lto                         = self._lto
+      child._reproducible                = self._reproducible
       child.set_target_platform(self._target_platform)
       child._shared_dir                  = self._shared_dir
+      child._split_dwarf                 = self._split_dwarf
+      child._test_cache                  = self._test_cache
       return child
 
    def _get_target_platform(self):
@@ -546,52 +762,103 @@ class Core(object):
       Platform under which the generated outputs will execute.
    """)
 
-   def validate_dependency_graph(self):
-      """Ensures that no cycles exist in the targets dependency graph.
+   def _get_test_cache(self):
+      return self._test_cache
+
+   def _set_test_cache(self, test_cache):
+      self._test_cache = test_cache
+
+   test_cache = property(_get_test_cache, _set_test_cache, doc="""
+      comk.testcache.TestResultCache instance used to skip running tests whose inputs are identical to those
+      of a passing run, or None to always run them. Ignored if force_test is True. Defaults to None.
+   """)
 
-      Implemented by performing a depth-first search for back edges in the graph; this is very speed-efficient
-      because it only visits each subtree once.
+   def train_pgo_profile(self, project_file_path, output_dir, training_target_names):
+      """Builds the specified test targets with instrumented binaries and runs them, collecting in
+      self.pgo_profile_dir the profile data that will be used to optimize the binaries built by self.
 
-      See also the recursion step Core._validate_dependency_subtree().
+      The instrumented build is performed by a child Core instance, in a separate output directory; like any
+      other build, it’s incremental, so training targets are only run again if their binaries changed, which
+      in turn leaves the profile data (and therefore the optimized binaries) untouched otherwise.
+
+      str project_file_path
+         Path to the project file.
+      str output_dir
+         Output directory for the instrumented build.
+      iterable(str+) training_target_names
+         Names of the test targets to run as the training workload.
+      bool return
+         True if the profile data was successfully collected, or False otherwise.
       """
 
-      # No previous ancestors considered for the targets enumerated by this function.
-      dependents = []
-      # No subtrees validated yet.
-      validated_subtrees = set()
-      for target in self._targets:
-         if target not in validated_subtrees:
-            self._validate_dependency_subtree(target, dependents, validated_subtrees)
-
-   def _validate_dependency_subtree(self, sub_root_target, dependents, validated_subtrees):
-      """Recursion step for Core.validate_dependency_graph(). Validates a dependency graph subtree rooted in
-      sub_root_target, adding sub_root_target to validated_subtrees in case of success, or raising an
-      exception in case of problems with the subtree.
-
-      comk.target.Target sub_root_target
-         Target at the root of the subtree to validate.
-      list dependents
-         Ancestors of sub_root_target. An ordered set with fast push/pop would be faster, since we performs a
-         lot of lookups in it.
-      set validated_subtrees
-         Subtrees already validated. Used to avoid visiting a subtree more than once.
+      log = self._log
+      log(log.LOW, 'pgo: building instrumented binaries in {}', output_dir)
+      instr_core = self.spawn_child()
+      instr_core._pgo = comk.configuration.PGO_INSTRUMENT
+      instr_core._pgo_profile_dir = self._pgo_profile_dir
+      instr_core._output_dir = output_dir
+      instr_core._project_path = self._project_path
+      instr_core.parse(project_file_path)
+      instr_core.prepare_external_dependencies()
+      if not instr_core.target_platform.get_tool(comk.tool.CxxCompiler).check_pgo_support(instr_core):
+         return False
+      targets = []
+      for target_name in training_target_names:
+         targets.append(instr_core.get_named_target(target_name))
+      if not instr_core.build_targets(targets):
+         return False
+      if self._dry_run:
+         return True
+      log(log.LOW, 'pgo: processing profile data in {}', self._pgo_profile_dir)
+      return instr_core.target_platform.get_tool(comk.tool.CxxCompiler).merge_pgo_profile(
+         instr_core, training_target_names
+      )
+
+   def validate_dependency_graph(self):
+      """Ensures that no cycles exist in the targets dependency graph, and stores in self.build_order a
+      topological sort of the graph.
+
+      Implemented by performing an iterative depth-first search for back edges in the graph, keeping the path
+      from the current root to the current target in an explicit stack instead of recursing; each target and
+      each dependency are only visited once, making this O(targets + dependencies). Since a target is done
+      being visited only after all its dependencies are, appending targets to the build order at that point
+      (post-order) yields a valid build order.
       """
 
-      # Add this target to the dependents. This allows to find back edges and will even reveal if a target
-      # depends on itself.
-      dependents.append(sub_root_target)
-      for dependency_target in sub_root_target.get_dependencies(targets_only=True):
-         for i, dependent_target in enumerate(dependents):
-            if dependent_target is dependency_target:
-               # Back edge found: this dependency creates a cycle. Since dependents[i] is the previous
-               # occurrence of dependency_target as ancestor of sub_root_target, dependents[i:] will yield all
-               # the nodes (targets) in the cycle. Note that dependents does include sub_root_target.
-               raise comk.project.DependencyCycleError(
-                  'dependency graph validation failed, cycle detected:', dependents[i:]
-               )
-         if dependency_target not in validated_subtrees:
-            # Recurse to verify that this dependency’s subtree doesn’t contain cycles.
-            self._validate_dependency_subtree(dependency_target, dependents, validated_subtrees)
-      # Restore the dependents and mark this subtree as validated.
-      del dependents[len(dependents) - 1]
-      validated_subtrees.add(sub_root_target)
+      build_order = []
+      # Targets (and subtrees) already validated.
+      validated_subtrees = set()
+      # Index in path of each target in it. Allows to find back edges in constant time.
+      path_indices = {}
+      for root_target in self._targets:
+         if root_target in validated_subtrees:
+            continue
+         # Each element is a target with an iterator over its dependencies that still need to be visited.
+         path = [(root_target, root_target.get_dependencies(targets_only=True))]
+         path_indices[root_target] = 0
+         while path:
+            target, dependency_targets = path[-1]
+            # Resume iterating over the target’s dependencies, stopping at the first one not yet validated.
+            for dependency_target in dependency_targets:
+               if dependency_target in validated_subtrees:
+                  continue
+               i = path_indices.get(dependency_target)
+               if i is not None:
+                  # Back edge found: this dependency creates a cycle. Since path[i] is the previous occurrence
+                  # of dependency_target as ancestor of target, path[i:] will yield all the nodes (targets) in
+                  # the cycle. Note that path does include target, so this will reveal even a target that
+                  # depends on itself.
+                  raise comk.project.DependencyCycleError(
+                     'dependency graph validation failed, cycle detected:', [o[0] for o in path[i:]]
+                  )
+               # Descend into the dependency’s subtree.
+               path_indices[dependency_target] = len(path)
+               path.append((dependency_target, dependency_target.get_dependencies(targets_only=True)))
+               break
+            else:
+               # All the target’s dependencies have been validated, so the target can be too.
+               path.pop()
+               del path_indices[target]
+               validated_subtrees.add(target)
+               build_order.append(target)
+      self._build_order = build_order
@@ -0,0 +1,90 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.core."""
+
+import sys
+import unittest
+
+import comk.core
+import comk.project
+
+
+##############################################################################################################
+
+class FakeTarget(object):
+   def __init__(self, name, *dependencies):
+      self.dependencies = list(dependencies)
+      self.name = name
+
+   def __str__(self):
+      return self.name
+
+   def get_dependencies(self, targets_only = False):
+      return iter(self.dependencies)
+
+def validate(*targets):
+   core = comk.core.Core()
+   for target in targets:
+      core.add_target(target)
+   core.validate_dependency_graph()
+   return core.build_order
+
+##############################################################################################################
+
+class DependencyCycleTest(unittest.TestCase):
+   def runTest(self):
+      a = FakeTarget('a')
+      b = FakeTarget('b', a)
+      c = FakeTarget('c', b)
+      a.dependencies.append(c)
+      with self.assertRaises(comk.project.DependencyCycleError) as cm:
+         validate(FakeTarget('d', c), c, b, a)
+      # The error lists the targets in the cycle, and only those.
+      self.assertEqual(sorted(str(cm.exception).splitlines()[1:]), ['  a', '  b', '  c'])
+
+      # A target depending on itself is a cycle too.
+      e = FakeTarget('e')
+      e.dependencies.append(e)
+      with self.assertRaises(comk.project.DependencyCycleError):
+         validate(e)
+
+##############################################################################################################
+
+class DiamondBuildOrderTest(unittest.TestCase):
+   def runTest(self):
+      a = FakeTarget('a')
+      b = FakeTarget('b', a)
+      c = FakeTarget('c', a)
+      d = FakeTarget('d', b, c)
+      build_order = validate(d, c, b, a)
+      # Each target appears once, after all its dependencies.
+      self.assertEqual(sorted(build_order, key=str), [a, b, c, d])
+      for i, target in enumerate(build_order):
+         for dependency_target in target.dependencies:
+            self.assertLess(build_order.index(dependency_target), i)
+
+##############################################################################################################
+
+class DeepChainBuildOrderTest(unittest.TestCase):
+   def runTest(self):
+      # Longer than the recursion limit, so a recursive search would overflow the stack.
+      targets = [FakeTarget('0')]
+      for i in range(1, sys.getrecursionlimit() + 100):
+         targets.append(FakeTarget(str(i), targets[-1]))
+      self.assertEqual(validate(*reversed(targets)), targets)
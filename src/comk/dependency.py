@@ -108,7 +108,8 @@ class ExternalProjectDependency(Dependency):
          Output path.
       """
 
-      return os.path.join(self._work_area_path, 'out')
+      core = self._core()
+      return core.configuration.get_output_dir(os.path.join(self._work_area_path, 'out'), core.lto)
 
    def get_path(self, dir):
       """Returns a well-known directory for the project.
@@ -427,6 +428,13 @@ class OutputRerefenceDependency(FileDependencyMixIn, Dependency):
 
 ##############################################################################################################
 
+class PgoProfileDependency(FileDependencyMixIn, Dependency):
+   """Profile data used for profile-guided optimization."""
+
+   pass
+
+##############################################################################################################
+
 class SourceFileDependency(FileDependencyMixIn, Dependency):
    """Source file dependency."""
 
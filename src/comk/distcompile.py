@@ -0,0 +1,777 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Distributed compilation: sends compile jobs to a pool of worker daemons over TCP.
+
+Like distcc, sources are preprocessed locally, so that workers don’t need access to the project or its
+dependencies; the worker only runs the compiler on the self-contained preprocessed source and returns the
+object file and the error output. Preprocessing is limited to directives such as #include (see
+comk.tool.CxxCompiler.CFLAG_PREPROCESS_DIRECTIVES), so that the worker generates the same object, debug info
+and warnings included, as compiling the source locally would. Workers must therefore have the same compiler as
+the machine running Complemake; the version and target of the compilers are compared when the build starts,
+and workers whose compiler doesn’t match the local one are not used.
+
+Messages exchanged with workers are made of a header, a JSON object preceded by its length as a 32-bit big
+endian integer, followed by any binary blobs whose sizes are declared in the header. The client sends one of:
+•  {"request": "info", "compilers": [...]}, to which the worker responds with {"slots": N, "compilers":
+   {...}}, N being the count of compile jobs it runs at the same time, and "compilers" mapping the name of
+   each requested compiler that the worker is allowed to run to its signature (see
+   _get_compiler_signature()), or null if it couldn’t run it;
+•  {"request": "compile", "args": [...], "input_name": ..., "input_size": N, "output_name": ...} followed by
+   the preprocessed source; "args" contains the name of the compiler followed by its flags, to which the
+   worker appends the output and input files. The worker responds with {"ret": ..., "stderr_size": N,
+   "output_size": M} followed by the error output and the object file, or with {"error": "..."} if it can’t
+   run the compiler at all.
+Each connection carries a single request.
+
+comk.distcompile.WorkerPool tracks the workers available to a build, and comk.job.Runner uses it to run
+comk.distcompile.DistributedCompileJob instances, created by comk.tool.CxxCompiler.create_jobs(), on workers
+in addition to its local job slots. Jobs that find no free worker, or whose worker fails, are run locally; a
+worker that fails is not used for the rest of the build.
+
+comk.distcompile.WorkerServer is the worker daemon; it can be started with complemake-worker.py.
+"""
+
+import io
+import json
+import locale
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+import comk
+import comk.job
+
+if sys.hexversion >= 0x03000000:
+   import socketserver as SocketServer
+else:
+   import SocketServer
+
+
+def _get_compiler_signature(file_path):
+   """Identifies the version of a compiler and the system type it generates code for, so that compilers that
+   would generate different code can be told apart.
+
+   str file_path
+      Path to the compiler’s executable, or name to look up in the PATH.
+   str return
+      Signature, or None if the compiler couldn’t be run.
+   """
+
+   lines = []
+   # The first line of --version includes the name of the compiler and its full version, and -dumpmachine
+   # prints the system type it targets.
+   for arg in ('--version', '-dumpmachine'):
+      try:
+         compiler = subprocess.Popen((file_path, arg), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+      except OSError:
+         return None
+      out = compiler.communicate()[0]
+      if compiler.returncode != 0:
+         return None
+      lines.append(out.decode('utf-8', 'replace').split('\n', 1)[0].strip())
+   return '\n'.join(lines)
+
+# Type of the length that precedes each message header.
+_header_size_struct = struct.Struct('>I')
+# Maximum size of a message header, to reject garbage without trying to allocate memory for it.
+_HEADER_SIZE_MAX = 1024 * 1024
+
+def _recv_exact(sock, size):
+   """Receives an exact count of bytes from a socket.
+
+   socket.socket sock
+      Socket to receive from.
+   int size
+      Count of bytes to receive.
+   bytes return
+      Received bytes.
+   """
+
+   chunks = []
+   while size > 0:
+      chunk = sock.recv(min(size, 1024 * 1024))
+      if not chunk:
+         raise WorkerError('connection closed unexpectedly')
+      chunks.append(chunk)
+      size -= len(chunk)
+   return b''.join(chunks)
+
+def _recv_message_header(sock):
+   """Receives a message header from a socket.
+
+   socket.socket sock
+      Socket to receive from.
+   dict(str: object) return
+      Header.
+   """
+
+   header_size, = _header_size_struct.unpack(_recv_exact(sock, _header_size_struct.size))
+   if header_size > _HEADER_SIZE_MAX:
+      raise WorkerError('message header too large')
+   try:
+      header = json.loads(_recv_exact(sock, header_size).decode('utf-8'))
+   except ValueError:
+      raise WorkerError('invalid message header')
+   if not isinstance(header, dict):
+      raise WorkerError('invalid message header')
+   return header
+
+def _send_message(sock, header, *args):
+   """Sends a message to a socket.
+
+   socket.socket sock
+      Socket to send to.
+   dict(str: object) header
+      Header of the message.
+   iterable(bytes*) *args
+      Blobs to send after the header.
+   """
+
+   header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+   sock.sendall(_header_size_struct.pack(len(header_bytes)) + header_bytes)
+   for blob in args:
+      if blob:
+         sock.sendall(blob)
+
+
+##############################################################################################################
+
+class WorkerError(Exception):
+   """Raised when a worker can’t be reached, or doesn’t behave as expected."""
+
+   pass
+
+##############################################################################################################
+
+class Worker(object):
+   """Worker in a WorkerPool."""
+
+   # See Worker.address.
+   _address = None
+   # False once the worker failed, so that it’s no longer used.
+   _alive = None
+   # Count of jobs currently assigned to the worker.
+   _busy_slots = None
+   # Count of jobs the worker can run at the same time.
+   _slots = None
+
+   def __init__(self, address):
+      """Constructor.
+
+      tuple(str, int) address
+         Host and port of the worker.
+      """
+
+      self._address = address
+      self._alive = True
+      self._busy_slots = 0
+      self._slots = 0
+
+   def __str__(self):
+      return '{}:{}'.format(*self._address)
+
+   def _get_address(self):
+      return self._address
+
+   address = property(_get_address, doc="""Host and port of the worker.""")
+
+##############################################################################################################
+
+class WorkerPool(object):
+   """Set of workers available to run compile jobs."""
+
+   # See WorkerPool.compiler_file_path.
+   _compiler_file_path = None
+   # Lock that must be acquired to change the slot counts of the workers.
+   _lock = None
+   # Logger instance.
+   _log = None
+   # Time, in seconds, to wait to connect to a worker.
+   _timeout = None
+   # Workers in the pool.
+   _workers = None
+
+   # Time, in seconds, to wait for a worker to complete a compile job.
+   COMPILE_TIMEOUT = 10 * 60
+   # Default time, in seconds, to wait to connect to a worker.
+   TIMEOUT_DEFAULT = 5.0
+
+   def __init__(self, log, addresses, timeout = TIMEOUT_DEFAULT):
+      """Constructor.
+
+      comk.logging.Logger log
+         Logger instance.
+      iterable(tuple(str, int)*) addresses
+         Host and port of each worker.
+      float timeout
+         Time, in seconds, to wait to connect to a worker.
+      """
+
+      self._compiler_file_path = None
+      self._lock = threading.Lock()
+      self._log = log
+      self._timeout = timeout
+      self._workers = [Worker(address) for address in addresses]
+
+   def acquire(self):
+      """Reserves a slot on the worker with the most free slots.
+
+      comk.distcompile.Worker return
+         Worker whose slot was reserved, or None if no worker has a free slot.
+      """
+
+      with self._lock:
+         best_worker = None
+         best_free_slots = 0
+         for worker in self._workers:
+            free_slots = worker._slots - worker._busy_slots
+            if worker._alive and free_slots > best_free_slots:
+               best_worker = worker
+               best_free_slots = free_slots
+         if best_worker:
+            best_worker._busy_slots += 1
+         return best_worker
+
+   def compile(self, worker, args, input_name, input_contents, output_name):
+      """Runs a compile job on a worker.
+
+      comk.distcompile.Worker worker
+         Worker to use.
+      iterable(str+) args
+         Name of the compiler followed by its flags; the worker adds the input and output files.
+      str input_name
+         Name of the input file.
+      bytes input_contents
+         Contents of the input file.
+      str output_name
+         Name of the output file.
+      tuple(int, bytes, bytes) return
+         Exit code of the compiler, its error output, and the contents of the output file (None unless the
+         compiler succeeded).
+      """
+
+      sock = self._connect(worker)
+      try:
+         _send_message(sock, {
+            'args'       : list(args),
+            'input_name' : input_name,
+            'input_size' : len(input_contents),
+            'output_name': output_name,
+            'request'    : 'compile',
+         }, input_contents)
+         sock.settimeout(self.COMPILE_TIMEOUT)
+         header = _recv_message_header(sock)
+         if 'error' in header:
+            raise WorkerError(header['error'])
+         try:
+            ret = int(header['ret'])
+            stderr = _recv_exact(sock, int(header['stderr_size']))
+            output_size = header.get('output_size')
+            output = _recv_exact(sock, int(output_size)) if output_size is not None else None
+         except (KeyError, TypeError, ValueError):
+            raise WorkerError('invalid response')
+      except (socket.error, socket.timeout) as x:
+         raise WorkerError(str(x))
+      finally:
+         sock.close()
+      return ret, stderr, output
+
+   def _get_compiler_file_path(self):
+      return self._compiler_file_path
+
+   compiler_file_path = property(_get_compiler_file_path, doc="""
+      Path to the local compiler whose signature the workers’ compiler matches, as passed to
+      WorkerPool.probe(). Compile jobs for other compilers must not be sent to the workers.
+   """)
+
+   def _connect(self, worker):
+      """Opens a connection to a worker.
+
+      comk.distcompile.Worker worker
+         Worker to connect to.
+      socket.socket return
+         Connected socket.
+      """
+
+      try:
+         return socket.create_connection(worker.address, self._timeout)
+      except (socket.error, socket.timeout) as x:
+         raise WorkerError(str(x))
+
+   def probe(self, compiler_file_path):
+      """Asks each worker how many jobs it can run at the same time, dropping workers that can’t be reached
+      or whose compiler doesn’t have the same version and target as the local one.
+
+      str compiler_file_path
+         Path to the local compiler. Workers will run the compiler with the same name found in their PATH.
+      int return
+         Total count of slots available.
+      """
+
+      log = self._log
+      self._compiler_file_path = compiler_file_path
+      compiler_name = os.path.basename(compiler_file_path)
+      compiler_signature = _get_compiler_signature(compiler_file_path)
+      for worker in self._workers:
+         try:
+            sock = self._connect(worker)
+            try:
+               _send_message(sock, {'compilers': [compiler_name], 'request': 'info'})
+               header = _recv_message_header(sock)
+            finally:
+               sock.close()
+            worker._slots = max(int(header['slots']), 0)
+            worker_compiler_signature = header.get('compilers', {}).get(compiler_name)
+         except (
+            WorkerError, socket.error, socket.timeout, AttributeError, KeyError, TypeError, ValueError
+         ) as x:
+            self.set_failed(worker, x)
+            continue
+         if not compiler_signature or worker_compiler_signature != compiler_signature:
+            self.set_failed(worker, WorkerError(
+               'its {} has a different version or target than the local one'.format(compiler_name)
+            ))
+            continue
+         log(log.HIGH, 'distcompile: worker {} has {} slots', worker, worker._slots)
+      return self._get_slots()
+
+   def release(self, worker):
+      """Releases a slot reserved with WorkerPool.acquire().
+
+      comk.distcompile.Worker worker
+         Worker whose slot to release.
+      """
+
+      with self._lock:
+         worker._busy_slots -= 1
+
+   def set_failed(self, worker, x):
+      """Stops using a worker after it failed.
+
+      comk.distcompile.Worker worker
+         Worker that failed.
+      Exception x
+         Exception that indicated the failure.
+      """
+
+      with self._lock:
+         if not worker._alive:
+            return
+         worker._alive = False
+      log = self._log
+      log(log.QUIET, 'complemake: worker {} unavailable, compiling locally: {}', worker, x)
+
+   def _get_slots(self):
+      with self._lock:
+         return sum(worker._slots for worker in self._workers if worker._alive)
+
+   slots = property(_get_slots, doc="""Total count of slots of the workers that haven’t failed.""")
+
+##############################################################################################################
+
+class DistributedCompileJob(comk.job.ExternalCmdJob):
+   """Compile job that preprocesses the source locally and has a worker compile it, falling back to running
+   the regular command line locally if the Runner didn’t assign a worker to the job. If the worker fails, the
+   job reports so to the Runner, which will queue it again to run locally.
+   """
+
+   # See AsynchronousJob.distributable.
+   distributable = True
+
+   # Name of the input file on the worker.
+   _input_name = None
+   # Name of the output file on the worker.
+   _output_name = None
+   # Path to the object file to generate.
+   _object_file_path = None
+   # Path to the preprocessed source.
+   _preprocessed_file_path = None
+   # Command line that preprocesses the source into _preprocessed_file_path.
+   _preprocess_args = None
+   # Command line to run on the worker.
+   _remote_args = None
+   # Thread that runs the job on the worker.
+   _remote_thread = None
+   # Exit code of the job, when run on the worker.
+   _ret = None
+   # Pool that _worker belongs to.
+   _worker_pool = None
+
+   def __init__(
+      self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path, worker_pool, preprocess_args,
+      preprocessed_file_path, remote_args, input_name, output_name, object_file_path
+   ):
+      """See ExternalCmdJob.__init__().
+
+      comk.distcompile.WorkerPool worker_pool
+         Pool from which the Runner will pick the worker.
+      iterable(str+) preprocess_args
+         Command-line arguments that preprocess the source into preprocessed_file_path, also generating any
+         dependency file that popen_args would.
+      str preprocessed_file_path
+         Path to the preprocessed source.
+      iterable(str+) remote_args
+         Name of the compiler and flags that compile the preprocessed source on the worker.
+      str input_name
+         Name of the preprocessed source on the worker.
+      str output_name
+         Name of the object file on the worker.
+      str object_file_path
+         Path to the object file, in which the output of the worker will be stored.
+      """
+
+      comk.job.ExternalCmdJob.__init__(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path)
+
+      self._input_name = input_name
+      self._object_file_path = object_file_path
+      self._output_name = output_name
+      self._preprocess_args = preprocess_args
+      self._preprocessed_file_path = preprocessed_file_path
+      self._remote_args = remote_args
+      self._remote_thread = None
+      self._ret = None
+      self._worker_pool = worker_pool
+
+   def get_verbose_command(self):
+      """See ExternalCmdJob.get_verbose_command()."""
+
+      verbose_command = comk.job.ExternalCmdJob.get_verbose_command(self)
+      if self._worker:
+         verbose_command += ' [worker {}]'.format(self._worker)
+      return verbose_command
+
+   def join(self):
+      """See ExternalCmdJob.join()."""
+
+      if self._remote_thread:
+         self._remote_thread.join()
+         # If the worker failed, the job may be started again locally.
+         self._remote_thread = None
+         return self._ret
+      return comk.job.ExternalCmdJob.join(self)
+
+   def _run_remotely(self):
+      """Preprocesses the source and has the worker compile it. Runs in its own thread."""
+
+      ret = None
+      stderr = b''
+      try:
+         # Preprocessing doesn’t take up a local job slot, but it still needs to be limited.
+         with self._runner().preprocessing_semaphore:
+            preprocessor = subprocess.Popen(
+               self._preprocess_args, cwd=self._popen_args.get('cwd'), stdout=subprocess.PIPE,
+               stderr=subprocess.STDOUT
+            )
+            stderr = preprocessor.communicate()[0]
+         if preprocessor.returncode != 0:
+            # Preprocessing errors are compilation errors; no point in trying again locally.
+            ret = preprocessor.returncode
+         else:
+            with io.open(self._get_cwd_path(self._preprocessed_file_path), 'rb') as preprocessed_file:
+               input_contents = preprocessed_file.read()
+            remote_ret, remote_stderr, output = self._worker_pool.compile(
+               self._worker, self._remote_args, self._input_name, input_contents, self._output_name
+            )
+            if remote_ret == 0:
+               object_file_path = self._get_cwd_path(self._object_file_path)
+               temp_file_path = '{}.{}.tmp'.format(object_file_path, os.getpid())
+               with io.open(temp_file_path, 'wb') as object_file:
+                  object_file.write(output or b'')
+               comk.replace_file(temp_file_path, object_file_path)
+            ret = remote_ret
+            stderr += remote_stderr
+      except WorkerError as x:
+         self._worker_pool.set_failed(self._worker, x)
+      except (IOError, OSError) as x:
+         log = self._log
+         log(log.HIGH, 'distcompile: unable to use worker {}: {}', self._worker, x)
+      finally:
+         try:
+            os.unlink(self._get_cwd_path(self._preprocessed_file_path))
+         except (comk.FileNotFoundErrorCompat, OSError):
+            pass
+      self._ret = ret
+      if ret is None:
+         self._worker_failed = True
+         self._runner().job_complete(self)
+         return
+      log = self._log
+      with log.buffered_output(), log.open_build_log(self._stderr_file_path) as stderr_file:
+         for line in stderr.decode(locale.getpreferredencoding(), 'replace').splitlines(True):
+            self._stderr_line_read(line.rstrip('\r\n'))
+            stderr_file.write(line)
+      self._runner().job_complete(self)
+
+   def _get_cwd_path(self, file_path):
+      """Returns a path relative to the directory the job runs in, as a path usable from Complemake.
+
+      str file_path
+         Path relative to the job’s working directory.
+      str return
+         Path usable from Complemake.
+      """
+
+      return os.path.join(self._popen_args.get('cwd') or '', file_path)
+
+   def start(self, runner):
+      """See ExternalCmdJob.start()."""
+
+      if not self._worker:
+         comk.job.ExternalCmdJob.start(self, runner)
+         return
+      comk.job.AsynchronousJob.start(self, runner)
+      self._remote_thread = threading.Thread(target=self._run_remotely)
+      self._remote_thread.start()
+
+##############################################################################################################
+
+class _WorkerRequestHandler(SocketServer.BaseRequestHandler):
+   """Handles a request to a WorkerServer."""
+
+   def handle(self):
+      """See SocketServer.BaseRequestHandler.handle()."""
+
+      server = self.server
+      sock = self.request
+      try:
+         header = _recv_message_header(sock)
+         request = header.get('request')
+         if request == 'info':
+            compilers = header.get('compilers')
+            if not isinstance(compilers, list):
+               compilers = []
+            _send_message(sock, {
+               'compilers': dict(
+                  (str(name), server.get_compiler_signature(str(name)))
+                  for name in compilers if server.is_compiler_allowed(str(name))
+               ),
+               'slots'    : server.slots,
+            })
+         elif request == 'compile':
+            self._handle_compile(header)
+         else:
+            _send_message(sock, {'error': 'unknown request'})
+      except (WorkerError, socket.error, socket.timeout) as x:
+         server.log_message('{}: {}', self.client_address[0], x)
+
+   def _handle_compile(self, header):
+      """Handles a compile request.
+
+      dict(str: object) header
+         Header of the request.
+      """
+
+      server = self.server
+      sock = self.request
+      try:
+         args = [str(arg) for arg in header['args']]
+         input_name = header['input_name']
+         input_size = int(header['input_size'])
+         output_name = header['output_name']
+      except (KeyError, TypeError, ValueError):
+         _send_message(sock, {'error': 'invalid request'})
+         return
+      # Validate the request before receiving the input, which could be large.
+      error = server.check_compile_request(args, input_name, output_name)
+      if not error and not 0 <= input_size <= server.INPUT_SIZE_MAX:
+         error = 'input too large'
+      if error:
+         _send_message(sock, {'error': error})
+         return
+      input_contents = _recv_exact(sock, input_size)
+      with server.slots_semaphore:
+         dir = tempfile.mkdtemp(prefix='complemake-worker-')
+         try:
+            with io.open(os.path.join(dir, input_name), 'wb') as input_file:
+               input_file.write(input_contents)
+            try:
+               compiler = subprocess.Popen(
+                  args + ['-o', output_name, input_name], cwd=dir, stdout=subprocess.PIPE,
+                  stderr=subprocess.STDOUT
+               )
+            except OSError as x:
+               _send_message(sock, {'error': 'unable to run {}: {}'.format(args[0], x)})
+               return
+            stderr = compiler.communicate()[0]
+            ret = compiler.returncode
+            output = None
+            if ret == 0:
+               try:
+                  with io.open(os.path.join(dir, output_name), 'rb') as output_file:
+                     output = output_file.read()
+               except (comk.FileNotFoundErrorCompat, IOError, OSError) as x:
+                  _send_message(sock, {'error': 'no output from {}: {}'.format(args[0], x)})
+                  return
+         finally:
+            shutil.rmtree(dir, ignore_errors=True)
+      server.log_message('{}: {} {} -> {}', self.client_address[0], args[0], input_name, ret)
+      response = {'ret': ret, 'stderr_size': len(stderr)}
+      if output is not None:
+         response['output_size'] = len(output)
+      _send_message(sock, response, stderr, output)
+
+##############################################################################################################
+
+class WorkerServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+   """Worker daemon, running compile jobs sent by Complemake. It doesn’t perform any authentication, so any
+   client that can connect to it can use it; it’s meant to be run on a trusted network.
+
+   Requests are restricted to running the compilers the worker is configured to allow, in a temporary
+   directory, with flags that only affect code generation and diagnostics (see WorkerServer._FLAG_RE);
+   flags that could make the compiler run other programs, load plugins or access files outside the temporary
+   directory (e.g. “@file”, -wrapper, -fplugin, -specs, -B, absolute paths) are rejected.
+   """
+
+   # Don’t wait for request threads to complete when shutting down.
+   daemon_threads = True
+   # Allow restarting the daemon on the same port right away.
+   allow_reuse_address = True
+
+   # Default pattern that the names of the compilers that can be run must match.
+   COMPILER_NAME_RE_DEFAULT = re.compile(r'^(?:c|g|clang)\+\+(?:-[.0-9]+)?$')
+   # Maximum size of the input of a compile request, to reject garbage without trying to allocate memory for
+   # it. Preprocessed sources are seldom larger than a few tens of MiB.
+   INPUT_SIZE_MAX = 256 * 1024 * 1024
+   # Pattern that names of input and output files must match, so they can’t escape the temporary directory.
+   _FILE_NAME_RE = re.compile(r'^[0-9A-Za-z_][-.0-9A-Za-z_]*$')
+   # Pattern that every compiler flag must match. Values can’t contain “/”, so they can’t reference files
+   # outside the temporary directory; the exceptions are prefix maps, which only rewrite paths embedded in the
+   # output, and macro definitions (still needed by Clang; see comk.tool.ClangxxCompiler), which can’t contain
+   # control characters such as new-lines. -Wa, -Wl and -Wp pass arbitrary arguments to other programs, and
+   # -fplugin loads code.
+   _FLAG_RE = re.compile(r'''^(?:
+      -c | -pedantic(?:-errors)? | -pipe | -pthread | -w | -xc\+\+ |
+      -D[A-Za-z_][0-9A-Za-z_]*(?:=[^\x00-\x1f]*)? |
+      -std=[+0-9a-z]+ |
+      -O(?:[0-3gsz]|fast)? |
+      -g[-=0-9a-z]* |
+      -m[0-9a-z][-+.,=0-9A-Za-z_]* |
+      -W(?![alp],)[-+.,=0-9A-Za-z_]* |
+      -f(?!plugin)[-+.,=0-9A-Za-z_]+ |
+      -f(?:debug|file|macro)-prefix-map=.+
+   )$''', re.VERBOSE)
+   # Pattern that the argument of Clang’s -target flag must match.
+   _SYSTEM_TYPE_RE = re.compile(r'^[0-9A-Za-z_][-.0-9A-Za-z_]*$')
+
+   def __init__(self, address = ('127.0.0.1', 0), slots = None, compilers = None, verbose = False):
+      """Constructor.
+
+      tuple(str, int) address
+         Address and port to listen on; port 0 selects any available port.
+      int slots
+         Count of compile jobs to run at the same time. Defaults to the number of processors in the system.
+      iterable(str*) compilers
+         Names of the compiler executables that can be run, which will be looked up in the PATH. If omitted,
+         names matching WorkerServer.COMPILER_NAME_RE_DEFAULT (e.g. “g++”, “clang++-15”) are allowed.
+      bool verbose
+         If True, every request will be logged to stderr.
+      """
+
+      SocketServer.TCPServer.__init__(self, address, _WorkerRequestHandler)
+
+      self.compilers = frozenset(compilers) if compilers else None
+      self.compiler_signatures = {}
+      self.compiler_signatures_lock = threading.Lock()
+      self.slots = slots or multiprocessing.cpu_count()
+      self.slots_semaphore = threading.Semaphore(self.slots)
+      self.verbose = verbose
+
+   def check_compile_request(self, args, input_name, output_name):
+      """Validates a compile request.
+
+      list(str+) args
+         Command-line arguments of the compiler.
+      str input_name
+         Name of the input file.
+      str output_name
+         Name of the output file.
+      str return
+         Reason why the request was rejected, or None if it’s valid.
+      """
+
+      if not args:
+         return 'empty command line'
+      if not self.is_compiler_allowed(args[0]):
+         return 'compiler not allowed: {}'.format(args[0])
+      for name in (input_name, output_name):
+         if not self._FILE_NAME_RE.match(name):
+            return 'invalid file name: {}'.format(name)
+      iter_args = iter(args[1:])
+      for arg in iter_args:
+         if arg == '-target':
+            # Clang’s target system type, as a separate argument.
+            system_type = next(iter_args, '')
+            if not self._SYSTEM_TYPE_RE.match(system_type):
+               return 'invalid system type: {}'.format(system_type)
+         elif not self._FLAG_RE.match(arg):
+            return 'flag not allowed: {}'.format(arg)
+      return None
+
+   def get_compiler_signature(self, name):
+      """Returns the signature of a compiler, detecting it only the first time.
+
+      str name
+         Name of the compiler.
+      str return
+         Signature of the compiler, or None if it couldn’t be run.
+      """
+
+      with self.compiler_signatures_lock:
+         if name not in self.compiler_signatures:
+            self.compiler_signatures[name] = _get_compiler_signature(name)
+         return self.compiler_signatures[name]
+
+   def is_compiler_allowed(self, name):
+      """Checks whether the worker is allowed to run a compiler.
+
+      str name
+         Name of the compiler.
+      bool return
+         True if the compiler can be run, or False otherwise.
+      """
+
+      if self.compilers is not None:
+         return name in self.compilers
+      return bool(self.COMPILER_NAME_RE_DEFAULT.match(name))
+
+   def log_message(self, format, *args):
+      """Logs a message to stderr, if verbose logging was requested.
+
+      str format
+         str.format() format string.
+      iterable(object*) *args
+         Replacement values for format.
+      """
+
+      if self.verbose:
+         sys.stderr.write('complemake-worker: ' + format.format(*args) + '\n')
+
+   def _get_address(self):
+      return '{}:{}'.format(*self.server_address[:2])
+
+   address = property(_get_address, doc="""
+      Address the worker is listening on, in the “host:port” format expected by --worker.
+   """)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.distcompile."""
+
+import io
+import os
+import socket
+import sys
+import unittest
+
+import comk.core
+import comk.distcompile as cdc
+import comk.logging
+import comk.testing
+
+
+##############################################################################################################
+
+class WorkerServerMixIn(comk.testing.ServerMixIn):
+   def _create_server(self):
+      return cdc.WorkerServer(slots=2, compilers=('g++', ))
+
+##############################################################################################################
+
+class WorkerPoolTest(WorkerServerMixIn, unittest.TestCase):
+   def runTest(self):
+      pool = cdc.WorkerPool(comk.logging.Logger(comk.logging.LogGenerator()), [self._server.server_address])
+      self.assertEqual(pool.probe('g++'), 2)
+
+      # Slots are reserved until released.
+      worker = pool.acquire()
+      self.assertIsNotNone(worker)
+      self.assertIs(pool.acquire(), worker)
+      self.assertIsNone(pool.acquire())
+      pool.release(worker)
+      self.assertIs(pool.acquire(), worker)
+
+      ret, stderr, output = pool.compile(
+         worker, ('g++', '-c', '-O2', '-Wall'), 'source.ii', b'int f() { return 1; }\n', 'source.o'
+      )
+      self.assertEqual(ret, 0)
+      self.assertTrue(output)
+
+      # Sources preprocessed only as far as directives go still contain macros, which must be expanded.
+      ret, stderr, output = pool.compile(
+         worker, ('g++', '-c', '-DTWO=2', '-fpreprocessed', '-fdirectives-only'), 'source.ii',
+         b'#define ONE 1\nint f() { return ONE; }\n', 'source.o'
+      )
+      self.assertEqual((ret, stderr), (0, b''))
+      self.assertTrue(output)
+
+      # Compiler errors are reported as such, without any output.
+      ret, stderr, output = pool.compile(
+         worker, ('g++', '-c'), 'source.ii', b'int f() { return; }\n', 'source.o'
+      )
+      self.assertNotEqual(ret, 0)
+      self.assertIn(b'error', stderr)
+      self.assertIsNone(output)
+
+      # Requests to run anything other than an allowed compiler, or to escape the temporary directory, are
+      # rejected.
+      with self.assertRaises(cdc.WorkerError):
+         pool.compile(worker, ('sh', '-c', 'true'), 'source.ii', b'', 'source.o')
+      with self.assertRaises(cdc.WorkerError):
+         pool.compile(worker, ('g++', '-c'), '../source.ii', b'', 'source.o')
+      # So are flags that could make the compiler run other programs or access other files.
+      for args in (
+         ('g++', '-wrapper', 'sh,-c,true'), ('g++', '@args'), ('g++', '-fplugin=x.so'), ('g++', '-specs=x'),
+         ('g++', '-B/tmp'), ('g++', '-Wl,-T,x'), ('g++', '-fdump-tree-all=/tmp/x'), ('g++', '/etc/passwd'),
+         ('g++', '-DX\n#include "/etc/passwd"')
+      ):
+         with self.assertRaises(cdc.WorkerError):
+            pool.compile(worker, args, 'source.ii', b'', 'source.o')
+
+##############################################################################################################
+
+def write_file_args(file_name, contents):
+   """Returns the command-line arguments of a process that writes a file."""
+
+   return [sys.executable, '-c', 'open({!r}, "w").write({!r})'.format(file_name, contents)]
+
+class DistributedCompileJobWorkerFailureTest(WorkerServerMixIn, unittest.TestCase):
+   def runTest(self):
+      core = comk.core.Core()
+      runner = core.job_runner
+      pool = cdc.WorkerPool(core.log, [self._server.server_address])
+      self.assertEqual(pool.probe('g++'), 2)
+      runner.worker_pool = pool
+      runner.running_jobs_max = 1
+      completed = []
+      # The worker will reject the command line.
+      job = cdc.DistributedCompileJob(
+         lambda: completed.append(job._worker), ('C++', 'source.cxx'),
+         {'args': write_file_args('object.o', 'local'), 'cwd': self._dir}, core.log,
+         os.path.join(self._dir, 'source.log'), pool, write_file_args('source.ii', 'int i;'), 'source.ii',
+         ['sh', '-c', 'true'], 'source.ii', 'object.o', 'object.o'
+      )
+      runner.enqueue(job)
+      self.assertIsNotNone(job._worker)
+      runner.run()
+
+      # The job must have been run again locally, and be no longer counted as running on a worker.
+      self.assertEqual(runner.failed_jobs, 0)
+      self.assertEqual(completed, [None])
+      self.assertEqual(runner._running_remote_jobs, 0)
+      with io.open(os.path.join(self._dir, 'object.o'), 'r') as object_file:
+         self.assertEqual(object_file.read(), 'local')
+      # The worker failed, so it must not be used again.
+      self.assertIsNone(pool.acquire())
+
+##############################################################################################################
+
+class WorkerServerCompileRequestTest(WorkerServerMixIn, unittest.TestCase):
+   def send_compile_request(self, args, input_size):
+      """Sends a compile request without any input, returning the header of the response."""
+
+      sock = socket.create_connection(self._server.server_address, 5)
+      try:
+         cdc._send_message(sock, {
+            'args'       : args,
+            'input_name' : 'source.ii',
+            'input_size' : input_size,
+            'output_name': 'source.o',
+            'request'    : 'compile',
+         })
+         return cdc._recv_message_header(sock)
+      finally:
+         sock.close()
+
+   def runTest(self):
+      # Invalid requests and oversized inputs must be rejected without waiting for the input, which is never
+      # sent; a timeout would raise socket.timeout instead.
+      self.assertEqual(
+         self.send_compile_request(['sh', '-c', 'true'], 10), {'error': 'compiler not allowed: sh'}
+      )
+      self.assertEqual(
+         self.send_compile_request(['g++', '-c'], cdc.WorkerServer.INPUT_SIZE_MAX + 1),
+         {'error': 'input too large'}
+      )
+
+##############################################################################################################
+
+class WorkerPoolCompilerMismatchTest(WorkerServerMixIn, unittest.TestCase):
+   def runTest(self):
+      # A local “g++” reporting a different version than the worker’s.
+      compiler_file_path = os.path.join(self._dir, 'g++')
+      with open(compiler_file_path, 'w') as compiler_file:
+         compiler_file.write('#!/bin/sh\necho "g++ (Complemake) 0.1"\n')
+      os.chmod(compiler_file_path, 0o755)
+
+      pool = cdc.WorkerPool(comk.logging.Logger(comk.logging.LogGenerator()), [self._server.server_address])
+      self.assertEqual(pool.probe(compiler_file_path), 0)
+      self.assertIsNone(pool.acquire())
+
+##############################################################################################################
+
+class WorkerPoolUnreachableTest(unittest.TestCase):
+   def runTest(self):
+      # Get a port that nothing is listening on.
+      server = cdc.WorkerServer()
+      address = server.server_address
+      server.server_close()
+
+      pool = cdc.WorkerPool(comk.logging.Logger(comk.logging.LogGenerator()), [address], timeout=1)
+      self.assertEqual(pool.probe('g++'), 0)
+      self.assertIsNone(pool.acquire())
@@ -37,7 +37,9 @@ executed, and the resulting counts are used to display a test summary at the end
 TODO: link to documentation for lofty::testing support in Complemake.
 """
 
+import collections
 import io
+import mmap
 import multiprocessing
 import os
 import struct
@@ -57,8 +59,12 @@ class Job(object):
    external command execution in Complemake.
    """
 
+   # See Job.duration.
+   _duration = None
    # Function to call when the job completes.
    _on_complete_fn = None
+   # Time at which the job was started, as returned by time.time().
+   _start_time = None
 
    def __init__(self, on_complete_fn):
       """Constructor.
@@ -67,7 +73,25 @@ class Job(object):
          Function to be called when the job completes.
       """
 
+      self._duration = None
       self._on_complete_fn = on_complete_fn
+      self._start_time = None
+
+   def _get_duration(self):
+      return self._duration
+
+   duration = property(_get_duration, doc="""
+      Time, in seconds, that the job took to run, or None if the job has not been run (yet).
+   """)
+
+   def get_command_args(self):
+      """Returns the command-line arguments of the external program run by the job, if any.
+
+      list(str*) return
+         Command-line arguments, or None if the job doesn’t run an external program.
+      """
+
+      return None
 
    def get_quiet_command(self):
       """Returns a command summary for Core to print out in quiet mode.
@@ -112,11 +136,81 @@ class SynchronousJob(Job):
 
 ##############################################################################################################
 
+class FileWriterJob(SynchronousJob):
+   """Writes a generated text file, leaving it untouched if it already has the desired contents, so that
+   targets depending on it are not rebuilt needlessly.
+   """
+
+   # Contents of the file.
+   _contents = None
+   # Path to the file to write.
+   _file_path = None
+   # Logger.
+   _log = None
+
+   def __init__(self, on_complete_fn, file_path, contents, log):
+      """Constructor.
+
+      callable on_complete_fn
+         Function to be called when the job completes.
+      str file_path
+         Path to the file to write.
+      str contents
+         Contents to write to the file.
+      comk.logging.Logger log
+         Object to which errors should be logged.
+      """
+
+      SynchronousJob.__init__(self, on_complete_fn)
+
+      self._contents = contents.encode('utf-8')
+      self._file_path = file_path
+      self._log = log
+
+   def get_quiet_command(self):
+      """See SynchronousJob.get_quiet_command()."""
+
+      return 'GEN', self._file_path
+
+   def get_verbose_command(self):
+      """See SynchronousJob.get_verbose_command()."""
+
+      return 'generate {}'.format(self._file_path)
+
+   def run(self):
+      """See SynchronousJob.run()."""
+
+      try:
+         with io.open(self._file_path, 'rb') as file:
+            if file.read() == self._contents:
+               return 0
+      except comk.FileNotFoundErrorCompat:
+         pass
+      try:
+         comk.makedirs(os.path.dirname(self._file_path))
+         with io.open(self._file_path, 'wb') as file:
+            file.write(self._contents)
+      except (IOError, OSError) as x:
+         log = self._log
+         log(log.QUIET, 'complemake: unable to write {}: {}', self._file_path, x)
+         return 1
+      return 0
+
+##############################################################################################################
+
 class AsynchronousJob(Job):
    """Job that is executed asynchronously, typically in a separate process."""
 
+   # If True, the job can be run on a worker of Runner.worker_pool instead of taking up a local job slot.
+   distributable = False
+
    # Weak reference to the comk.job.Runner that called start().
    _runner = None
+   # comk.distcompile.Worker assigned to the job by the Runner, if any; only set for distributable jobs.
+   _worker = None
+   # Set by a distributable job to True before reporting its completion if _worker failed to run it, so that
+   # the Runner will queue it again to run locally.
+   _worker_failed = None
 
    def __init__(self, on_complete_fn):
       """See Job.__init__()."""
@@ -124,6 +218,8 @@ class AsynchronousJob(Job):
       Job.__init__(self, on_complete_fn)
 
       self._runner = None
+      self._worker = None
+      self._worker_failed = False
 
    def join(self):
       """Waits for any outstanding processes or threads related to the job, returning the job’s exit code.
@@ -147,7 +243,9 @@ class ExternalCmdJob(AsynchronousJob):
    """Invokes an external program, capturing stdout and stderr.
 
    The standard output is made available to subclasses via the overridable _stdout_chunk_read(). The default
-   implementation of _stdout_chunk_read() doesn’t do anything.
+   implementation of _stdout_chunk_read() doesn’t do anything, so unless stderr is merged into it, stdout is
+   redirected to the null device instead of being read; subclasses can redirect it elsewhere, or have it read,
+   by overriding _get_stdout_redirect().
 
    The error output is published via the overridable _stderr_line_read() and saved to the file path passed to
    the constructor. The default implementation of _stderr_line_read() logs everything, but this can be
@@ -169,6 +267,9 @@ class ExternalCmdJob(AsynchronousJob):
    # Thread that reads from the job process’ stdout.
    _stdout_reader_thread = None
 
+   # Size of the chunks read from the job process’ stdout.
+   STDOUT_CHUNK_SIZE = 64 * 1024
+
    def __init__(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path):
       """See AsynchronousJob.__init__().
 
@@ -209,6 +310,11 @@ class ExternalCmdJob(AsynchronousJob):
       if stdout is not subprocess.PIPE:
          raise ValueError('invalid value for popen_args[\'stdout\']')
 
+   def get_command_args(self):
+      """See AsynchronousJob.get_command_args()."""
+
+      return list(self._popen_args['args'])
+
    def get_quiet_command(self):
       """See AsynchronousJob.get_quiet_command()."""
 
@@ -244,9 +350,7 @@ class ExternalCmdJob(AsynchronousJob):
          # Create a 3.x text I/O object for the 2.x file opened by subprocess.Popen.
          stderr_text_pipe = io.open(err_out.fileno(), 'r', closefd=False)
       del err_out
-      # Make sure that the directory in which we’ll write stdout exists.
-      comk.makedirs(os.path.dirname(self._stderr_file_path))
-      with io.open(self._stderr_file_path, 'w', errors='replace') as stderr:
+      with self._log.buffered_output(), self._log.open_build_log(self._stderr_file_path) as stderr:
          for line in stderr_text_pipe:
             self._stderr_line_read(line.rstrip('\r\n'))
             stderr.write(line)
@@ -267,7 +371,7 @@ class ExternalCmdJob(AsynchronousJob):
       else:
          stdout_raw = self._popen.stdout
       while True:
-         by = stdout_raw.read(io.DEFAULT_BUFFER_SIZE)
+         by = stdout_raw.read(self.STDOUT_CHUNK_SIZE)
          if not by:
             # EOF. Rely on _read_stderr() to call _runner.job_complete().
             break
@@ -278,11 +382,25 @@ class ExternalCmdJob(AsynchronousJob):
 
       AsynchronousJob.start(self, runner)
 
-      self._popen = subprocess.Popen(**self._popen_args)
+      if self._popen_args['stderr'] is subprocess.STDOUT:
+         # stdout must be read to get stderr.
+         stdout_redirect = None
+      else:
+         stdout_redirect = self._get_stdout_redirect()
+      if stdout_redirect:
+         # Let the process write directly to the file; the process has its own copy of the file descriptor.
+         popen_args = dict(self._popen_args)
+         popen_args['stdout'] = stdout_redirect
+         try:
+            self._popen = subprocess.Popen(**popen_args)
+         finally:
+            stdout_redirect.close()
+      else:
+         self._popen = subprocess.Popen(**self._popen_args)
       # Start the I/O threads.
       self._stderr_reader_thread = threading.Thread(target=self._read_stderr)
       self._stderr_reader_thread.start()
-      if self._popen_args['stderr'] is not subprocess.STDOUT:
+      if self._popen_args['stderr'] is not subprocess.STDOUT and not stdout_redirect:
          self._stdout_reader_thread = threading.Thread(target=self._read_stdout)
          self._stdout_reader_thread.start()
 
@@ -293,6 +411,19 @@ class ExternalCmdJob(AsynchronousJob):
       Path to the file to which the error output of the process is saved.
    """)
 
+   def _get_stdout_redirect(self):
+      """Returns a file to which the process should write its stdout directly, instead of having it read via
+      _stdout_chunk_read(). Not called if stderr is merged into stdout.
+
+      The default implementation returns the null device, since _stdout_chunk_read() doesn’t do anything.
+
+      file return
+         File object, which will be closed after starting the process, or None to have stdout read via
+         _stdout_chunk_read().
+      """
+
+      return io.open(os.devnull, 'wb')
+
    def _stderr_line_read(self, line):
       """Internal method invoked for each stderr line read.
 
@@ -324,16 +455,34 @@ class ExternalCmdCapturingJob(ExternalCmdJob):
 
    Internally, separate threads communicate with the process through the pipes, joining the main thread when
    the process terminates.
+
+   Unless disabled, stdout is also collected in memory, so that it can be accessed without reading back the
+   file; if it grows larger than ExternalCmdCapturingJob.STDOUT_IN_MEMORY_MAX, it’s only kept in the file,
+   which will then be memory-mapped on access. Alternatively, stdout can be compared against a file while it’s
+   being read, via a comk.compare.StreamComparator instance.
    """
 
+   # Maximum size of the output to keep in memory.
+   STDOUT_IN_MEMORY_MAX = 4 * 1024 * 1024
+
    # Collects the job process’ output on disk.
    _stdout = None
-   # See ExternalCmdCapturingJob.stdout.
-   _stdout_bytes = None
+   # Collects the job process’ output in memory, or None if not collecting it (anymore).
+   _stdout_buffer = None
+   # See ExternalCmdCapturingJob.stdout_comparator.
+   _stdout_comparator = None
    # See ExternalCmdCapturingJob.stdout_file_path.
    _stdout_file_path = None
-
-   def __init__(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path, stdout_file_path):
+   # If True, the output should be made available via ExternalCmdCapturingJob.stdout.
+   _stdout_kept = None
+   # Mapping of the output file returned by ExternalCmdCapturingJob.stdout, if the output was too large to be
+   # kept in memory.
+   _stdout_map = None
+
+   def __init__(
+      self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path, stdout_file_path, keep_stdout=True,
+      stdout_comparator=None
+   ):
       """See ExternalCmdJob.__init__().
 
       callable on_complete_fn
@@ -348,40 +497,95 @@ class ExternalCmdCapturingJob(ExternalCmdJob):
          Path to the file where the stderr of the process will be saved.
       str stdout_file_path
          Path to the file where the stdout of the process will be saved.
+      bool keep_stdout
+         If True, the output of the process will be available via ExternalCmdCapturingJob.stdout once the job
+         completes; if False, it will only be saved to stdout_file_path.
+      comk.compare.StreamComparator stdout_comparator
+         If not None, the output of the process will be fed to this object as it’s read.
       """
 
       ExternalCmdJob.__init__(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path)
 
-      self._stdout_bytes = None
       self._stdout = None
+      self._stdout_buffer = None
+      self._stdout_comparator = stdout_comparator
       self._stdout_file_path = stdout_file_path
+      self._stdout_kept = keep_stdout
+      self._stdout_map = None
 
    def join(self):
-      """See ExternalCmdJob.join(). Overridden to make sure we close _stdout."""
+      """See ExternalCmdJob.join(). Overridden to make sure we close _stdout, as well as _stdout_comparator
+      if the process failed.
+      """
 
       ret = ExternalCmdJob.join(self)
 
-      if self._popen:
+      if self._stdout:
          # Note that at this point, _stdout_chunk_read() won’t be called again.
          self._stdout.close()
          self._stdout = None
+      if ret and self._stdout_comparator:
+         # The on_complete handler, which would otherwise close the comparator, won’t be invoked for a failed
+         # job.
+         self._stdout_comparator.close()
       return ret
 
+   def on_complete(self):
+      """See ExternalCmdJob.on_complete(). Overridden to unmap the output file once the on_complete handler no
+      longer needs it.
+      """
+
+      try:
+         ExternalCmdJob.on_complete(self)
+      finally:
+         if self._stdout_map is not None:
+            self._stdout_map.close()
+            self._stdout_map = None
+
    def start(self, runner):
       """See ExternalCmdCapturingJob.start()."""
 
       # Make sure that the directory in which we’ll write stdout exists.
       comk.makedirs(os.path.dirname(self._stdout_file_path))
       # Initialize buffering stdout in memory and on disk.
-      self._stdout_bytes = b''
+      if self._stdout_kept:
+         self._stdout_buffer = bytearray()
       self._stdout = io.open(self._stdout_file_path, 'wb')
 
       return ExternalCmdJob.start(self, runner)
 
-   def _get_stdout(self):
-      return self._stdout_bytes
+   def _get_stdout_redirect(self):
+      """See ExternalCmdJob._get_stdout_redirect(). Overridden to have the process write directly to the
+      stdout file, unless stdout needs to be kept or compared.
+      """
 
-   stdout = property(_get_stdout, doc="""Collected output of the process.""")
+      if self._stdout_kept or self._stdout_comparator:
+         return None
+      # ExternalCmdJob.start() will close the file once the process has inherited it.
+      stdout = self._stdout
+      self._stdout = None
+      return stdout
+
+   def _get_stdout(self):
+      if not self._stdout_kept:
+         return None
+      if self._stdout_buffer is not None:
+         return bytes(self._stdout_buffer)
+      if self._stdout_map is None:
+         # The output was too large to keep in memory, so map the file it was saved to.
+         with io.open(self._stdout_file_path, 'rb') as stdout:
+            if os.fstat(stdout.fileno()).st_size == 0:
+               # Empty files cannot be mapped.
+               return b''
+            # The mapping remains valid after closing the file.
+            self._stdout_map = mmap.mmap(stdout.fileno(), 0, access=mmap.ACCESS_READ)
+      return self._stdout_map
+
+   stdout = property(_get_stdout, doc="""
+      Collected output of the process: a bytes instance if small enough to be kept in memory, or an mmap.mmap
+      instance mapping the file it was saved to otherwise, valid until the on_complete handler returns. None
+      if the job was constructed with keep_stdout=False.
+   """)
 
    def _stdout_chunk_read(self, chunk_bytes):
       """See ExternalCmdJob._stdout_chunk_read(). Overridden to accumulate stdout in a member variable, so
@@ -389,9 +593,23 @@ class ExternalCmdCapturingJob(ExternalCmdJob):
       it to.
       """
 
-      self._stdout_bytes += chunk_bytes
+      if self._stdout_buffer is not None:
+         if len(self._stdout_buffer) + len(chunk_bytes) <= self.STDOUT_IN_MEMORY_MAX:
+            self._stdout_buffer += chunk_bytes
+         else:
+            # Too large: stop collecting the output in memory, and rely on the file instead.
+            self._stdout_buffer = None
+      if self._stdout_comparator:
+         self._stdout_comparator.feed(chunk_bytes)
       self._stdout.write(chunk_bytes)
 
+   def _get_stdout_comparator(self):
+      return self._stdout_comparator
+
+   stdout_comparator = property(_get_stdout_comparator, doc="""
+      comk.compare.StreamComparator instance the output of the process is fed to, or None.
+   """)
+
    def _get_stdout_file_path(self):
       return self._stdout_file_path
 
@@ -414,9 +632,24 @@ class LoftyTestJob(ExternalCmdCapturingJob):
    _stdout = None
    # See ExternalCmdCapturingJob.stdout_file_path.
    _stdout_file_path = None
+   # See LoftyTestJob.test_case_results.
+   _test_case_results = None
    # Count of test assertions performed for the current test case.
    _total_test_assertions = None
 
+   def __init__(
+      self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path, stdout_file_path, keep_stdout=True,
+      stdout_comparator=None
+   ):
+      """See ExternalCmdCapturingJob.__init__()."""
+
+      ExternalCmdCapturingJob.__init__(
+         self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path, stdout_file_path, keep_stdout,
+         stdout_comparator
+      )
+
+      self._test_case_results = []
+
    def _stderr_line_read(self, line):
       """See ExternalCmdCapturingJob._stderr_line_read(). Overridden to interpret information sent by the
       lofty::testing framework and only show errors (the program’s stderr file log will still contain the
@@ -445,6 +678,9 @@ class LoftyTestJob(ExternalCmdCapturingJob):
             self._log.add_testcase_result(
                self._curr_test_case, self._total_test_assertions, self._failed_test_assertions
             )
+            self._test_case_results.append(
+               (self._curr_test_case, self._total_test_assertions, self._failed_test_assertions)
+            )
             if self._failed_test_assertions:
                # Show the title of the failed test case.
                line = u'test case failed: {}'.format(self._curr_test_case)
@@ -456,13 +692,27 @@ class LoftyTestJob(ExternalCmdCapturingJob):
          # self._quiet_cmd[1] is the test name.
          self._log(None, u'{}: {}', self._quiet_cmd[1], line)
 
+   def _get_test_case_results(self):
+      return self._test_case_results
+
+   test_case_results = property(_get_test_case_results, doc="""
+      Results of the test cases executed so far, as a list of (title, total assertions, failed assertions)
+      tuples.
+   """)
+
 ##############################################################################################################
 
 class Runner(object):
    """Manages the execution of jobs for Complemake. It contains a queue to which jobs are pushed, and offers a
    method to process the queue, run().
+
+   The runner also drives the build of targets: instead of directly invoking each other’s methods, which for
+   large dependency graphs would recurse as deep as the graph itself, targets advance their state by asking the
+   runner to call them back via defer(); run() will process these calls one at a time, in FIFO order.
    """
 
+   # Calls deferred via Runner.defer(), as (callable, args) tuples.
+   _deferred_calls = None
    # Count of failed jobs.
    _failed_jobs = None
    # Type of a message written to/read from the jobs status queue.
@@ -477,12 +727,21 @@ class Runner(object):
    _core = None
    # Changed from True to False when a job fails and keep_going mode is not enabled.
    _process_queue = True
+   # Distributable jobs queued to be run; kept separate from _queued_jobs because they can also be started
+   # when no local job slot is free.
+   _queued_distributable_jobs = None
    # Jobs queued to be run.
    _queued_jobs = None
+   # See Runner.preprocessing_semaphore.
+   _preprocessing_semaphore = None
    # Maps the ID of running jobs with the corresponding Job instances.
    _running_jobs = None
    # See Runner.running_jobs_max
    _running_jobs_max = None
+   # Count of running jobs that were assigned a worker, and therefore don’t take up a local job slot.
+   _running_remote_jobs = None
+   # See Runner.worker_pool.
+   _worker_pool = None
 
    def __init__(self, core):
       """Constructor.
@@ -491,14 +750,19 @@ class Runner(object):
          Core instance.
       """
 
+      self._deferred_calls = collections.deque()
       self._failed_jobs = 0
       self._jobs_status_queue_read, self._jobs_status_queue_write = os.pipe()
       self._jobs_status_queue_write_lock = threading.Lock()
       self._core = weakref.ref(core)
       self._process_queue = True
+      self._queued_distributable_jobs = set()
       self._queued_jobs = set()
       self._running_jobs = {}
       self._running_jobs_max = multiprocessing.cpu_count()
+      self._preprocessing_semaphore = threading.Semaphore(self._running_jobs_max)
+      self._running_remote_jobs = 0
+      self._worker_pool = None
 
    def __del__(self):
       """Destructor."""
@@ -516,6 +780,8 @@ class Runner(object):
          Exit code of the job.
       """
 
+      if job._start_time is not None:
+         job._duration = time.time() - job._start_time
       if ret == 0:
          job.on_complete()
       else:
@@ -535,13 +801,27 @@ class Runner(object):
          Job that’s about to start.
       """
 
-      log = self._core().log
+      core = self._core()
+      if not core.dry_run:
+         job._start_time = time.time()
+      log = core.log
       if log.verbosity >= log.LOW:
          log(log.LOW, '{}', job.get_verbose_command())
       else:
          quiet_command = job.get_quiet_command()
          log(log.QUIET, '{} {}', log.qm_tool_name(quiet_command[0]), ' '.join(quiet_command[1:]))
 
+   def defer(self, fn, *args):
+      """Schedules a function to be called by run() after any calls previously deferred.
+
+      callable fn
+         Function to call.
+      iterable(object*) *args
+         Arguments to pass to fn.
+      """
+
+      self._deferred_calls.append((fn, args))
+
    def enqueue(self, job):
       """Adds a job to the job execution queue, or executes it immediately if it’s a synchronous one.
 
@@ -563,12 +843,14 @@ class Runner(object):
          self._after_job_end(job, ret)
       else:
          # If there’s a free job slot, start the job now, otherwise queue it for later.
-         if len(self._running_jobs) < self._running_jobs_max:
-            log(log.HIGH, 'scheduler: starting asynchronous job id={}', id(job))
-            self._start_asynchronous_job(job)
+         if self._process_queue and self._start_asynchronous_job(job):
+            log(log.HIGH, 'scheduler: started asynchronous job id={}', id(job))
          else:
             log(log.HIGH, 'scheduler: enqueueing asynchronous job')
-            self._queued_jobs.add(job)
+            if job.distributable:
+               self._queued_distributable_jobs.add(job)
+            else:
+               self._queued_jobs.add(job)
 
    def _get_failed_jobs(self):
       return self._failed_jobs
@@ -599,7 +881,12 @@ class Runner(object):
 
       log = self._core().log
       self._process_queue = True
-      while self._running_jobs:
+      while True:
+         # Let targets make progress; this may enqueue new jobs, and in “dry run” mode even complete them.
+         self._run_deferred_calls()
+         if not self._running_jobs:
+            break
+
          log(log.MEDIUM, 'scheduler: waiting for a job to complete')
          # This is blocking.
          job = self._wait_for_job_complete()
@@ -607,25 +894,52 @@ class Runner(object):
          # job reported that it just terminated: wait on its threads/processes, and let it run its on_complete
          # handler.
          ret = job.join()
-         self._after_job_end(job, ret)
+         if job._worker:
+            self._worker_pool.release(job._worker)
+            self._running_remote_jobs -= 1
+            if job._worker_failed:
+               # Run the job again, this time in a local job slot.
+               log(log.HIGH, 'scheduler: re-enqueueing job id={} to run locally', id(job))
+               job._worker = None
+               job._worker_failed = False
+               self._queued_jobs.add(job)
+               ret = None
+         if ret is not None:
+            self._after_job_end(job, ret)
          # Release the Job instance.
          del job
 
-         # If there’s another job in the queue (which may have been just added by the on_complete handler),
-         # start it now.
+         # If there are other jobs in the queue (which may have been just added by the on_complete handler),
+         # start as many as the free slots allow.
          if self._process_queue:
-            if self._queued_jobs:
-               log(log.MEDIUM, 'scheduler: starting queued job')
-               self._start_asynchronous_job(self._queued_jobs.pop())
+            self._start_queued_jobs()
          else:
             # TODO: the build failed, stop all running jobs.
             pass
 
+   def _run_deferred_calls(self):
+      """Calls, in order, all the functions passed to defer(), including any deferred while doing so."""
+
+      deferred_calls = self._deferred_calls
+      while deferred_calls:
+         fn, args = deferred_calls.popleft()
+         fn(*args)
+
+   def _get_preprocessing_semaphore(self):
+      return self._preprocessing_semaphore
+
+   preprocessing_semaphore = property(_get_preprocessing_semaphore, doc="""
+      threading.Semaphore that distributable jobs assigned a worker must hold while preprocessing locally, so
+      that no more than running_jobs_max preprocessors run at the same time, even though these jobs don’t take
+      up local job slots.
+   """)
+
    def _get_running_jobs_max(self):
       return self._running_jobs_max
 
    def _set_running_jobs_max(self, max_running_jobs):
       self._running_jobs_max = max_running_jobs
+      self._preprocessing_semaphore = threading.Semaphore(max_running_jobs)
 
    running_jobs_max = property(_get_running_jobs_max, _set_running_jobs_max, doc="""
       Maximum count of running jobs, i.e. degree of parallelism. Defaults to the number of processors in the
@@ -633,15 +947,66 @@ class Runner(object):
    """)
 
    def _start_asynchronous_job(self, job):
-      """Starts an asynchrnous job, calling _before_job_start() and adding the job to _running_jobs.
+      """Starts an asynchrnous job if there’s a free slot for it, calling _before_job_start() and adding the
+      job to _running_jobs. Distributable jobs are preferably assigned a worker from worker_pool, falling back
+      to a local job slot.
 
       comk.job.AsynchronousJob job
          Job to start.
+      bool return
+         True if the job was started, or False if there are no free slots for it.
       """
 
+      worker = None
+      if job.distributable and self._worker_pool:
+         worker = self._worker_pool.acquire()
+      if worker:
+         self._running_remote_jobs += 1
+      elif not self._has_free_local_slot():
+         return False
+      job._worker = worker
       self._before_job_start(job)
       job.start(self)
       self._running_jobs[id(job)] = job
+      return True
+
+   def _has_free_local_slot(self):
+      """Returns True if a job could be started without assigning it a worker.
+
+      bool return
+         True if fewer than running_jobs_max jobs are running locally, or False otherwise.
+      """
+
+      return len(self._running_jobs) - self._running_remote_jobs < self._running_jobs_max
+
+   def _start_queued_jobs(self):
+      """Starts as many queued jobs as the free slots allow. Each job started and each queue checked take
+      constant time, regardless of how many jobs are queued.
+      """
+
+      log = self._core().log
+      # Give local job slots to jobs that can’t use a worker first.
+      while self._queued_jobs and self._has_free_local_slot():
+         self._start_asynchronous_job(self._queued_jobs.pop())
+         log(log.MEDIUM, 'scheduler: started queued job')
+      while self._queued_distributable_jobs:
+         job = self._queued_distributable_jobs.pop()
+         if not self._start_asynchronous_job(job):
+            # No worker nor local job slot is free, so no other distributable job could be started.
+            self._queued_distributable_jobs.add(job)
+            break
+         log(log.MEDIUM, 'scheduler: started queued job')
+
+   def _get_worker_pool(self):
+      return self._worker_pool
+
+   def _set_worker_pool(self, worker_pool):
+      self._worker_pool = worker_pool
+
+   worker_pool = property(_get_worker_pool, _set_worker_pool, doc="""
+      comk.distcompile.WorkerPool whose workers can run distributable jobs in addition to the local job
+      slots, or None to run all jobs locally. Defaults to None.
+   """)
 
    def _wait_for_job_complete(self):
       """Blocks to read from the jobs status queue, returning the first job that reported having completed.
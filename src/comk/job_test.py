@@ -0,0 +1,138 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.job."""
+
+import io
+import mmap
+import os
+import sys
+import unittest
+
+import comk.core
+import comk.job
+import comk.testing
+
+
+##############################################################################################################
+
+def output_args(size):
+   """Returns the command-line arguments of a process that writes size bytes to stdout."""
+
+   script = 'import sys; getattr(sys.stdout, "buffer", sys.stdout).write(b"x" * {})'.format(size)
+   return [sys.executable, '-c', script]
+
+##############################################################################################################
+
+class CapturingJobTestMixIn(comk.testing.TempDirMixIn):
+   def run_capturing_job(self, size, keep_stdout):
+      """Runs an ExternalCmdCapturingJob with a small STDOUT_IN_MEMORY_MAX, returning the job and the value of
+      its stdout property as seen by its on_complete handler.
+      """
+
+      core = comk.core.Core()
+      stdouts = []
+      job = comk.job.ExternalCmdCapturingJob(
+         lambda: stdouts.append(job.stdout), ('TEST', 'output'), {'args': output_args(size)}, core.log,
+         os.path.join(self._dir, 'output.log'), os.path.join(self._dir, 'output.out'), keep_stdout
+      )
+      job.STDOUT_IN_MEMORY_MAX = 1024
+      core.job_runner.enqueue(job)
+      core.job_runner.run()
+      self.assertEqual(core.job_runner.failed_jobs, 0)
+      self.assertEqual(len(stdouts), 1)
+      with io.open(job.stdout_file_path, 'rb') as stdout_file:
+         self.assertEqual(stdout_file.read(), b'x' * size)
+      return job, stdouts[0]
+
+##############################################################################################################
+
+class CapturingJobStdoutInMemoryTest(CapturingJobTestMixIn, unittest.TestCase):
+   def runTest(self):
+      # Output up to the threshold is kept in memory.
+      job, stdout = self.run_capturing_job(1024, True)
+      self.assertIsInstance(stdout, bytes)
+      self.assertEqual(stdout, b'x' * 1024)
+
+##############################################################################################################
+
+class CapturingJobStdoutMappedTest(CapturingJobTestMixIn, unittest.TestCase):
+   def runTest(self):
+      # Output past the threshold is only kept in the file, which is mapped on access.
+      job, stdout = self.run_capturing_job(1025, True)
+      self.assertIsInstance(stdout, mmap.mmap)
+      # The mapping must have been closed once the on_complete handler returned.
+      self.assertRaises(ValueError, lambda: stdout[:])
+
+##############################################################################################################
+
+class CapturingJobStdoutNotKeptTest(CapturingJobTestMixIn, unittest.TestCase):
+   def runTest(self):
+      job, stdout = self.run_capturing_job(1025, False)
+      self.assertIsNone(stdout)
+
+##############################################################################################################
+
+class ChunkCountingJob(comk.job.ExternalCmdJob):
+   chunks_read = 0
+
+   def _stdout_chunk_read(self, chunk_bytes):
+      self.chunks_read += 1
+      comk.job.ExternalCmdJob._stdout_chunk_read(self, chunk_bytes)
+
+class ChunkCountingCapturingJob(comk.job.ExternalCmdCapturingJob):
+   chunks_read = 0
+
+   def _stdout_chunk_read(self, chunk_bytes):
+      self.chunks_read += 1
+      comk.job.ExternalCmdCapturingJob._stdout_chunk_read(self, chunk_bytes)
+
+##############################################################################################################
+
+class StdoutRedirectTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      core = comk.core.Core()
+      stdout_file_path = os.path.join(self._dir, 'output.out')
+      # Nothing consumes the output, so it goes to the null device.
+      discarding_job = ChunkCountingJob(
+         lambda: None, ('TEST', 'discarded'), {'args': output_args(100000)}, core.log,
+         os.path.join(self._dir, 'discarded.log')
+      )
+      stdout_redirect = discarding_job._get_stdout_redirect()
+      self.assertEqual(stdout_redirect.name, os.devnull)
+      stdout_redirect.close()
+      # The output is only saved, so the process writes it straight to the file.
+      saving_job = ChunkCountingCapturingJob(
+         lambda: None, ('TEST', 'saved'), {'args': output_args(100000)}, core.log,
+         os.path.join(self._dir, 'saved.log'), stdout_file_path, keep_stdout=False
+      )
+      # The output is kept, so it has to be read.
+      keeping_job = ChunkCountingCapturingJob(
+         lambda: None, ('TEST', 'kept'), {'args': output_args(100000)}, core.log,
+         os.path.join(self._dir, 'kept.log'), os.path.join(self._dir, 'kept.out'), keep_stdout=True
+      )
+      for job in discarding_job, saving_job, keeping_job:
+         core.job_runner.enqueue(job)
+      core.job_runner.run()
+      self.assertEqual(core.job_runner.failed_jobs, 0)
+
+      self.assertEqual(discarding_job.chunks_read, 0)
+      self.assertEqual(saving_job.chunks_read, 0)
+      with io.open(stdout_file_path, 'rb') as stdout_file:
+         self.assertEqual(stdout_file.read(), b'x' * 100000)
+      self.assertGreater(keeping_job.chunks_read, 0)
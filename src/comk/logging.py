@@ -18,18 +18,208 @@
 
 """Logging-related classes."""
 
+import contextlib
+import gzip
+import io
+import locale
+import os
 import threading
+import time
 import sys
 
-if sys.hexversion < 0x03000000:
-   import io
+import comk
 
 
+##############################################################################################################
+
+class BuildLogFile(object):
+   """Build log of a target, i.e. the saved error output of the jobs that build it. The log is compressed with
+   gzip if its file name ends in BuildLogFile.GZIP_SUFFIX, and can be capped to a maximum size, past which any
+   more output is replaced by a note.
+
+   The file is only created when the first output is written, so that jobs that don’t output anything cost no
+   I/O other than the removal of logs left over from previous builds.
+   """
+
+   # Encoding used for the log.
+   _encoding = None
+   # File object the log is written to, or None if it hasn’t been opened yet.
+   _file = None
+   # Path to the log file.
+   _file_path = None
+   # Count of bytes written to the log.
+   _size = None
+   # Maximum count of bytes to write to the log, or None if unlimited.
+   _size_max = None
+   # True if output was dropped because of _size_max.
+   _truncated = None
+
+   # Suffix that makes a build log compressed.
+   GZIP_SUFFIX = '.gz'
+
+   def __init__(self, file_path, size_max=None):
+      """Constructor.
+
+      str file_path
+         Path to the log file.
+      int size_max
+         Maximum size of the log, in bytes, or None if unlimited.
+      """
+
+      self._encoding = locale.getpreferredencoding()
+      self._file = None
+      self._file_path = file_path
+      self._size = 0
+      self._size_max = size_max
+      self._truncated = False
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, exc_type, exc_value, traceback):
+      self.close()
+      return False
+
+   def close(self):
+      """Closes the log file. If nothing was written, any log left over from a previous build is removed."""
+
+      if self._file:
+         self._file.close()
+         self._file = None
+      else:
+         _unlink_if_exists(self._file_path)
+         _unlink_if_exists(self._get_other_file_path())
+
+   def _get_other_file_path(self):
+      """Returns the path the log would have if it was (not) compressed.
+
+      str return
+         Path to the log in the other format.
+      """
+
+      if self._file_path.endswith(self.GZIP_SUFFIX):
+         return self._file_path[:-len(self.GZIP_SUFFIX)]
+      else:
+         return self._file_path + self.GZIP_SUFFIX
+
+   def _open(self):
+      """Creates the log file."""
+
+      comk.makedirs(os.path.dirname(self._file_path))
+      # Remove any log saved by an earlier build in the other format, which would otherwise be mistaken for
+      # the current one.
+      _unlink_if_exists(self._get_other_file_path())
+      if self._file_path.endswith(self.GZIP_SUFFIX):
+         # Favor speed over compression ratio, like gzip(1) does by default.
+         self._file = gzip.GzipFile(self._file_path, 'wb', compresslevel=6)
+      else:
+         self._file = io.open(self._file_path, 'wb')
+
+   def write(self, s):
+      """Writes a string to the log. Once the maximum size is reached, a note is written instead, and any
+      further output is discarded.
+
+      str s
+         Text to write; typically a complete line, including its line terminator.
+      """
+
+      if self._truncated:
+         return
+      if not self._file:
+         self._open()
+      by = s.encode(self._encoding, 'replace')
+      if self._size_max is not None and self._size + len(by) > self._size_max:
+         self._truncated = True
+         by = 'complemake: log truncated after {} bytes\n'.format(self._size).encode(self._encoding)
+      self._file.write(by)
+      self._size += len(by)
+
+##############################################################################################################
+
+def _unlink_if_exists(file_path):
+   """Deletes a file, if it exists.
+
+   str file_path
+      Path to the file to delete.
+   """
+
+   try:
+      os.unlink(file_path)
+   except (comk.FileNotFoundErrorCompat, OSError):
+      pass
+
+##############################################################################################################
+
+def prune_build_logs(log_dir, age_max=None, total_size_max=None):
+   """Deletes the build logs older than a maximum age, then the oldest remaining ones until their total size
+   is within a maximum.
+
+   str log_dir
+      Directory containing the build logs.
+   float age_max
+      Maximum age of a log, in seconds, or None if logs don’t expire.
+   int total_size_max
+      Maximum total size of the logs, in bytes, or None if unlimited.
+   list(str) return
+      Paths to the deleted logs.
+   """
+
+   logs = []
+   for dir_path, dir_names, file_names in os.walk(log_dir):
+      for file_name in file_names:
+         if file_name.endswith('.log') or file_name.endswith('.log' + BuildLogFile.GZIP_SUFFIX):
+            file_path = os.path.join(dir_path, file_name)
+            st = os.stat(file_path)
+            logs.append((st.st_mtime, st.st_size, file_path))
+   # Oldest first.
+   logs.sort()
+   deleted = []
+   if age_max is not None:
+      mtime_min = time.time() - age_max
+      while logs and logs[0][0] < mtime_min:
+         deleted.append(logs.pop(0)[2])
+   if total_size_max is not None:
+      total_size = sum(size for mtime, size, file_path in logs)
+      while logs and total_size > total_size_max:
+         mtime, size, file_path = logs.pop(0)
+         total_size -= size
+         deleted.append(file_path)
+   for file_path in deleted:
+      os.unlink(file_path)
+   return deleted
+
+def read_build_log(file_path):
+   """Returns the contents of a build log, transparently decompressing it if needed. If the file doesn’t
+   exist, its compressed (or uncompressed) counterpart will be read instead.
+
+   str file_path
+      Path to the log file, with or without BuildLogFile.GZIP_SUFFIX.
+   bytes return
+      Contents of the log, or None if no log exists.
+   """
+
+   if file_path.endswith(BuildLogFile.GZIP_SUFFIX):
+      file_paths = (file_path, file_path[:-len(BuildLogFile.GZIP_SUFFIX)])
+   else:
+      file_paths = (file_path, file_path + BuildLogFile.GZIP_SUFFIX)
+   for file_path in file_paths:
+      if os.path.isfile(file_path):
+         if file_path.endswith(BuildLogFile.GZIP_SUFFIX):
+            log = gzip.GzipFile(file_path, 'rb')
+         else:
+            log = io.open(file_path, 'rb')
+         with log:
+            return log.read()
+   return None
+
 ##############################################################################################################
 
 class LogGenerator(object):
    """Generator of logs. Only one instance of this class exists for each comk.Core instance."""
 
+   # Size of the output a thread can hold back with output_sync before it’s flushed anyway.
+   OUTPUT_SYNC_BUFFER_MAX = 64 * 1024
+
    # Total count of failed test assertions.
    _failed_test_assertions = None
    # Total count of failed test cases.
@@ -38,6 +228,8 @@ class LogGenerator(object):
    _stderr = None
    # Lock that must be acquired prior to writing to stderr.
    _stderr_lock = None
+   # Per-thread state; its buffer attribute is a list of strings held back by buffer_thread_output(), or None.
+   _thread_local = None
    # Total count of test assertions performed.
    _total_test_assertions = None
    # Total count of test cases executed.
@@ -54,8 +246,12 @@ class LogGenerator(object):
          # Create a text I/O wrapper for sys.stderr.
          self._stderr = io.open(sys.stderr.fileno(), 'w', closefd=False)
       self._stderr_lock = threading.Lock()
+      self._thread_local = threading.local()
       self._total_test_assertions = 0
       self._total_test_cases = 0
+      self.build_log_size_max = None
+      self.compress_build_logs = False
+      self.output_sync = False
       self.verbosity = Logger.QUIET
 
    def add_testcase_result(self, title, total_assertions, failed_assertions):
@@ -70,6 +266,44 @@ class LogGenerator(object):
       if failed_assertions:
          self._failed_test_cases += 1
 
+   # Maximum size of each build log, in bytes, or None if unlimited.
+   build_log_size_max = None
+
+   @contextlib.contextmanager
+   def buffer_thread_output(self):
+      """Implementation of Logger.buffered_output()."""
+
+      thread_local = self._thread_local
+      if not self.output_sync or getattr(thread_local, 'buffer', None) is not None:
+         # Not buffering, or already buffering.
+         yield
+         return
+      thread_local.buffer = []
+      thread_local.buffer_size = 0
+      try:
+         yield
+      finally:
+         self._flush_thread_buffer()
+         thread_local.buffer = None
+
+   # If True, build logs are saved compressed.
+   compress_build_logs = None
+
+   def _flush_thread_buffer(self):
+      """Writes to stderr, as a single block, the output held back by the current thread."""
+
+      thread_local = self._thread_local
+      if thread_local.buffer:
+         s = ''.join(thread_local.buffer)
+         thread_local.buffer = []
+         thread_local.buffer_size = 0
+         with self._stderr_lock as lock:
+            self._stderr.write(s)
+
+   # If True, output logged by a thread within a buffer_thread_output() block is held back until the end of
+   # the block, to avoid interleaving it with output from other threads.
+   output_sync = None
+
    def _test_summary_counts(self, total, failed):
       """Generates a total/passed/failed summary line.
 
@@ -96,6 +330,14 @@ class LogGenerator(object):
       s += '\n'
       if sys.hexversion < 0x03000000 and not isinstance(s, unicode):
          s = unicode(s)
+      buffer = getattr(self._thread_local, 'buffer', None)
+      if buffer is not None:
+         # Hold back the output, unless that’s been going on for too long.
+         buffer.append(s)
+         self._thread_local.buffer_size += len(s)
+         if self._thread_local.buffer_size >= self.OUTPUT_SYNC_BUFFER_MAX:
+            self._flush_thread_buffer()
+         return
       # Lock stderr and write to it.
       with self._stderr_lock as lock:
          self._stderr.write(s)
@@ -174,6 +416,60 @@ class Logger(object):
 
       self._log_gen.add_testcase_result(title, total_assertions, failed_assertions)
 
+   def buffered_output(self):
+      """Returns a context manager that, if output_sync is True, holds back the output logged by the calling
+      thread until it’s exited, at which point it’s written as a single block. Output is written early if it
+      grows beyond LogGenerator.OUTPUT_SYNC_BUFFER_MAX.
+
+      object return
+         Context manager.
+      """
+
+      return self._log_gen.buffer_thread_output()
+
+   def _get_build_log_size_max(self):
+      return self._log_gen.build_log_size_max
+
+   def _set_build_log_size_max(self, build_log_size_max):
+      self._log_gen.build_log_size_max = build_log_size_max
+
+   build_log_size_max = property(_get_build_log_size_max, _set_build_log_size_max, doc="""
+      Maximum size of each build log, in bytes, or None if unlimited.
+   """)
+
+   def _get_compress_build_logs(self):
+      return self._log_gen.compress_build_logs
+
+   def _set_compress_build_logs(self, compress_build_logs):
+      self._log_gen.compress_build_logs = compress_build_logs
+
+   compress_build_logs = property(_get_compress_build_logs, _set_compress_build_logs, doc="""
+      If True, build logs are saved compressed with gzip; comk.target.FileTarget.build_log_path will reflect
+      that.
+   """)
+
+   def open_build_log(self, file_path):
+      """Opens a build log for writing, applying the configured size limit.
+
+      str file_path
+         Path to the log file.
+      comk.logging.BuildLogFile return
+         Build log.
+      """
+
+      return BuildLogFile(file_path, self._log_gen.build_log_size_max)
+
+   def _get_output_sync(self):
+      return self._log_gen.output_sync
+
+   def _set_output_sync(self, output_sync):
+      self._log_gen.output_sync = output_sync
+
+   output_sync = property(_get_output_sync, _set_output_sync, doc="""
+      If True, the output logged by each job is held back while the job runs, and written as a single block
+      when it completes; see Logger.buffered_output().
+   """)
+
    def qm_tool_name(self, tool_name):
       """Returns a “prettier” string for the specified tool, to be displayed in quiet mode.
 
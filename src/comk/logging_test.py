@@ -0,0 +1,115 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.logging."""
+
+import io
+import os
+import threading
+import time
+import unittest
+
+import comk.logging as cl
+import comk.testing
+
+
+##############################################################################################################
+
+class BuildLogFileTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      file_path = os.path.join(self._dir, 'sub', 'a.log')
+      with cl.BuildLogFile(file_path) as log:
+         log.write(u'line 1\n')
+         log.write(u'line 2\n')
+      self.assertEqual(cl.read_build_log(file_path), b'line 1\nline 2\n')
+
+      # Switching to a compressed log must get rid of the uncompressed one.
+      with cl.BuildLogFile(file_path + '.gz', 10) as log:
+         log.write(u'line 1\n')
+         log.write(u'line 2\n')
+         log.write(u'line 3\n')
+      self.assertFalse(os.path.exists(file_path))
+      # Either name finds the log.
+      self.assertEqual(cl.read_build_log(file_path), b'line 1\ncomplemake: log truncated after 7 bytes\n')
+      self.assertEqual(cl.read_build_log(file_path + '.gz'), cl.read_build_log(file_path))
+
+      self.assertIsNone(cl.read_build_log(os.path.join(self._dir, 'b.log')))
+
+      # A log without output is not created, and replaces any log from a previous build.
+      cl.BuildLogFile(file_path).close()
+      self.assertFalse(os.path.exists(file_path))
+      self.assertFalse(os.path.exists(file_path + '.gz'))
+      self.assertIsNone(cl.read_build_log(file_path))
+
+##############################################################################################################
+
+class PruneBuildLogsTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def write_log(self, name, size, age):
+      file_path = os.path.join(self._dir, name)
+      with open(file_path, 'wb') as f:
+         f.write(b'x' * size)
+      mtime = time.time() - age
+      os.utime(file_path, (mtime, mtime))
+      return file_path
+
+   def runTest(self):
+      old = self.write_log('old.log', 10, 1000)
+      older = self.write_log('older.log.gz', 10, 500)
+      recent = self.write_log('recent.log', 10, 100)
+      newest = self.write_log('newest.log', 10, 0)
+      other = self.write_log('other.txt', 10, 2000)
+
+      self.assertEqual(cl.prune_build_logs(self._dir, age_max=750), [old])
+      self.assertEqual(cl.prune_build_logs(self._dir, total_size_max=25), [older])
+      self.assertEqual(cl.prune_build_logs(self._dir, 1000, 1000), [])
+      self.assertEqual(sorted(os.listdir(self._dir)), ['newest.log', 'other.txt', 'recent.log'])
+
+##############################################################################################################
+
+class OutputSyncTest(unittest.TestCase):
+   def runTest(self):
+      log = cl.Logger(cl.LogGenerator())
+      stderr = io.StringIO()
+      log._log_gen._stderr = stderr
+      log.output_sync = True
+
+      def job(name, event_to_set, event_to_wait):
+         with log.buffered_output():
+            log(None, '{}: 1', name)
+            event_to_set.set()
+            event_to_wait.wait()
+            log(None, '{}: 2', name)
+
+      # Interleave the two threads’ output; it should still come out as one block per thread.
+      a_logged = threading.Event()
+      b_logged = threading.Event()
+      b_done = threading.Event()
+      thread_a = threading.Thread(target=job, args=('a', a_logged, b_done))
+      thread_a.start()
+      a_logged.wait()
+      self.assertEqual(stderr.getvalue(), '')
+      job('b', b_logged, a_logged)
+      b_done.set()
+      thread_a.join()
+      self.assertEqual(stderr.getvalue(), 'b: 1\nb: 2\na: 1\na: 2\n')
+
+      # Without output_sync, output is written immediately.
+      log.output_sync = False
+      with log.buffered_output():
+         log(None, 'c')
+         self.assertEqual(stderr.getvalue(), 'b: 1\nb: 2\na: 1\na: 2\nc\n')
@@ -154,6 +154,9 @@ class TargetSnapshot(object):
    """
 
    __slots__ = (
+      # Duration, in milliseconds, of each job run to build the target, keyed by the job’s quiet-mode tool
+      # name.
+      '_job_durations',
       # Signature of each input (dependency) of this target.
       '_input_signatures',
       # Signature of each output (generated file) of this target.
@@ -185,6 +188,7 @@ class TargetSnapshot(object):
          mds, target = args
 
       self._input_signatures = {}
+      self._job_durations = {}
       self._output_signatures = {}
 
       if parsed:
@@ -227,6 +231,20 @@ class TargetSnapshot(object):
                      'signature, but element [{}] is not'
                   ).format(i))
                self._output_signatures[o._file_path] = o
+
+         job_durations = parsed.get('job-durations')
+         if job_durations:
+            if not isinstance(job_durations, list):
+               parser.raise_parsing_error('attribute “job-durations” must be a sequence')
+            for i, o in enumerate(job_durations):
+               if not isinstance(o, dict) or \
+                  not isinstance(o.get('tool'), basestring) or not isinstance(o.get('msec'), int) \
+               :
+                  parser.raise_parsing_error((
+                     'elements of the “job-durations” attribute must be mappings with a “tool” string and an ' +
+                     '“msec” integer, but element [{}] is not'
+                  ).format(i))
+               self._job_durations[o['tool']] = o['msec']
       else:
          self._target = target
          # TODO: improve this hacky way of getting a Core instance.
@@ -261,23 +279,31 @@ class TargetSnapshot(object):
       yg.produce_from_object('outputs')
       yg.produce_from_object(self._output_signatures.values())
 
+      if self._job_durations:
+         # Tool names are not necessarily valid as mapping keys, so store each duration as a separate mapping.
+         yg.produce_from_object('job-durations')
+         yg.produce_from_object([
+            {'tool': tool, 'msec': msec} for tool, msec in sorted(self._job_durations.items())
+         ])
+
       yg.write_mapping_end()
 
-   def equals_stored(self, stored_target_snapshots, log):
-      """Compares self (current snapshot) with the stored snapshot for the same target, logging any detected
-      differences.
+   def find_change(self, stored_target_snapshots, log):
+      """Compares self (current snapshot) with the stored snapshot for the same target, logging and returning
+      the first detected difference.
 
       comk.metadata.TargetSnapshot stored_target_snapshots
          Stored snapshot.
       comk.Logger log
          Log instance.
-      bool return
-         True if the two snapshots are equal, of False in case of any differences.
+      str return
+         Description of the first difference between the two snapshots, or None if they are equal.
       """
 
       target = self._target
       assert target == stored_target_snapshots._target, 'comparing snapshots of different targets'
 
+      change = None
       for is_inputs, stored_signatures, curr_signatures in \
          (True,  stored_target_snapshots._input_signatures,  self._input_signatures ), \
          (False, stored_target_snapshots._output_signatures, self._output_signatures) \
@@ -286,41 +312,37 @@ class TargetSnapshot(object):
          for file_path, curr_signature in curr_signatures.items():
             if not curr_signature:
                if is_inputs:
-                  log(log.HIGH, 'metadata: {}: missing input {}, build will fail', target, file_path)
+                  change = 'missing input {}, build will fail'.format(file_path)
                else:
-                  log(log.HIGH, 'metadata: {}: missing output {}, rebuild needed', target, file_path)
-               return False
+                  change = 'missing output {}, rebuild needed'.format(file_path)
+               break
             stored_signature = stored_signatures.get(file_path)
             if not stored_signature:
-               log(
-                  log.HIGH,
-                  'metadata: {}: file {} not part of stored snapshot, rebuild needed',
-                  target, file_path
-               )
-               return False
+               change = 'file {} not part of stored snapshot, rebuild needed'.format(file_path)
+               break
             if curr_signature._mtime != stored_signature._mtime:
-               log(
-                  log.HIGH,
-                  'metadata: {}: changes detected in file {} (mtime was: {}, now: {}), rebuild needed',
-                  target, file_path, stored_signature._mtime, curr_signature._mtime
+               change = 'changes detected in file {} (mtime was: {}, now: {}), rebuild needed'.format(
+                  file_path, stored_signature._mtime, curr_signature._mtime
                )
-               return False
+               break
+         if change:
+            break
 
          # A change in the number of signatures should cause a rebuild because it’s a change in inputs
          # (dependencies) or outputs, so verify that all signatures in the stored snapshot are also in the
          # current one (self).
          for file_path in stored_signatures.keys():
             if file_path not in curr_signatures:
-               log(
-                  log.HIGH,
-                  'metadata: {}: file {} not part of current snapshot, rebuild needed',
-                  target, file_path
-               )
-               return False
+               change = 'file {} not part of current snapshot, rebuild needed'.format(file_path)
+               break
+         if change:
+            break
 
-      # No changes detected.
-      log(log.HIGH, 'metadata: {}: up-to-date', target)
-      return True
+      if change:
+         log(log.HIGH, 'metadata: {}: {}', target, change)
+      else:
+         log(log.HIGH, 'metadata: {}: up-to-date', target)
+      return change
 
    def update(self, mds, dry_run):
       """Updates the snapshot.
@@ -339,6 +361,11 @@ class TargetSnapshot(object):
             self._target.get_generated_files(), self._output_signatures,
             ASSUME_NEW if dry_run else UPDATE_CACHE, core
          )
+      if not dry_run:
+         # Record how long each job took, so that future builds can estimate how long they will take.
+         for job in self._target.get_jobs():
+            if job.duration is not None:
+               self._job_durations[job.get_quiet_command()[0]] = int(job.duration * 1000)
 
 ##############################################################################################################
 
@@ -354,6 +381,8 @@ class MetadataStore(object):
    _file_path = None
    # Output log.
    _log = None
+   # Reason why each target was found to need a rebuild (comk.target.Target -> str).
+   _rebuild_reasons = None
    # Signature for each file (str -> FileSignature).
    _signatures = None
    # Target snapshots as stored in the metadata file (comk.target.Target -> TargetSnapshot).
@@ -387,6 +416,7 @@ class MetadataStore(object):
       self._dirty = False
       self._file_path = file_path
       self._log = core.log
+      self._rebuild_reasons = {}
       self._signatures = {}
       self._stored_target_snapshots = {}
 
@@ -481,6 +511,37 @@ class MetadataStore(object):
 
       return curr_target_snapshots
 
+   def get_last_job_duration(self, target, job_name):
+      """Returns how long a job building the specified target took the last time it was run.
+
+      comk.target.Target target
+         Target built by the job.
+      str job_name
+         Quiet-mode tool name of the job (see comk.job.Job.get_quiet_command()).
+      float return
+         Duration of the job in seconds, or None if not known.
+      """
+
+      stored_target_snapshots = self._stored_target_snapshots.get(target)
+      if stored_target_snapshots:
+         duration = stored_target_snapshots._job_durations.get(job_name)
+         if duration is not None:
+            return duration / 1000.0
+      return None
+
+   def get_rebuild_reason(self, target):
+      """Returns the reason why has_target_snapshot_changed() reported that the specified target needs to be
+      rebuilt.
+
+      comk.target.Target target
+         Target to return the rebuild reason for.
+      str return
+         Description of the change that triggered the rebuild, or None if the target was not checked or was
+         found to be up-to-date.
+      """
+
+      return self._rebuild_reasons.get(target)
+
    def has_target_snapshot_changed(self, target):
       """Checks if the specified target needs to be rebuilt: compares the current signature of its
       dependencies with the signatures stored in the target’s snapshot, returning True if any differences are
@@ -503,10 +564,15 @@ class MetadataStore(object):
       # If we have no stored snapshot to compare to, report the build as necessary.
       if not stored_target_snapshots:
          log(log.HIGH, 'metadata: {}: no stored snapshot, build needed', target)
+         self._rebuild_reasons[target] = 'no stored snapshot, build needed'
          return True
 
       # Compare current and stored snapshots.
-      return not curr_target_snapshots.equals_stored(stored_target_snapshots, log)
+      change = curr_target_snapshots.find_change(stored_target_snapshots, log)
+      if change:
+         self._rebuild_reasons[target] = change
+         return True
+      return False
 
    def update_target_snapshot(self, target, dry_run):
       """Updates the snapshot for the specified target.
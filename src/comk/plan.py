@@ -0,0 +1,225 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Build plan generation.
+
+When running in “dry run” mode, comk.plan.BuildPlan collects every job that the build would execute, along
+with the reason why it would be executed and the jobs it would have to wait for. Durations of jobs run by
+previous builds, stored in the metadata, are used to estimate how long the build would take with a given
+degree of parallelism.
+"""
+
+import heapq
+import json
+import weakref
+
+import comk.target
+
+
+##############################################################################################################
+
+class BuildPlan(object):
+   """Collects the jobs that a dry-run build would execute, and describes them in a machine-readable format."""
+
+   # Weak reference to the owning comk.core.Core instance.
+   _core = None
+   # Planned jobs, in the order in which they were enqueued. Each element is a dictionary with the keys
+   # documented in BuildPlan.to_json_object().
+   _entries = None
+   # Indices in _entries of the jobs enqueued by each target (comk.target.Target -> list(int)).
+   _target_entries = None
+
+   def __init__(self, core):
+      """Constructor.
+
+      comk.core.Core core
+         Core instance.
+      """
+
+      self._core = weakref.ref(core)
+      self._entries = []
+      self._target_entries = {}
+
+   def add_job(self, target, job):
+      """Records a job that would be executed to build a target.
+
+      comk.target.Target target
+         Target built by the job.
+      comk.job.Job job
+         Job that would be executed.
+      """
+
+      core = self._core()
+      target_entries = self._target_entries.setdefault(target, [])
+      if target_entries:
+         # The job follows another job enqueued by the same target, e.g. a test run after linking the test.
+         reason = 'runs after the {} job for the same target'.format(
+            self._entries[target_entries[-1]]['tool']
+         )
+      elif core.force_build:
+         reason = 'forced rebuild'
+      else:
+         reason = core.metadata.get_rebuild_reason(target) or 'triggered by dependencies'
+      tool = job.get_quiet_command()[0]
+      if isinstance(target, comk.target.NamedTargetMixIn):
+         target_desc = target.name
+      elif isinstance(target, comk.target.FileTarget):
+         target_desc = target.file_path
+      else:
+         target_desc = str(target)
+      target_entries.append(len(self._entries))
+      self._entries.append({
+         'id'               : len(self._entries),
+         'target'           : target_desc,
+         'tool'             : tool,
+         'args'             : job.get_command_args(),
+         'reason'           : reason,
+         'depends'          : [],
+         'expected_duration': core.metadata.get_last_job_duration(target, tool),
+      })
+
+   def _collect_dependencies(self):
+      """Fills the “depends” list of each entry with the IDs of the jobs that must complete before it can
+      start.
+      """
+
+      # Maps each target to the IDs of the jobs that must complete before the target can be considered built.
+      # Targets that don’t enqueue any jobs are transparent, i.e. they map to the jobs of their dependencies.
+      # Visiting targets in build order guarantees that all of a target’s dependencies have already been
+      # mapped.
+      completion_jobs = {}
+      for target in self._core().build_order:
+         dependencies_completion_jobs = set()
+         for dependency_target in target.get_dependencies(targets_only=True):
+            dependencies_completion_jobs.update(completion_jobs[dependency_target])
+         target_entries = self._target_entries.get(target)
+         if target_entries:
+            # The first job of the target waits for all its dependencies; each subsequent one waits for the
+            # job enqueued before it.
+            prev_ids = dependencies_completion_jobs
+            for i in target_entries:
+               self._entries[i]['depends'] = sorted(prev_ids)
+               prev_ids = (i, )
+            completion_jobs[target] = set(prev_ids)
+         else:
+            completion_jobs[target] = dependencies_completion_jobs
+
+   def simulate(self, jobs_max):
+      """Simulates running the planned jobs with the specified degree of parallelism, using the same list
+      scheduling strategy as comk.job.Runner: whenever a job slot is free, the earliest-enqueued job whose
+      dependencies have all completed is started.
+
+      Jobs for which no duration from a previous build is known are assumed to take as long as the average of
+      the known durations of jobs using the same tool, or of all jobs if none of those is known.
+
+      int jobs_max
+         Maximum count of jobs running at the same time.
+      tuple(float, float, float) return
+         Simulated makespan (wall-clock duration of the build), sum of the duration of all jobs, and duration
+         of the longest chain of dependent jobs (critical path), all in seconds.
+      """
+
+      # Estimate durations for jobs that have none.
+      known_by_tool = {}
+      for entry in self._entries:
+         if entry['expected_duration'] is not None:
+            known_by_tool.setdefault(entry['tool'], []).append(entry['expected_duration'])
+      all_known = [duration for durations in known_by_tool.values() for duration in durations]
+      default_duration = sum(all_known) / len(all_known) if all_known else 0.0
+      durations = []
+      for entry in self._entries:
+         duration = entry['expected_duration']
+         if duration is None:
+            known = known_by_tool.get(entry['tool'])
+            duration = sum(known) / len(known) if known else default_duration
+         durations.append(duration)
+
+      # Entries only ever depend on entries enqueued before them, so a single pass in order is enough to
+      # compute the critical path.
+      dependents = [[] for entry in self._entries]
+      blocking = []
+      path_ends = []
+      for entry in self._entries:
+         for dependency_id in entry['depends']:
+            dependents[dependency_id].append(entry['id'])
+         blocking.append(len(entry['depends']))
+         path_ends.append(durations[entry['id']] + max(
+            [path_ends[dependency_id] for dependency_id in entry['depends']] or [0.0]
+         ))
+
+      # Event-driven simulation: ready is a heap of entry IDs (i.e. ordered by enqueuing), running is a heap of
+      # (end time, entry ID).
+      ready = [entry['id'] for entry in self._entries if not entry['depends']]
+      heapq.heapify(ready)
+      running = []
+      now = 0.0
+      while ready or running:
+         while ready and len(running) < jobs_max:
+            entry_id = heapq.heappop(ready)
+            heapq.heappush(running, (now + durations[entry_id], entry_id))
+         now, entry_id = heapq.heappop(running)
+         for dependent_id in dependents[entry_id]:
+            blocking[dependent_id] -= 1
+            if blocking[dependent_id] == 0:
+               heapq.heappush(ready, dependent_id)
+      return now, sum(durations), max(path_ends or [0.0])
+
+   def to_json_object(self):
+      """Returns the plan as a tree of objects that can be serialized by the json module.
+
+      The returned dictionary contains:
+      •  jobs: list of planned jobs, each of them a dictionary with keys:
+         •  id: index of the job in the list;
+         •  target: name or file path of the target built by the job;
+         •  tool: short name of the tool run by the job, as shown in quiet mode;
+         •  args: command-line arguments of the job, or null if the job doesn’t run an external program;
+         •  reason: why the job would be executed;
+         •  depends: IDs of the jobs that must complete before this job can start;
+         •  expected_duration: duration of the job in the last build that ran it, in seconds, or null if not
+            known;
+      •  jobs_max: degree of parallelism used for the simulation;
+      •  makespan: simulated wall-clock duration of the build, in seconds;
+      •  total_duration: sum of the (expected or estimated) duration of all jobs, in seconds;
+      •  critical_path: duration of the longest chain of dependent jobs, in seconds;
+      •  unknown_durations: count of jobs whose duration had to be estimated.
+
+      dict(str: object) return
+         Plan.
+      """
+
+      self._collect_dependencies()
+      jobs_max = self._core().job_runner.running_jobs_max
+      makespan, total_duration, critical_path = self.simulate(jobs_max)
+      return {
+         'jobs'             : self._entries,
+         'jobs_max'         : jobs_max,
+         'makespan'         : round(makespan, 3),
+         'total_duration'   : round(total_duration, 3),
+         'critical_path'    : round(critical_path, 3),
+         'unknown_durations': sum(1 for entry in self._entries if entry['expected_duration'] is None),
+      }
+
+   def write_json(self, file):
+      """Writes the plan to the specified file in JSON format.
+
+      file file
+         Text file to write to.
+      """
+
+      file.write(json.dumps(self.to_json_object(), indent=3, sort_keys=True))
+      file.write('\n')
@@ -256,12 +256,19 @@ class SystemType(object):
 class Platform(object):
    """Generic software platform (OS/runtime environment)."""
 
+   # Factories detected for tools that haven’t been requested yet, because they were detected together with
+   # another tool (comk.tool.Tool => comk.tool.ToolFactory, or None if not found).
+   _prefetched_tool_factories = None
    # Factories that create Tools for this platform. Associates a Tool non-leaf subclass to a factory able to
    # instantiate a leaf class configured for this platform’s system type (comk.tool.Tool =>
    # comk.tool.ToolFactory).
    _tool_factories = None
    # System type (more specific than the platform type).
    _system_type = None
+   # See Platform.tool_cache.
+   _tool_cache = None
+   # Executables chosen by the user for tools that haven’t been detected yet (comk.tool.Tool => str).
+   _tool_file_path_overrides = None
 
    def __init__(self, system_type):
       """Constructor.
@@ -270,8 +277,11 @@ class Platform(object):
          System type of this platform.
       """
 
+      self._prefetched_tool_factories = {}
       self._tool_factories = {}
       self._system_type = system_type
+      self._tool_cache = None
+      self._tool_file_path_overrides = {}
 
    def add_dir_to_dynlib_env_path(self, env, dir):
       """Modifies an environment dictionary (similar to os.environ) so that it allows to load dynamic
@@ -315,6 +325,28 @@ class Platform(object):
 
       pass
 
+   def _default_object_suffix(self):
+      """Returns the suffix of intermediate object files most likely used by C++ compilers for the platform.
+      Used by Platform.object_suffix() when the C++ compiler is not known.
+
+      str return
+         Object file suffix.
+      """
+
+      raise NotImplementedError(
+         'Platform._default_object_suffix() must be overridden in ' + type(self).__name__
+      )
+
+   def _default_pch_suffix(self):
+      """Returns the suffix of precompiled header files most likely used by C++ compilers for the platform.
+      Used by Platform.pch_suffix() when the C++ compiler is not known.
+
+      str return
+         Precompiled header file suffix.
+      """
+
+      raise NotImplementedError('Platform._default_pch_suffix() must be overridden in ' + type(self).__name__)
+
    @classmethod
    def detect_host(cls):
       """Attempts to detect the underlying (host) platform, returning an instance of the Platform subclass
@@ -404,11 +436,82 @@ class Platform(object):
 
       tool_factory_cls = self._tool_factories.get(tool_cls)
       if not tool_factory_cls:
-         tool_factory_cls = tool_cls.get_factory(None, self._system_type)
+         file_path_override = self._tool_file_path_overrides.get(tool_cls)
+         if file_path_override:
+            tool_factory_cls = self._get_tool_factory(tool_cls, file_path_override)
+         else:
+            if tool_cls not in self._prefetched_tool_factories:
+               self._prefetch_tool_factories(tool_cls)
+            tool_factory_cls = self._prefetched_tool_factories.pop(tool_cls)
+            if not tool_factory_cls:
+               # The tool could not be detected; this will raise an exception describing the problem.
+               tool_factory_cls = tool_cls.get_factory(None, self._system_type)
          self._tool_factories[tool_cls] = tool_factory_cls
 #        print('using {} as {}'.format(tool_factory_cls._file_path, tool_cls.__name__))
       return tool_factory_cls()
 
+   def _get_known_tool_cls(self, tool_cls):
+      """Returns the leaf class that will be used for the specified tool, if it’s already known without having
+      to detect the tool, i.e. if the tool has already been detected or is in the tool cache.
+
+      type tool_cls
+         Subclass of comk.tool.Tool.
+      type return
+         Leaf subclass of tool_cls, or None if not known yet.
+      """
+
+      tool_factory = self._tool_factories.get(tool_cls) or self._prefetched_tool_factories.get(tool_cls)
+      if not tool_factory and self._tool_cache:
+         tool_factory = self._tool_cache.get_factory_if_cached(
+            tool_cls, self._tool_file_path_overrides.get(tool_cls), self._system_type
+         )
+      if tool_factory:
+         return tool_factory.product_cls
+      return None
+
+   def _get_tool_factory(self, tool_cls, file_path_override):
+      """Detects a tool, using the tool cache if available.
+
+      type tool_cls
+         Subclass of comk.tool.Tool.
+      str file_path_override
+         See comk.tool.Tool.get_factory().
+      comk.tool.ToolFactory return
+         Factory able to instantiate a tool_cls subclass matching the tool.
+      """
+
+      if self._tool_cache:
+         return self._tool_cache.get_factory(tool_cls, file_path_override, self._system_type)
+      else:
+         return tool_cls.get_factory(file_path_override, self._system_type)
+
+   def _prefetch_tool_factories(self, tool_cls):
+      """Detects the specified tool, along with any other tools that are typically needed with it and haven’t
+      been detected or set yet, storing the results in self._prefetched_tool_factories.
+
+      type tool_cls
+         Subclass of comk.tool.Tool.
+      """
+
+      # Tool types that are detected together as soon as one of them is needed, since building usually
+      # requires all of them.
+      tool_clss_detected_together = (comk.tool.CxxCompiler, comk.tool.Linker)
+      tool_clss = [tool_cls]
+      if tool_cls in tool_clss_detected_together:
+         for other_tool_cls in tool_clss_detected_together:
+            if (
+               other_tool_cls is not tool_cls and
+               other_tool_cls not in self._tool_factories and
+               other_tool_cls not in self._tool_file_path_overrides and
+               other_tool_cls not in self._prefetched_tool_factories
+            ):
+               tool_clss.append(other_tool_cls)
+      if self._tool_cache:
+         tool_factories = self._tool_cache.get_factories(tool_clss, self._system_type)
+      else:
+         tool_factories = comk.tool.Tool.get_factories(tool_clss, self._system_type)
+      self._prefetched_tool_factories.update(tool_factories)
+
    @classmethod
    def _match_system_type(cls, system_type):
       """Returns a confidence index of how much the platform models the specified system type.
@@ -423,9 +526,39 @@ class Platform(object):
 
       return 0
 
+   def object_suffix(self):
+      """Returns the suffix of intermediate object files generated by the C++ compiler.
+
+      The C++ compiler is not detected for this: if it hasn’t been detected yet and it’s not in the tool
+      cache, the suffix is guessed from the platform, so that commands that don’t need to build anything don’t
+      need to look for a compiler either. Since object file paths are always passed explicitly to the
+      compiler, a wrong guess only affects their file names.
+
+      str return
+         Object file suffix.
+      """
+
+      cxx_cls = self._get_known_tool_cls(comk.tool.CxxCompiler)
+      if cxx_cls:
+         return cxx_cls.object_suffix
+      return self._default_object_suffix()
+
+   def pch_suffix(self):
+      """Returns the suffix of precompiled header files generated by the C++ compiler. Like
+      Platform.object_suffix(), this doesn’t detect the C++ compiler.
+
+      str return
+         Precompiled header file suffix.
+      """
+
+      cxx_cls = self._get_known_tool_cls(comk.tool.CxxCompiler)
+      if cxx_cls:
+         return cxx_cls.pch_suffix
+      return self._default_pch_suffix()
+
    def set_tool(self, tool_cls, file_path):
-      """Applies the user’s choice of executable to be used as the specified tool type (e.g. CxxCompiler),
-      detecting the tool subtype (e.g. ClangxxCompiler).
+      """Applies the user’s choice of executable to be used as the specified tool type (e.g. CxxCompiler).
+      The tool subtype (e.g. ClangxxCompiler) is only detected when the tool is first needed.
 
       type tool_cls
          Subclass of comk.tool.Tool.
@@ -433,13 +566,24 @@ class Platform(object):
          Path to the tool’s executable.
       """
 
-      if tool_cls in self._tool_factories:
+      if tool_cls in self._tool_factories or tool_cls in self._tool_file_path_overrides:
          raise Exception('tool {} already set or detected for system type {}'.format(
             tool_cls.__name__, self._system_type
          ))
-      tool_factory_cls = tool_cls.get_factory(file_path, self._system_type)
-      self._tool_factories[tool_cls] = tool_factory_cls
- #    print('using {} as {}'.format(tool_factory_cls._file_path, tool_cls.__name__))
+      self._tool_file_path_overrides[tool_cls] = file_path
+      # Discard any factory detected along with another tool.
+      self._prefetched_tool_factories.pop(tool_cls, None)
+
+   def staticlib_file_name(self, name):
+      """Generates a file name for a static library from the specified name.
+
+      str name
+         Name of the static library.
+      str return
+         Name of the static library’s file.
+      """
+
+      raise NotImplementedError('Platform.staticlib_file_name() must be overridden in ' + type(self).__name__)
 
    def system_type(self):
       """Returns the system type from which the Platform instance was created.
@@ -450,11 +594,32 @@ class Platform(object):
 
       return self._system_type
 
+   def _get_tool_cache(self):
+      return self._tool_cache
+
+   def _set_tool_cache(self, tool_cache):
+      self._tool_cache = tool_cache
+
+   tool_cache = property(_get_tool_cache, _set_tool_cache, doc="""
+      comk.toolcache.ToolCache instance used to avoid detecting tools from scratch, or None.
+   """)
+
 ##############################################################################################################
 
 class PosixPlatform(Platform):
    """Abstract base for POSIX platforms."""
 
+   def _default_object_suffix(self):
+      """See Platform._default_object_suffix()."""
+
+      return '.o'
+
+   def _default_pch_suffix(self):
+      """See Platform._default_pch_suffix()."""
+
+      # G++ requires this suffix, and Clang accepts any.
+      return '.gch'
+
    def dynlib_file_name(self, name):
       """See Platform.dynlib_file_name()."""
 
@@ -475,6 +640,11 @@ class PosixPlatform(Platform):
 
       return name
 
+   def staticlib_file_name(self, name):
+      """See Platform.staticlib_file_name()."""
+
+      return 'lib{}.a'.format(name)
+
 ##############################################################################################################
 
 class DarwinPlatform(PosixPlatform):
@@ -568,6 +738,24 @@ class WinPlatform(Platform):
          tool.add_input_lib('user32')
          tool.add_input_lib('ws2_32')
 
+   def _default_object_suffix(self):
+      """See Platform._default_object_suffix()."""
+
+      if self._system_type.os.startswith('mingw'):
+         # MinGW uses GCC.
+         return '.o'
+      else:
+         return '.obj'
+
+   def _default_pch_suffix(self):
+      """See Platform._default_pch_suffix()."""
+
+      if self._system_type.os.startswith('mingw'):
+         # MinGW uses GCC.
+         return '.gch'
+      else:
+         return '.pch'
+
    def dynlib_file_name(self, name):
       """See Platform.dynlib_file_name()."""
 
@@ -588,6 +776,16 @@ class WinPlatform(Platform):
 
       return '{}.exe'.format(name)
 
+   def staticlib_file_name(self, name):
+      """See Platform.staticlib_file_name()."""
+
+      if self._system_type.os.startswith('mingw'):
+         # MinGW uses GCC.
+         return 'lib{}.a'.format(name)
+      else:
+         # Use a prefix to avoid clashing with the import library of a DLL with the same name.
+         return 'lib{}.lib'.format(name)
+
 ##############################################################################################################
 
 class Win32Platform(WinPlatform):
@@ -0,0 +1,310 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Remote storage for the compile and test caches, shared over HTTP by multiple machines.
+
+The protocol is deliberately minimal, so that any HTTP server able to store files can be used: each artifact
+is a file named after its key (a SHA-1 hash) plus a suffix identifying its kind, e.g. “<key>.object”; it’s
+downloaded with GET <base URL>/<name>, which must return 404 if the artifact is not stored, and uploaded with
+PUT <base URL>/<name>.
+
+comk.remotecache.RemoteCache is the client, used by comk.compilecache.CompileCache and
+comk.testcache.TestResultCache to fill their local directory with artifacts from the server and to upload
+the artifacts they create. If the server can’t be reached, the remote cache is disabled for the rest of the
+build, which then proceeds using only the local caches.
+
+comk.remotecache.CacheServer is a reference server storing artifacts in a directory; it can be started with
+complemake-cache-server.py.
+"""
+
+import io
+import os
+import re
+import socket
+import sys
+import threading
+
+import comk
+
+if sys.hexversion >= 0x03000000:
+   import http.client as httplib
+   import http.server as BaseHTTPServer
+   import socketserver as SocketServer
+   import urllib.error as urllib_error
+   import urllib.request as urllib_request
+else:
+   import BaseHTTPServer
+   import httplib
+   import SocketServer
+   import urllib2 as urllib_error
+   import urllib2 as urllib_request
+
+
+##############################################################################################################
+
+class RemoteCache(object):
+   """Client for a remote cache."""
+
+   # Logger instance.
+   _log = None
+   # See RemoteCache.readable.
+   _readable = None
+   # False once the server could not be reached.
+   _reachable = None
+   # Lock that must be acquired to change _reachable.
+   _reachable_lock = None
+   # Time, in seconds, to wait for the server to respond.
+   _timeout = None
+   # Base URL of the cache.
+   _url = None
+   # See RemoteCache.writable.
+   _writable = None
+
+   # Modes of operation.
+   MODE_READ = 'read'
+   MODE_READ_WRITE = 'read-write'
+   MODE_WRITE = 'write'
+   # Default time, in seconds, to wait for the server to respond.
+   TIMEOUT_DEFAULT = 5.0
+
+   def __init__(self, log, url, mode = MODE_READ_WRITE, timeout = TIMEOUT_DEFAULT):
+      """Constructor.
+
+      comk.logging.Logger log
+         Logger instance.
+      str url
+         Base URL of the cache.
+      str mode
+         One of RemoteCache.MODE_*, selecting whether artifacts are downloaded, uploaded, or both.
+      float timeout
+         Time, in seconds, to wait for the server to respond before giving up on it.
+      """
+
+      self._log = log
+      self._readable = mode in (self.MODE_READ, self.MODE_READ_WRITE)
+      self._reachable = True
+      self._reachable_lock = threading.Lock()
+      self._timeout = timeout
+      self._url = url.rstrip('/')
+      self._writable = mode in (self.MODE_WRITE, self.MODE_READ_WRITE)
+
+   def get(self, name):
+      """Downloads an artifact.
+
+      str name
+         Name of the artifact.
+      bytes return
+         Contents of the artifact, or None if the server doesn’t have it or can’t be reached.
+      """
+
+      if not self._readable or not self._reachable:
+         return None
+      log = self._log
+      try:
+         response = urllib_request.urlopen(self._get_url(name), timeout=self._timeout)
+         try:
+            contents = response.read()
+         finally:
+            response.close()
+      except urllib_error.HTTPError as x:
+         if x.code != 404:
+            log(log.LOW, 'remote-cache: GET {} failed: {} {}', name, x.code, x.reason)
+         return None
+      except (urllib_error.URLError, httplib.HTTPException, socket.error, socket.timeout) as x:
+         self._set_unreachable(x)
+         return None
+      log(log.HIGH, 'remote-cache: downloaded {} ({} bytes)', name, len(contents))
+      return contents
+
+   def _get_url(self, name):
+      """Returns the URL of an artifact.
+
+      str name
+         Name of the artifact.
+      str return
+         URL.
+      """
+
+      return '{}/{}'.format(self._url, name)
+
+   def put(self, name, contents):
+      """Uploads an artifact.
+
+      str name
+         Name of the artifact.
+      bytes contents
+         Contents of the artifact.
+      """
+
+      if not self._writable or not self._reachable:
+         return
+      log = self._log
+      request = urllib_request.Request(self._get_url(name), data=contents)
+      request.add_header('Content-Type', 'application/octet-stream')
+      # Python 2.7’s Request doesn’t accept a method argument.
+      request.get_method = lambda: 'PUT'
+      try:
+         urllib_request.urlopen(request, timeout=self._timeout).close()
+      except urllib_error.HTTPError as x:
+         log(log.LOW, 'remote-cache: PUT {} failed: {} {}', name, x.code, x.reason)
+         return
+      except (urllib_error.URLError, httplib.HTTPException, socket.error, socket.timeout) as x:
+         self._set_unreachable(x)
+         return
+      log(log.HIGH, 'remote-cache: uploaded {} ({} bytes)', name, len(contents))
+
+   def _get_readable(self):
+      return self._readable
+
+   readable = property(_get_readable, doc="""True if artifacts are downloaded from the remote cache.""")
+
+   def _set_unreachable(self, x):
+      """Disables the remote cache after a failure to reach the server, so that the rest of the build doesn’t
+      keep waiting for it.
+
+      Exception x
+         Exception that indicated the failure.
+      """
+
+      with self._reachable_lock:
+         if not self._reachable:
+            return
+         self._reachable = False
+      log = self._log
+      log(log.QUIET, 'complemake: remote cache {} unreachable, building locally: {}', self._url, x)
+
+   def _get_writable(self):
+      return self._writable
+
+   writable = property(_get_writable, doc="""True if artifacts are uploaded to the remote cache.""")
+
+##############################################################################################################
+
+# Pattern that names of artifacts must match, which also prevents requests from escaping the cache directory.
+_ARTIFACT_NAME_RE = re.compile(r'^[0-9a-f]{40}\.[a-z]+$')
+
+class _CacheRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+   """Handles requests to a CacheServer."""
+
+   # Respond with HTTP/1.1, allowing clients to keep connections alive.
+   protocol_version = 'HTTP/1.1'
+
+   def do_GET(self):
+      """Responds with the contents of an artifact, or 404 if it’s not stored."""
+
+      file_path = self._get_file_path()
+      if not file_path:
+         return
+      try:
+         with io.open(file_path, 'rb') as file:
+            contents = file.read()
+      except (comk.FileNotFoundErrorCompat, IOError, OSError):
+         self._send_status(404)
+         return
+      self.send_response(200)
+      self.send_header('Content-Type', 'application/octet-stream')
+      self.send_header('Content-Length', str(len(contents)))
+      self.end_headers()
+      self.wfile.write(contents)
+
+   def do_PUT(self):
+      """Stores an artifact, replacing any previous version."""
+
+      file_path = self._get_file_path()
+      if not file_path:
+         return
+      try:
+         size = int(self.headers.get('Content-Length'))
+      except (TypeError, ValueError):
+         self._send_status(411)
+         return
+      if size > self.server.artifact_size_max:
+         self._send_status(413)
+         return
+      contents = self.rfile.read(size)
+      # Write to a temporary file first, so that concurrent GETs never see a partial artifact.
+      temp_file_path = '{}.{}.tmp'.format(file_path, threading.current_thread().ident)
+      comk.makedirs(os.path.dirname(file_path))
+      with io.open(temp_file_path, 'wb') as file:
+         file.write(contents)
+      comk.replace_file(temp_file_path, file_path)
+      self._send_status(201)
+
+   def _get_file_path(self):
+      """Returns the path of the file storing the requested artifact, or responds with an error if the
+      request is not for a valid artifact name.
+
+      str return
+         Path to the file, or None if the request has been rejected.
+      """
+
+      name = self.path.lstrip('/')
+      if not _ARTIFACT_NAME_RE.match(name):
+         self._send_status(400)
+         return None
+      return os.path.join(self.server.dir, name[:2], name)
+
+   def log_message(self, format, *args):
+      """See BaseHTTPServer.BaseHTTPRequestHandler.log_message(). Overridden to only log if requested."""
+
+      if self.server.verbose:
+         BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+   def _send_status(self, code):
+      """Sends a response without a body.
+
+      int code
+         HTTP status code.
+      """
+
+      self.send_response(code)
+      self.send_header('Content-Length', '0')
+      self.end_headers()
+
+##############################################################################################################
+
+class CacheServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+   """Reference implementation of a remote cache server, storing artifacts in a directory. It’s meant for
+   testing and benchmarking on a trusted network, so it doesn’t perform any authentication.
+   """
+
+   # Don’t wait for request threads to complete when shutting down.
+   daemon_threads = True
+
+   def __init__(self, dir, address = ('127.0.0.1', 0), verbose = False):
+      """Constructor.
+
+      str dir
+         Directory in which to store artifacts. It will be created if it doesn’t exist.
+      tuple(str, int) address
+         Address and port to listen on; port 0 selects any available port.
+      bool verbose
+         If True, every request will be logged to stderr.
+      """
+
+      BaseHTTPServer.HTTPServer.__init__(self, address, _CacheRequestHandler)
+
+      comk.makedirs(dir)
+      self.artifact_size_max = 512 * 1024 * 1024
+      self.dir = dir
+      self.verbose = verbose
+
+   def _get_url(self):
+      return 'http://{}:{}'.format(*self.server_address[:2])
+
+   url = property(_get_url, doc="""Base URL of the cache served.""")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.remotecache."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import comk.logging
+import comk.remotecache as crc
+import comk.testcache
+import comk.testing
+
+
+##############################################################################################################
+
+class CacheServerMixIn(comk.testing.ServerMixIn):
+   def _create_server(self):
+      return crc.CacheServer(os.path.join(self._dir, 'server'))
+
+##############################################################################################################
+
+class RemoteCacheTest(CacheServerMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      name = '0123456789abcdef0123456789abcdef01234567.object'
+      cache = crc.RemoteCache(log, self._server.url)
+      self.assertIsNone(cache.get(name))
+      cache.put(name, b'\0contents')
+      self.assertEqual(cache.get(name), b'\0contents')
+
+      # A read-only cache must not upload anything.
+      other_name = '0123456789abcdef0123456789abcdef01234567.stderr'
+      read_only_cache = crc.RemoteCache(log, self._server.url, crc.RemoteCache.MODE_READ)
+      read_only_cache.put(other_name, b'x')
+      self.assertIsNone(cache.get(other_name))
+      self.assertEqual(read_only_cache.get(name), b'\0contents')
+
+      # A write-only cache must not download anything.
+      write_only_cache = crc.RemoteCache(log, self._server.url, crc.RemoteCache.MODE_WRITE)
+      self.assertIsNone(write_only_cache.get(name))
+
+      # Names that aren’t artifacts are rejected, and don’t disable the cache.
+      cache.put('../escape', b'x')
+      self.assertFalse(os.path.exists(os.path.join(self._dir, 'escape')))
+      self.assertEqual(cache.get(name), b'\0contents')
+
+##############################################################################################################
+
+class RemoteCacheUnreachableTest(unittest.TestCase):
+   def runTest(self):
+      # Get a port that nothing is listening on.
+      server = crc.CacheServer(tempfile.mkdtemp())
+      url = server.url
+      server.server_close()
+      shutil.rmtree(server.dir)
+
+      cache = crc.RemoteCache(comk.logging.Logger(comk.logging.LogGenerator()), url, timeout=1)
+      name = '0123456789abcdef0123456789abcdef01234567.json'
+      self.assertIsNone(cache.get(name))
+      # Once unreachable, the cache is no longer used.
+      self.assertFalse(cache._reachable)
+      cache.put(name, b'{}')
+
+##############################################################################################################
+
+class TestResultCacheRemoteTest(CacheServerMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      key = '0123456789abcdef0123456789abcdef01234567'
+      cache = comk.testcache.TestResultCache(
+         log, os.path.join(self._dir, 'cache1'), crc.RemoteCache(log, self._server.url)
+      )
+      cache.store(key, [('case', 2, 0)], b'')
+
+      # A cache with a different local directory should find the results on the server, and keep a copy.
+      cache = comk.testcache.TestResultCache(
+         log, os.path.join(self._dir, 'cache2'), crc.RemoteCache(log, self._server.url)
+      )
+      self.assertEqual(cache.lookup(key), ([('case', 2, 0)], ''))
+      cache = comk.testcache.TestResultCache(log, os.path.join(self._dir, 'cache2'))
+      self.assertEqual(cache.lookup(key), ([('case', 2, 0)], ''))
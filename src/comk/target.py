@@ -23,13 +23,19 @@ import locale
 import os
 import re
 import sys
+import time
 import weakref
 
 import comk
+import comk.compare
+import comk.compilecache
+import comk.configuration
 import comk.core
 import comk.dependency
 import comk.job
+import comk.logging
 import comk.project
+import comk.testcache
 import comk.tool
 import yaml
 
@@ -54,6 +60,9 @@ class Target(comk.dependency.Dependency):
    _dependencies = None
    # Weak ref to the owning make instance.
    _core = None
+   # Jobs enqueued to build the target, in the order in which they were enqueued. Released once the target is
+   # up-to-date.
+   _jobs = None
    # If True, the target has been built or at least verified to be up-to-date.
    _up_to_date = False
 
@@ -84,6 +93,7 @@ class Target(comk.dependency.Dependency):
       self._building = False
       self._dependencies = []
       self._core = weakref.ref(core)
+      self._jobs = []
       self._up_to_date = False
       core.add_target(self)
 
@@ -92,6 +102,8 @@ class Target(comk.dependency.Dependency):
          if sources:
             if not isinstance(sources, list):
                parser.raise_parsing_error('attribute “sources” must be a sequence')
+            # Target class and file path for each source.
+            source_targets = []
             for i, o in enumerate(sources):
                if isinstance(o, basestring):
                   file_path = o
@@ -120,11 +132,8 @@ class Target(comk.dependency.Dependency):
                      )
                else:
                   parser.raise_parsing_error('unsupported source file type “{}”'.format(file_path))
-
-               # Create the target, passing it the file path as its source.
-               target = cls(core, file_path, self)
-               # TODO: validate the type of target?
-               self.add_dependency(target)
+               source_targets.append((cls, file_path))
+            self._add_source_targets(parser, parsed, source_targets)
 
    def add_dependency(self, dep):
       """Adds a target dependency.
@@ -136,6 +145,25 @@ class Target(comk.dependency.Dependency):
       if dep not in self._dependencies:
          self._dependencies.append(dep)
 
+   def _add_source_targets(self, parser, parsed, source_targets):
+      """Creates the targets that process the sources listed in the “sources” attribute, adding them as
+      dependencies.
+
+      comk.project.Parser parser
+         Parser instantiating the object.
+      dict(object: object) parsed
+         Parsed YAML object being used to construct the instance.
+      list(tuple(type, str)*) source_targets
+         Target class and file path for each source.
+      """
+
+      core = parser.core
+      for cls, file_path in source_targets:
+         # Create the target, passing it the file path as its source.
+         target = cls(core, file_path, self)
+         # TODO: validate the type of target?
+         self.add_dependency(target)
+
    def _build_tool_run(self):
       """Enqueues any jobs necessary to unconditionally build the target."""
 
@@ -144,7 +172,7 @@ class Target(comk.dependency.Dependency):
       log(log.HIGH, 'target[{}]: queuing build tool job(s)', self)
       # Instantiate the appropriate tool, and have it schedule any applicable jobs.
       job = self._get_tool().create_jobs(core, self, self._on_build_tool_run_complete)
-      core.job_runner.enqueue(job)
+      self._enqueue_job(job)
 
    def _build_tool_should_run(self):
       """Checks if the target build tool needs to be run to freshen the target.
@@ -159,14 +187,16 @@ class Target(comk.dependency.Dependency):
    def _on_build_started(self):
       """Invoked after the target’s build is started."""
 
-      log = self._core().log
+      core = self._core()
+      log = core.log
       # Regenerate any out-of-date dependency targets.
       dependency_targets = tuple(filter(lambda dep: isinstance(dep, Target), self._dependencies))
       log(log.HIGH, 'target[{}]: updating {} dependency targets', self, len(dependency_targets))
       if dependency_targets:
          self._blocking_dependencies = len(dependency_targets)
          for dependency_target in dependency_targets:
-            dependency_target.start_build(self)
+            # Let the runner start the dependency’s build, instead of recursing into it.
+            core.job_runner.defer(dependency_target.start_build, self)
       else:
          # No dependencies are blocking, continue with the build.
          self._on_dependencies_updated()
@@ -215,23 +245,27 @@ class Target(comk.dependency.Dependency):
    def _on_metadata_updated(self):
       """Invoked after the metadata for the target has been updated."""
 
-      log = self._core().log
+      core = self._core()
+      log = core.log
       log(log.HIGH, 'target[{}]: unblocking dependents', self)
       # The target is built at this point, so its dependents can be unblocked.
       self._up_to_date = True
       self._building = False
       for dependent_target in self._blocked_dependents:
-         dependent_target()._on_dependency_updated()
+         core.job_runner.defer(dependent_target()._on_dependency_updated)
       self._blocked_dependents = None
+      self._jobs = None
       log(log.HIGH, 'target[{}]: end', self)
 
    def dump_dependencies(self, indent=''):
-      """TODO: comment."""
+      """Prints to stdout the direct dependencies of the target, one per line.
+
+      str indent
+         String to prefix each line with.
+      """
 
       for dep in self._dependencies:
          print(indent + str(dep))
-         if isinstance(dep, Target):
-            dep.dump_dependencies(indent + '  ')
 
    def get_dependencies(self, targets_only = False):
       """Iterates over the dependencies (comk.dependency.Dependency instances) for this target.
@@ -246,6 +280,31 @@ class Target(comk.dependency.Dependency):
          if not targets_only or isinstance(dep, Target):
             yield dep
 
+   def _enqueue_job(self, job):
+      """Enqueues a job that contributes to building the target, recording it in the build plan if one is
+      being generated.
+
+      comk.job.Job job
+         Job to enqueue.
+      """
+
+      core = self._core()
+      self._jobs.append(job)
+      if core.build_plan:
+         core.build_plan.add_job(self, job)
+      core.job_runner.enqueue(job)
+
+   def get_jobs(self):
+      """Iterates over the jobs enqueued to build the target during the current build.
+
+      comk.job.Job yield
+         Job enqueued to build the target.
+      """
+
+      if self._jobs:
+         for job in self._jobs:
+            yield job
+
    def _get_tool(self):
       """Instantiates and configures the tool to build the target. Not used by Target, but offers a model for
       derived classes to follow.
@@ -258,19 +317,21 @@ class Target(comk.dependency.Dependency):
 
    def start_build(self, dependent_target = None):
       """Begins building the target. Builds are asynchronous; use comk.job.Runner.run() to allow them to
-      complete.
+      complete. Dependencies are not built by this method directly, but by calls it defers to the runner, so
+      that the depth of the dependency graph doesn’t affect the depth of the stack.
 
       comk.target.Target dependent_target
          Target that will need to be unblocked when the build of this target completes. If self is already
          up-to-date, dependent_target will be unblocked immediately.
       """
 
-      log = self._core().log
+      core = self._core()
+      log = core.log
       if self._up_to_date:
          log(log.HIGH, 'target[{}]: skipping', self)
          # Nothing to do, but make sure we unblock the dependent target that called this method.
          if dependent_target:
-            dependent_target._on_dependency_updated()
+            core.job_runner.defer(dependent_target._on_dependency_updated)
       else:
          log(log.HIGH, 'target[{}]: begin', self)
          if dependent_target:
@@ -347,11 +408,15 @@ class FileTarget(comk.dependency.FileDependencyMixIn, Target):
 
    def _get_build_log_path(self):
       core = self._core()
-      return os.path.join(core.output_dir, core.LOG_DIR, self._file_path + '.log')
+      build_log_path = os.path.join(core.output_dir, core.LOG_DIR, self._file_path + '.log')
+      if core.log.compress_build_logs:
+         build_log_path += comk.logging.BuildLogFile.GZIP_SUFFIX
+      return build_log_path
 
    build_log_path = property(_get_build_log_path, doc="""
       Path to the file where the build log for this target (i.e. the captured stderr of the process that
-      builds it) is saved.
+      builds it) is saved. If build logs are compressed, this will end in
+      comk.logging.BuildLogFile.GZIP_SUFFIX.
    """)
 
 ##############################################################################################################
@@ -379,13 +444,39 @@ class ProcessedSourceTarget(FileTarget):
          Target that this target’s output will be linked into.
       """
 
-      FileTarget.__init__(self, core, os.path.join(core.output_dir, core.INT_DIR, source_file_path + suffix))
+      int_dir = os.path.join(core.output_dir, core.INT_DIR)
+      if source_file_path.startswith(int_dir + os.sep):
+         # Generated sources are already in the intermediate directory.
+         file_path = source_file_path + suffix
+      else:
+         file_path = os.path.join(int_dir, source_file_path + suffix)
+      FileTarget.__init__(self, core, file_path)
 
       self._source_file_path = source_file_path
       self._final_output = weakref.ref(final_output)
       self.add_dependency(comk.dependency.SourceFileDependency(self._source_file_path))
       # TODO: add external file dependencies.
 
+   def _configure_compiler(self, tool):
+      """Has the final output and the platform configure the specified compiler, or reuses the command line
+      generated by an identically-configured compiler for another source of the same final output.
+
+      comk.tool.Tool tool
+         Tool (compiler) to configure.
+      """
+
+      final_output = self._final_output()
+      if isinstance(final_output, BinaryTarget):
+         tool.args_template = final_output.get_compiler_args_template(tool)
+      else:
+         # Let the platform configure the compiler.
+         self._core().target_platform.configure_tool(tool)
+
+   def _get_source_file_path(self):
+      return self._source_file_path
+
+   source_file_path = property(_get_source_file_path, doc="""Source from which the target is built.""")
+
 ##############################################################################################################
 
 class CxxPreprocessedTarget(ProcessedSourceTarget):
@@ -407,25 +498,17 @@ class CxxPreprocessedTarget(ProcessedSourceTarget):
    def _get_tool(self):
       """See ProcessedSourceTarget._get_tool()."""
 
-      # TODO: refactor code shared with CxxObjectTarget._get_tool().
-
       core = self._core()
 
       cxx = core.target_platform.get_tool(comk.tool.CxxCompiler)
       cxx.output_file_path = self._file_path
       cxx.add_input(self._source_file_path)
+      # This must be set before configuring, since it affects the whole command line.
+      cxx.add_flags(comk.tool.CxxCompiler.CFLAG_PREPROCESS_ONLY)
 
-      if self._final_output:
-         final_output = self._final_output()
-         if isinstance(final_output, BinaryTarget):
-            # Let the final output configure the compiler.
-            final_output.configure_compiler(cxx)
-
-      # Let the platform configure the compiler.
-      core.target_platform.configure_tool(cxx)
+      self._configure_compiler(cxx)
 
       # TODO: add file-specific flags.
-      cxx.add_flags(comk.tool.CxxCompiler.CFLAG_PREPROCESS_ONLY)
       return cxx
 
    def _on_build_started(self):
@@ -453,6 +536,107 @@ class CxxPreprocessedTarget(ProcessedSourceTarget):
 
 ##############################################################################################################
 
+class CxxPrecompiledHeaderTarget(ProcessedSourceTarget):
+   """C++ precompiled header target. Every C++ object target of the final output depends on it, and is compiled
+   using it.
+   """
+
+   def __init__(self, core, header_file_path, final_output):
+      """Constructor.
+
+      comk.core.Core core
+         Core instance.
+      str header_file_path
+         Header from which the target is built.
+      comk.target.Target final_output
+         Target whose sources will be compiled using the precompiled header.
+      """
+
+      ProcessedSourceTarget.__init__(
+         self, core, header_file_path, core.target_platform.pch_suffix(), final_output
+      )
+
+   def _get_tool(self):
+      """See ProcessedSourceTarget._get_tool()."""
+
+      core = self._core()
+
+      cxx = core.target_platform.get_tool(comk.tool.CxxCompiler)
+      cxx.output_file_path = self._file_path
+      cxx.add_input(self._source_file_path)
+      # This must be set before configuring, since it affects the whole command line.
+      cxx.add_flags(comk.tool.CxxCompiler.CFLAG_CREATE_PCH)
+
+      self._configure_compiler(cxx)
+      return cxx
+
+##############################################################################################################
+
+class UnitySourceTarget(FileTarget):
+   """Generated C++ source that includes a batch of other sources, to compile them as a single translation
+   unit (“unity build”). The file is only rewritten when the list of sources changes.
+   """
+
+   # Sources included by the generated source.
+   _source_file_paths = None
+
+   def __init__(self, core, file_path, source_file_paths):
+      """Constructor.
+
+      comk.core.Core core
+         Core instance.
+      str file_path
+         Path to the source to generate.
+      iterable(str+) source_file_paths
+         Sources to include.
+      """
+
+      FileTarget.__init__(self, core, file_path)
+
+      self._source_file_paths = list(source_file_paths)
+
+   def _build_tool_run(self):
+      """See FileTarget._build_tool_run()."""
+
+      core = self._core()
+      log = core.log
+      log(log.HIGH, 'target[{}]: queuing generation job', self)
+      self._enqueue_job(comk.job.FileWriterJob(
+         self._on_build_tool_run_complete, self._file_path, self._get_contents(), log
+      ))
+
+   def _build_tool_should_run(self):
+      """See FileTarget._build_tool_should_run(). Overridden to check the contents of the file, since the list
+      of sources is not tracked by the metadata.
+      """
+
+      try:
+         with io.open(self._file_path, 'rb') as file:
+            return file.read() != self._get_contents().encode('utf-8')
+      except comk.FileNotFoundErrorCompat:
+         return True
+
+   def _get_contents(self):
+      """Returns the contents of the source to generate.
+
+      str return
+         Source code.
+      """
+
+      dir = os.path.dirname(self._file_path)
+      contents = '// Generated by Complemake; do not edit.\n\n'
+      for source_file_path in self._source_file_paths:
+         # Make paths relative to the generated source, since that’s where the compiler will look first.
+         contents += '#include "{}"\n'.format(os.path.relpath(source_file_path, dir).replace(os.sep, '/'))
+      return contents
+
+   def _get_source_file_paths(self):
+      return self._source_file_paths
+
+   source_file_paths = property(_get_source_file_paths, doc="""Sources included by the generated source.""")
+
+##############################################################################################################
+
 class ObjectTarget(ProcessedSourceTarget):
    """Intermediate object target."""
 
@@ -463,6 +647,13 @@ class ObjectTarget(ProcessedSourceTarget):
 class CxxObjectTarget(ObjectTarget):
    """C++ intermediate object target."""
 
+   # Manifest key in the compile cache for the command line of the compilation job being run, or None if the
+   # object won’t be stored in the compile cache.
+   _compile_cache_key = None
+   # Time at which the compilation job to be stored in the compile cache was queued, as returned by
+   # time.time().
+   _compile_start_time = None
+
    def __init__(self, core, source_file_path, final_output):
       """Constructor.
 
@@ -475,34 +666,76 @@ class CxxObjectTarget(ObjectTarget):
       """
 
       ObjectTarget.__init__(
-         self, core, source_file_path,
-         core.target_platform.get_tool(comk.tool.CxxCompiler).object_suffix, final_output
+         self, core, source_file_path, core.target_platform.object_suffix(), final_output
+      )
+
+      self._compile_cache_key = None
+      self._compile_start_time = None
+
+   def _build_tool_run(self):
+      """See ObjectTarget._build_tool_run(). Overridden to restore the object from the compile cache if an
+      identical compilation was cached, and to store the object in the cache after compiling it otherwise.
+      """
+
+      core = self._core()
+      compile_cache = core.compile_cache
+      # Profile data and split debug information are additional inputs and outputs of the compiler that
+      # the cache doesn’t track.
+      if not compile_cache or core.dry_run or core.pgo or (
+         core.split_dwarf and core.configuration.debug_info
+      ):
+         ObjectTarget._build_tool_run(self)
+         return
+
+      log = core.log
+      cxx = self._get_tool()
+      if not cxx.generate_depfile(self._get_depfile_path()):
+         # Without a dependency file there’s no way to know which headers went into the object.
+         self._enqueue_job(cxx.create_jobs(core, self, self._on_build_tool_run_complete))
+         return
+      job = cxx.create_jobs(core, self, self._on_compile_complete)
+      self._compile_cache_key = compile_cache.get_key(
+         job.get_command_args(), core.project_path, core.get_path_prefix_map() if core.reproducible else None
       )
+      if self._compile_cache_key:
+         object_key = compile_cache.lookup(self._compile_cache_key, core.project_path)
+         if object_key:
+            stderr = compile_cache.restore(object_key, core.inproject_path(self._file_path))
+            if stderr is not None:
+               log(log.HIGH, 'target[{}]: restored from compile cache entry {}', self, object_key)
+               self._compile_cache_key = None
+               self._enqueue_job(comk.compilecache.CachedCompilationJob(
+                  self._on_build_tool_run_complete, job.get_quiet_command(), log, stderr, self.build_log_path
+               ))
+               return
+      log(log.HIGH, 'target[{}]: queuing build tool job(s)', self)
+      # The job will start no earlier than this, so inputs modified since could have been read by the compiler
+      # in either version.
+      self._compile_start_time = time.time()
+      self._enqueue_job(job)
+
+   def _get_depfile_path(self):
+      """Returns the path to the dependency file generated by the compiler when the compile cache is in use.
+
+      str return
+         Path to the dependency file.
+      """
+
+      return os.path.splitext(self._file_path)[0] + '.d'
 
    def _get_tool(self):
       """See ObjectTarget._get_tool()."""
 
-      # TODO: refactor code shared with CxxPreprocessedTarget._get_tool().
-
       core = self._core()
 
       cxx = core.target_platform.get_tool(comk.tool.CxxCompiler)
       cxx.output_file_path = self._file_path
       cxx.add_input(self._source_file_path)
 
-      if False:
-         cxx.add_macro('COMPLEMAKE_USING_VALGRIND')
-
-      if self._final_output:
-         final_output = self._final_output()
-         if isinstance(final_output, BinaryTarget):
-            # Let the final output configure the compiler.
-            final_output.configure_compiler(cxx)
+      # TODO: add file-specific flags. They must be abstract flags, added before _configure_compiler(): the
+      # command line template is shared by all the objects with the same compiler class and abstract flags.
+      self._configure_compiler(cxx)
 
-      # Let the platform configure the compiler.
-      core.target_platform.configure_tool(cxx)
-
-      # TODO: add file-specific flags.
       return cxx
 
    def _on_build_started(self):
@@ -518,13 +751,36 @@ class CxxObjectTarget(ObjectTarget):
       # self._on_implicit_dependencies_gathered as the on_complete handler, instead of doing this:
       self._on_implicit_dependencies_gathered()
 
+   def _on_compile_complete(self):
+      """Invoked after the compilation job has completed, when the compile cache is in use."""
+
+      core = self._core()
+      if self._compile_cache_key:
+         stderr = comk.logging.read_build_log(self.build_log_path) or b''
+         core.compile_cache.store(
+            self._compile_cache_key, core.project_path, core.inproject_path(self._get_depfile_path()),
+            core.inproject_path(self._file_path), stderr, self._compile_start_time
+         )
+         self._compile_cache_key = None
+         self._compile_start_time = None
+      self._on_build_tool_run_complete()
+
    def _on_implicit_dependencies_gathered(self):
       """Invoked after the target’s implicit dependencies have been gathered."""
 
       # TODO: refactor code shared with CxxPreprocessedTarget._on_implicit_dependencies_gathered().
 
-      log = self._core().log
+      core = self._core()
+      log = core.log
       log(log.HIGH, 'target[{}]: dependencies gathered', self)
+      if core.pgo == comk.configuration.PGO_OPTIMIZE:
+         cxx = core.target_platform.get_tool(comk.tool.CxxCompiler)
+         pgo_profile_file_path = cxx.get_pgo_profile_file_path(core, self._file_path)
+         # Objects not linked into any training target have no profile data; if that changes, the new input
+         # will cause a rebuild anyway.
+         if pgo_profile_file_path and os.path.exists(core.inproject_path(pgo_profile_file_path)):
+            # Rebuild the object whenever the profile data it’s optimized with changes.
+            self.add_dependency(comk.dependency.PgoProfileDependency(pgo_profile_file_path))
       # Resume with the ObjectTarget build step we hijacked.
       ObjectTarget._on_build_started(self)
 
@@ -533,6 +789,16 @@ class CxxObjectTarget(ObjectTarget):
 class BinaryTarget(FileTarget):
    """Base class for binary (executable) target classes."""
 
+   # Command lines generated by compilers configured for this target (see
+   # BinaryTarget.get_compiler_args_template()), keyed by compiler class and abstract flags set before
+   # configuration (tuple(type, frozenset(comk.tool.AbstractFlag*)) => tuple(str+)).
+   _compiler_args_templates = None
+   # Precompiled header used to compile the C++ sources of this target, if any.
+   _pch_target = None
+
+   # Default count of sources included by each generated source in a unity build.
+   UNITY_BATCH_SIZE_DEFAULT = 8
+
    def __init__(self, parser, parsed):
       """Constructor. Automatically registers the path => target association with the specified Core instance.
 
@@ -544,6 +810,21 @@ class BinaryTarget(FileTarget):
 
       FileTarget.__init__(self, parser, parsed)
 
+      self._compiler_args_templates = {}
+
+      pch_file_path = parsed.get('precompiled header')
+      if pch_file_path is None:
+         self._pch_target = None
+      elif isinstance(pch_file_path, basestring):
+         self._pch_target = CxxPrecompiledHeaderTarget(parser.core, pch_file_path, self)
+         # Sources (already added by Target.__init__()) must be compiled after the precompiled header, and
+         # recompiled if it changes.
+         for dep in self._dependencies:
+            if isinstance(dep, CxxObjectTarget):
+               dep.add_dependency(self._pch_target)
+      else:
+         parser.raise_parsing_error('attribute “precompiled header” must be a string')
+
       libs = parsed.get('libraries')
       if libs:
          if not isinstance(libs, list):
@@ -575,6 +856,61 @@ class BinaryTarget(FileTarget):
             # A test must be built after the target it’s supposed to test.
             o.add_dependency(self)
 
+   def _add_source_targets(self, parser, parsed, source_targets):
+      """See FileTarget._add_source_targets(). Overridden to implement the “unity build” attribute: C++
+      sources are batched together in generated sources, each of which is compiled as a single object.
+      """
+
+      unity_build = parsed.get('unity build')
+      if unity_build is None or unity_build is False:
+         FileTarget._add_source_targets(self, parser, parsed, source_targets)
+         return
+      elif unity_build is True:
+         batch_size = self.UNITY_BATCH_SIZE_DEFAULT
+         excluded_file_paths = ()
+      elif isinstance(unity_build, dict):
+         batch_size = unity_build.get('batch size', self.UNITY_BATCH_SIZE_DEFAULT)
+         if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
+            parser.raise_parsing_error('attribute “batch size” of “unity build” must be a positive integer')
+         excluded_file_paths = unity_build.get('exclude') or ()
+         if not isinstance(excluded_file_paths, (list, tuple)) or \
+            not all(isinstance(o, basestring) for o in excluded_file_paths) \
+         :
+            parser.raise_parsing_error('attribute “exclude” of “unity build” must be a sequence of strings')
+      else:
+         parser.raise_parsing_error(
+            'attribute “unity build” must be a boolean or a mapping with “batch size” and/or “exclude”'
+         )
+
+      # Sources that can’t be batched are processed as usual.
+      unity_file_paths = []
+      other_source_targets = []
+      for cls, file_path in source_targets:
+         if cls is CxxObjectTarget and file_path not in excluded_file_paths:
+            unity_file_paths.append(file_path)
+         else:
+            other_source_targets.append((cls, file_path))
+      FileTarget._add_source_targets(self, parser, parsed, other_source_targets)
+
+      # Batches are based on the order of the sources, so they don’t change unless the list of sources does.
+      core = parser.core
+      file_path = parsed.get('path')
+      unity_base_file_path = os.path.join(
+         core.output_dir, core.INT_DIR, 'unity',
+         os.path.basename(file_path) if isinstance(file_path, basestring) else 'unnamed'
+      )
+      for i in range(0, len(unity_file_paths), batch_size):
+         batch_file_paths = unity_file_paths[i:i + batch_size]
+         unity_source_target = UnitySourceTarget(
+            core, '{}-{}.cxx'.format(unity_base_file_path, i // batch_size + 1), batch_file_paths
+         )
+         obj_target = CxxObjectTarget(core, unity_source_target.file_path, self)
+         obj_target.add_dependency(unity_source_target)
+         # The object needs to be rebuilt if any of the sources included by the generated source changes.
+         for batch_file_path in batch_file_paths:
+            obj_target.add_dependency(comk.dependency.SourceFileDependency(batch_file_path))
+         self.add_dependency(obj_target)
+
    def configure_compiler(self, tool):
       """Configures the specified Tool instance to generate code suitable for linking in this target.
 
@@ -583,7 +919,38 @@ class BinaryTarget(FileTarget):
       """
 
       # TODO: e.g. configure Link Time Code Generation to match this target.
-      pass
+
+      if self._pch_target and isinstance(tool, comk.tool.CxxCompiler):
+         abstract_flags = tool.abstract_flags
+         # Don’t use the precompiled header to generate itself, or when only preprocessing.
+         if comk.tool.CxxCompiler.CFLAG_CREATE_PCH not in abstract_flags and \
+            comk.tool.CxxCompiler.CFLAG_PREPROCESS_ONLY not in abstract_flags \
+         :
+            tool.use_pch(self._pch_target.source_file_path, self._pch_target.file_path)
+
+   def get_compiler_args_template(self, tool):
+      """Returns the command line (see comk.tool.Tool.get_args_template()) of a compiler configured by this
+      target and by the platform. The command line is only generated once for each compiler class and set of
+      abstract flags added before calling this method, since it’s the same for all the sources that make up
+      this target.
+
+      comk.tool.Tool tool
+         Tool (compiler) to configure, if the command line has not been generated yet.
+      tuple(str+) return
+         Command-line arguments.
+      """
+
+      key = (type(tool), tool.abstract_flags)
+      args_template = self._compiler_args_templates.get(key)
+      if not args_template:
+         core = self._core()
+         # Let this target configure the compiler.
+         self.configure_compiler(tool)
+         # Let the platform configure the compiler.
+         core.target_platform.configure_tool(tool)
+         args_template = tool.get_args_template(core)
+         self._compiler_args_templates[key] = args_template
+      return args_template
 
    def _get_tool(self):
       """See FileTarget._get_tool()."""
@@ -592,26 +959,80 @@ class BinaryTarget(FileTarget):
 
       lnk = core.target_platform.get_tool(comk.tool.Linker)
       lnk.output_file_path = self._file_path
+      if core.lto:
+         # Share the cache among all binaries, so that modules linked into more than one of them are only
+         # optimized once.
+         lnk.lto_cache_dir = os.path.join(core.output_dir, core.INT_DIR, core.LTO_CACHE_DIR)
       # TODO: add file-specific flags.
 
       # Let the platform configure the linker.
       core.target_platform.configure_tool(lnk)
 
       # At this point all the dependencies are available, so add them as inputs.
-      for dep in self._dependencies:
+      for object_file_path in self._get_object_file_paths():
+         lnk.add_input(object_file_path)
+      for dep in self._get_lib_dependencies():
          if isinstance(dep, comk.dependency.ExternalLibDependency):
             # Strings go directly to the linker’s command line, assuming that they are external libraries to
             # link to.
             lnk.add_input_lib(dep.name)
-         elif isinstance(dep, ObjectTarget):
-            lnk.add_input(dep.file_path)
          elif isinstance(dep, DynLibTarget):
             lnk.add_input_lib(dep.name)
+         elif isinstance(dep, StaticLibTarget):
+            # Use the archive’s path rather than its name, so the linker can’t pick a dynamic library instead.
+            # Since inputs precede libraries on the command line, the archive will follow the objects that
+            # reference it and precede the libraries it references, as required by single-pass linkers.
+            lnk.add_input(dep.file_path)
 
       # TODO: add other external dependencies.
 
       return lnk
 
+   def _get_lib_dependencies(self):
+      """Returns the libraries this target depends on, followed by the libraries that any static libraries
+      among them depend on, in an order suitable for single-pass linkers: each library precedes any library it
+      depends on.
+
+      list(comk.dependency.Dependency*) return
+         Library dependencies (comk.dependency.ExternalLibDependency, DynLibTarget or StaticLibTarget).
+      """
+
+      lib_deps = []
+      for dep in self._dependencies:
+         if isinstance(dep, (comk.dependency.ExternalLibDependency, DynLibTarget)):
+            lib_deps.append(dep)
+         elif isinstance(dep, StaticLibTarget):
+            lib_deps.append(dep)
+            # The objects in the archive haven’t been linked to anything, so their dependencies must be linked
+            # to whatever the archive is linked to.
+            lib_deps.extend(dep._get_lib_dependencies())
+      # If a library appears more than once, keep the last occurrence, so it follows everything depending on
+      # it.
+      unique_lib_deps = []
+      for i, dep in enumerate(lib_deps):
+         if dep not in lib_deps[i + 1:]:
+            unique_lib_deps.append(dep)
+      return unique_lib_deps
+
+   def _get_object_file_paths(self):
+      """Returns the paths to the object files that make up this target.
+
+      list(str*) return
+         Object file paths.
+      """
+
+      object_file_paths = []
+      for dep in self._dependencies:
+         if isinstance(dep, ObjectTarget):
+            object_file_paths.append(dep.file_path)
+      if self._pch_target:
+         core = self._core()
+         pch_object_suffix = core.target_platform.get_tool(comk.tool.CxxCompiler).pch_object_suffix
+         if pch_object_suffix:
+            # Include the object file generated along with the precompiled header.
+            object_file_paths.append(self._pch_target.file_path + pch_object_suffix)
+      return object_file_paths
+
    def validate(self):
       """See FileTarget.validate()."""
 
@@ -721,6 +1142,50 @@ class DynLibTarget(NamedBinaryTarget):
 
 ##############################################################################################################
 
+@comk.project.Parser.local_tag('complemake/target/staticlib', yaml.Kind.MAPPING)
+class StaticLibTarget(NamedBinaryTarget):
+   """Static library target. The output file will be placed in the “lib” directory relative to the output
+   base directory.
+
+   Static libraries are not linked: their objects are archived, and linked into any binary target that
+   depends on the static library, along with the libraries the static library depends on.
+   """
+
+   def __init__(self, parser, parsed):
+      """Constructor.
+
+      comk.project.Parser parser
+         Parser instantiating the object.
+      object parsed
+         Parsed YAML object to be used to construct the new instance.
+      """
+
+      # Default the “path” attribute before constructing the base class.
+      core = parser.core
+      parsed.setdefault('path', os.path.join(
+         # parsed['name'] may be missing, but NamedTargetMixIn will catch that.
+         core.output_dir, core.LIB_DIR, core.target_platform.staticlib_file_name(parsed.get('name', ''))
+      ))
+
+      NamedBinaryTarget.__init__(self, parser, parsed)
+
+   def _get_tool(self):
+      """See NamedBinaryTarget._get_tool(). Overridden to archive the objects instead of linking them."""
+
+      core = self._core()
+
+      ar = core.target_platform.get_tool(comk.tool.Archiver)
+      ar.output_file_path = self._file_path
+
+      # Let the platform configure the archiver.
+      core.target_platform.configure_tool(ar)
+
+      for object_file_path in self._get_object_file_paths():
+         ar.add_input(object_file_path)
+      return ar
+
+##############################################################################################################
+
 class TestTargetMixIn(object):
    """Mixin that provides functionality useful for all test Target subclasses."""
 
@@ -747,7 +1212,7 @@ class TestTargetMixIn(object):
       if output_transforms is None:
          self._output_transforms = []
       elif isinstance(output_transforms, FilterOutputTransform):
-         self._output_transforms = [o]
+         self._output_transforms = [output_transforms]
       elif isinstance(output_transforms, list):
          for i, o in enumerate(output_transforms):
             if not isinstance(o, OutputTransform):
@@ -771,6 +1236,41 @@ class TestTargetMixIn(object):
          dep = comk.dependency.TestExecScriptDependency(script_file_path)
          self.add_dependency(self, dep)
 
+   def _log_comparison(self, log, cmp_names, text, mismatch):
+      """Logs the comparison of two test outputs and its outcome. The comparison counts as an additional test
+      case with a single assertion.
+
+      comk.logging.Logger log
+         Log to write to.
+      list(str) cmp_names
+         Display names of the two comparison operands.
+      bool text
+         True if the operands were compared as text, or False if they were compared as bytes.
+      tuple(int, int, int) mismatch
+         Position of the first difference between the operands (see comk.compare.Comparator.mismatch), or
+         None if they are equal.
+      bool return
+         True if the operands are equal, or False otherwise.
+      """
+
+      if text:
+         cmp_verbose = 'internal:text-compare'
+         cmp_quiet = 'CMPTXT'
+      else:
+         cmp_verbose = 'internal:binary-compare'
+         cmp_quiet = 'CMPBIN'
+      if log.verbosity >= log.LOW:
+         log(log.LOW, '[{}] {} {}', cmp_verbose, *cmp_names)
+      else:
+         log(log.QUIET, '{} {} <=> {}', log.qm_tool_name(cmp_quiet), *cmp_names)
+      if mismatch:
+         log(
+            log.QUIET, '{}: error: {} and {} differ at offset {} (line {}, column {})',
+            self._name, cmp_names[0], cmp_names[1], *mismatch
+         )
+      log.add_testcase_result(self._name, 1, 1 if mismatch else 0)
+      return not mismatch
+
    def _transform_comparison_operand(self, o):
       """Transforms a comparison operand according to any “output transform” attributes specified in the
       project, and returns the result.
@@ -830,40 +1330,37 @@ class ToolTestTarget(NamedTargetMixIn, Target, TestTargetMixIn):
 
       core = self._core()
       log = core.log
+      if core.dry_run:
+         # The files to compare may not have been generated.
+         log(log.HIGH, 'target[{}]: dry run, skipping tool output validation', self)
+         self._on_build_tool_output_validated()
+         return
       log(log.HIGH, 'target[{}]: validating tool output', self)
 
-      # Extract and transform the contents of the two dependencies to compare, and generate a display name for
-      # them.
+      # Collect the two dependencies to compare (validate() ensured there are exactly two), and generate a
+      # display name for them.
       cmp_names = []
-      cmp_operands = []
+      cmp_file_paths = []
       for dep in self._dependencies:
          if isinstance(dep, (ProcessedSourceTarget, comk.dependency.OutputRerefenceDependency)):
-            # Add as comparison operand the contents of this dependency file.
             cmp_names.append(dep.file_path)
-            with io.open(core.inproject_path(dep.file_path), 'rb') as comparand:
-               cmp_operands.append(self._transform_comparison_operand(comparand.read()))
-
-      # At this point we expect 0 <= len(cmp_operands) <= 2, but we’ll check that a few more lines below.
-      if isinstance(cmp_operands[0], basestring):
-         cmp_verbose = 'internal:text-compare'
-         cmp_quiet = 'CMPTXT'
-      else:
-         cmp_verbose = 'internal:binary-compare'
-         cmp_quiet = 'CMPBIN'
-      if log.verbosity >= log.LOW:
-         log(log.LOW, '[{}] {} {}', cmp_verbose, *cmp_names)
-      else:
-         log(log.QUIET, '{} {} <=> {}', log.qm_tool_name(cmp_quiet), *cmp_names)
+            cmp_file_paths.append(core.inproject_path(dep.file_path))
 
       # Compare the targets.
       # TODO: make this asynchronously, passing self._on_build_tool_output_validated as the on_complete
       # handler for a new job, instead of doing this and the last line.
-      equal = (cmp_operands[0] == cmp_operands[1])
-      if not equal:
-         log(log.QUIET, '{}: error: {} and {} differ', self._name, *cmp_names)
-      # This comparison counts as an additional test case with a single assertion.
-      log.add_testcase_result(self._name, 1, 0 if equal else 1)
-      if not equal:
+      if self._output_transforms:
+         # Transformations need the whole contents of the files.
+         cmp_operands = []
+         for file_path in cmp_file_paths:
+            with io.open(file_path, 'rb') as comparand:
+               cmp_operands.append(self._transform_comparison_operand(comparand.read()))
+         text = isinstance(cmp_operands[0], basestring)
+         mismatch = comk.compare.compare_objects(*cmp_operands)
+      else:
+         text = False
+         mismatch = comk.compare.compare_files(*cmp_file_paths)
+      if not self._log_comparison(log, cmp_names, text, mismatch):
          return
 
       self._on_build_tool_output_validated()
@@ -900,6 +1397,9 @@ class ExecutableTestTarget(NamedBinaryTarget, TestTargetMixIn):
    # and if missing mapped to None to mean False with auto-detection that can change it to True using the
    # current logic in add_dependency().
    _uses_lofty_testing = None
+   # Key in the test cache for the test run in progress, or None if its results won’t be stored in the test
+   # cache.
+   _test_cache_key = None
 
    def __init__(self, parser, parsed):
       """Constructor.
@@ -920,6 +1420,8 @@ class ExecutableTestTarget(NamedBinaryTarget, TestTargetMixIn):
       NamedBinaryTarget.__init__(self, parser, parsed)
       TestTargetMixIn.__init__(self, parser, parsed)
 
+      self._test_cache_key = None
+
    def add_dependency(self, dep):
       """See NamedBinaryTarget.add_dependency(). Overridden to detect if the test is linked to lofty-testing,
       making it compatible with being run via LoftyTestJob.
@@ -927,7 +1429,8 @@ class ExecutableTestTarget(NamedBinaryTarget, TestTargetMixIn):
 
       # Check if this test uses the lofty-testing framework.
       if isinstance(dep, (
-         comk.dependency.UndeterminedLibDependency, comk.dependency.ExternalLibDependency, DynLibTarget
+         comk.dependency.UndeterminedLibDependency, comk.dependency.ExternalLibDependency, DynLibTarget,
+         StaticLibTarget
       )):
          if dep.name == 'lofty-testing':
             self._uses_lofty_testing = True
@@ -961,21 +1464,51 @@ class ExecutableTestTarget(NamedBinaryTarget, TestTargetMixIn):
       # file.
       if len(args) > 1:
          core.target_platform.adjust_popen_args_for_script(popen_args)
+      if core.pgo == comk.configuration.PGO_INSTRUMENT and not core.dry_run:
+         popen_args['env'] = core.target_platform.get_tool(comk.tool.CxxCompiler).get_pgo_training_environ(
+            core, self._name, popen_args['env']
+         )
+
+      # Instrumented binaries must really run, to collect profile data.
+      if core.test_cache and not core.dry_run and not core.force_test and \
+         core.pgo != comk.configuration.PGO_INSTRUMENT \
+      :
+         self._test_cache_key = self._get_test_cache_key(args, popen_args['env'] or os.environ)
+         if self._test_cache_key:
+            cached_results = core.test_cache.lookup(self._test_cache_key)
+            if cached_results:
+               log(log.HIGH, 'target[{}]: replaying results from test cache', self)
+               self._test_cache_key = None
+               test_case_results, stderr = cached_results
+               self._enqueue_job(comk.testcache.CachedTestJob(
+                  self._on_test_results_replayed, self._name, log, test_case_results, stderr,
+                  self.build_log_path
+               ))
+               return
 
       # If the build target uses lofty::testing, run it with the special lofty::testing job, LoftyTestJob.
       if self._uses_lofty_testing:
          job_cls = comk.job.LoftyTestJob
       else:
          job_cls = comk.job.ExternalCmdCapturingJob
-      # This will store stdout and stderr of the program to file, and will buffer stdout in memory so we can
-      # use it in _on_build_tool_run_complete() if we need to, without disk access.
+      # This will store stdout and stderr of the program to file. If the output is to be compared, it will be
+      # compared as it’s read, or, if it needs to be transformed first, kept (in memory, unless too large) so
+      # we can use it in _on_test_run_complete().
+      keep_stdout = False
+      stdout_comparator = None
+      for dep in self._dependencies:
+         if isinstance(dep, comk.dependency.OutputRerefenceDependency):
+            if self._output_transforms:
+               keep_stdout = True
+            else:
+               stdout_comparator = comk.compare.StreamComparator(core.inproject_path(dep.file_path))
       job = job_cls(
          self._on_test_run_complete, ('TEST', self._name), popen_args,
-         core.log, self.build_log_path, self.file_path + '.out'
+         core.log, self.build_log_path, self.file_path + '.out', keep_stdout, stdout_comparator
       )
       # TODO: FIXME? How can this catch an exception if the job is not started synchronously?
       try:
-         core.job_runner.enqueue(job)
+         self._enqueue_job(job)
          started = True
       except OSError as x:
          # On POSIX, x.errno == ENOEXEC (8, “Exec format error”) indicates that the binary is for a different
@@ -988,57 +1521,108 @@ class ExecutableTestTarget(NamedBinaryTarget, TestTargetMixIn):
             # Not something we consider acceptable.
             raise
       if not started:
+         if stdout_comparator:
+            stdout_comparator.close()
          # Report that the test was not run, and skip self._on_test_run_complete().
          log(log.QUIET, '{} {}', log.qm_tool_name('SKIP-X'), ' '.join(args))
          NamedBinaryTarget._on_build_tool_run_complete(self)
 
+   def _get_test_cache_key(self, args, env):
+      """Computes the key of the test run in the test cache.
+
+      list(str+) args
+         Command-line arguments of the test.
+      dict(str: str) env
+         Environment the test will run in.
+      str return
+         Key, or None if the test run can’t be cached.
+      """
+
+      core = self._core()
+      # The script (if any) and the executable.
+      file_paths = [core.inproject_path(arg) for arg in args]
+      for dep in self._dependencies:
+         if isinstance(dep, comk.dependency.OutputRerefenceDependency):
+            file_paths.append(core.inproject_path(dep.file_path))
+      # Libraries the test can load from directories added to the library search path by Complemake, i.e.
+      # ones built by this project or its dependencies; system libraries are assumed not to change.
+      env_var = core.target_platform.dynlib_path_env_var()
+      path_separator = core.target_platform.env_path_separator()
+      system_lib_dirs = os.environ.get(env_var, '').split(path_separator)
+      for lib_dir in env.get(env_var, '').split(path_separator):
+         if lib_dir and lib_dir not in system_lib_dirs and os.path.isdir(lib_dir):
+            for file_name in sorted(os.listdir(lib_dir)):
+               file_path = os.path.join(lib_dir, file_name)
+               if os.path.isfile(file_path):
+                  file_paths.append(file_path)
+      # Relative paths in the command line are relative to the project directory, where the test runs.
+      options = [core.project_path, 'lofty-testing:{}'.format(bool(self._uses_lofty_testing))]
+      for output_transform in self._output_transforms:
+         options.append(output_transform.get_signature())
+      return core.test_cache.get_key(args, env, file_paths, options)
+
+   def _on_test_results_replayed(self):
+      """Invoked after the results of the test have been replayed from the test cache."""
+
+      NamedBinaryTarget._on_build_tool_run_complete(self)
+
    def _on_test_run_complete(self):
       """Invoked after the test has been run."""
 
       core = self._core()
       log = core.log
+      if core.dry_run:
+         # The test was not really run, so there’s no output to compare; just release the expected output.
+         job = self._jobs[-1]
+         if job.stdout_comparator:
+            job.stdout_comparator.close()
+         NamedBinaryTarget._on_build_tool_run_complete(self)
+         return
       log(log.HIGH, 'target[{}]: updating dependencies', self)
 
-      # Extract and transform the contents of the two dependencies to compare, and generate a display name for
-      # them.
-      cmp_names = []
-      cmp_operands = []
+      # Find the expected output, if any (validate() ensured there’s at most one).
       for dep in self._dependencies:
          if isinstance(dep, comk.dependency.OutputRerefenceDependency):
-            # Add as comparison operand the contents of this dependency file.
-            cmp_names.append(dep.file_path)
-            with io.open(core.inproject_path(dep.file_path), 'rb') as comparand:
-               cmp_operands.append(self._transform_comparison_operand(comparand.read()))
-
-      # At this point we expect 0 <= len(cmp_operands) <= 2, but we’ll check that a few more lines below.
-      if cmp_operands:
-         # We have a build target and at least another comparison operand, so the job that just completed must
-         # be of type ExternalPipedCommandJob, and we’ll add its output as comparison operand.
-         cmp_names.append(job.stdout_file_path)
-         cmp_operands.append(self._transform_comparison_operand(job.stdout))
+            expected_output_file_path = dep.file_path
+            break
+      else:
+         expected_output_file_path = None
 
-         if isinstance(cmp_operands[0], basestring):
-            cmp_verbose = 'internal:text-compare'
-            cmp_quiet = 'CMPTXT'
-         else:
-            cmp_verbose = 'internal:binary-compare'
-            cmp_quiet = 'CMPBIN'
-         if log.verbosity >= log.LOW:
-            log(log.LOW, '[{}] {} {}', cmp_verbose, *cmp_names)
+      if expected_output_file_path:
+         # We have an expected output, so the job that just completed (the last one enqueued) must be of type
+         # ExternalCmdCapturingJob, and we’ll compare its output against the expected output.
+         job = self._jobs[-1]
+         cmp_names = [expected_output_file_path, job.stdout_file_path]
+         if job.stdout_comparator:
+            # The output has already been compared as it was read.
+            text = False
+            mismatch = job.stdout_comparator.close()
          else:
-            log(log.QUIET, '{} {} <=> {}', log.qm_tool_name(cmp_quiet), *cmp_names)
-
-         # Compare the targets.
-         equal = (cmp_operands[0] == cmp_operands[1])
-         if not equal:
-            log(log.QUIET, '{}: error: {} and {} differ', self._name, *cmp_names)
-            ret = 1
-         # This comparison counts as an additional test case with a single assertion.
-         log.add_testcase_result(self._name, 1, 0 if equal else 1)
-         if ret != 0:
+            # Transform both operands; slicing the output makes sure that we have a bytes instance even if the
+            # job had to map its output file.
+            with io.open(core.inproject_path(expected_output_file_path), 'rb') as comparand:
+               expected_output = self._transform_comparison_operand(comparand.read())
+            output = self._transform_comparison_operand(job.stdout[:])
+            text = isinstance(expected_output, basestring)
+            mismatch = comk.compare.compare_objects(expected_output, output)
+         if not self._log_comparison(log, cmp_names, text, mismatch):
             # TODO: report build failure.
             return
 
+      if self._test_cache_key:
+         job = self._jobs[-1]
+         if isinstance(job, comk.job.LoftyTestJob):
+            test_case_results = list(job.test_case_results)
+         else:
+            test_case_results = []
+         if expected_output_file_path:
+            # The output comparison counts as a test case; see TestTargetMixIn._log_comparison().
+            test_case_results.append((self._name, 1, 0))
+         if not any(failed_assertions for title, total_assertions, failed_assertions in test_case_results):
+            stderr = comk.logging.read_build_log(self.build_log_path) or b''
+            core.test_cache.store(self._test_cache_key, test_case_results, stderr)
+         self._test_cache_key = None
+
       NamedBinaryTarget._on_build_tool_run_complete(self)
 
    def validate(self):
@@ -1060,7 +1644,16 @@ class ExecutableTestTarget(NamedBinaryTarget, TestTargetMixIn):
 class OutputTransform(object):
    """Base class for output transformations."""
 
-   pass
+   def get_signature(self):
+      """Returns a string that identifies the transformation, used to detect whether it changed.
+
+      str return
+         Signature of the transformation.
+      """
+
+      raise NotImplementedError(
+         'OutputTransform.get_signature() must be overridden in ' + type(self).__name__
+      )
 
 ##############################################################################################################
 
@@ -1102,3 +1695,8 @@ class FilterOutputTransform(OutputTransform):
       elif not isinstance(o, unistr):
          raise TypeError('cannot transform objects of type {}'.format(type(o).__name__))
       return '\n'.join(self._re.findall(o))
+
+   def get_signature(self):
+      """See OutputTransform.get_signature()."""
+
+      return 'filter:' + self._re.pattern
@@ -0,0 +1,255 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Cache of the outcome of passing test runs, shared by all projects.
+
+A test target is run again whenever its executable is rebuilt, even if the new executable is identical to the
+one that passed the last time, e.g. after a clean or a change to a comment. comk.testcache.TestResultCache
+stores the results of each passing run under a key computed from everything that could affect it: the
+command line, the contents of the executable, its script (if any), the libraries it can load from the
+directories Complemake adds to the library search path, the expected output, how the output is compared, and
+the environment the test is run in. A later run with the same key replays the results instead of running
+the test.
+
+If a comk.remotecache.RemoteCache is provided, entries missing from the local directory are downloaded from
+it, and new entries are uploaded to it.
+
+Each entry is a small file, so entries are never evicted.
+"""
+
+import hashlib
+import io
+import json
+import locale
+import os
+
+import comk
+import comk.job
+
+
+##############################################################################################################
+
+class TestResultCache(object):
+   """Cache of test results."""
+
+   # Path to the directory containing the cache.
+   _dir = None
+   # Logger instance.
+   _log = None
+   # Remote cache, if any.
+   _remote_cache = None
+
+   # Changing this invalidates all existing entries; must be changed whenever the format of the cache, or
+   # the way keys are computed, changes.
+   VERSION = '1'
+   # Environment variables that are ignored when computing keys, since shells change them for reasons that
+   # don’t concern the test.
+   VOLATILE_ENV_VARS = ('_', 'OLDPWD', 'SHLVL')
+
+   def __init__(self, log, dir, remote_cache = None):
+      """Constructor.
+
+      comk.logging.Logger log
+         Logger instance.
+      str dir
+         Path to the directory containing the cache. It will be created if it doesn’t exist.
+      comk.remotecache.RemoteCache remote_cache
+         Remote cache to download entries from and upload them to, or None to only use the local directory.
+      """
+
+      self._dir = dir
+      self._log = log
+      self._remote_cache = remote_cache
+
+   def get_key(self, args, env, file_paths, options):
+      """Computes the key for a test run.
+
+      iterable(str+) args
+         Command-line arguments of the test.
+      dict(str: str) env
+         Environment the test is run in.
+      iterable(str*) file_paths
+         Files whose contents affect the outcome of the test, e.g. its executable.
+      iterable(str*) options
+         Any other settings that affect the outcome of the test, e.g. how its output is compared.
+      str return
+         Key, or None if one of the files can’t be read, in which case the results can’t be cached.
+      """
+
+      hash = hashlib.sha1(self.VERSION.encode('utf-8'))
+      for arg in args:
+         hash.update(b'\0' + arg.encode('utf-8'))
+      for name in sorted(env.keys()):
+         if name not in self.VOLATILE_ENV_VARS:
+            hash.update('\0{}={}'.format(name, env[name]).encode('utf-8'))
+      for file_path in file_paths:
+         try:
+            file_hash = comk.hash_file(file_path)
+         except (IOError, OSError):
+            return None
+         hash.update('\0{}\0{}'.format(file_path, file_hash).encode('utf-8'))
+      for option in options:
+         hash.update(b'\0' + option.encode('utf-8'))
+      return hash.hexdigest()
+
+   def _get_entry_file_path(self, key):
+      """Returns the path to the file storing an entry.
+
+      str key
+         Key of the entry.
+      str return
+         Path to the file.
+      """
+
+      # Spread files over subdirectories to keep directories small.
+      return os.path.join(self._dir, key[:2], key + '.json')
+
+   def lookup(self, key):
+      """Looks for the results of a passing run of a test.
+
+      str key
+         Key, as returned by TestResultCache.get_key().
+      tuple(list(tuple(str, int, int)*), str) return
+         Results of the test cases, as (title, total assertions, failed assertions) tuples, and error output
+         of the test; or None if no results are cached for the key.
+      """
+
+      file_path = self._get_entry_file_path(key)
+      try:
+         with io.open(file_path, 'rb') as file:
+            contents = file.read()
+      except (comk.FileNotFoundErrorCompat, IOError, OSError):
+         if not self._remote_cache:
+            return None
+         contents = self._remote_cache.get(key + '.json')
+         if contents is None:
+            return None
+         self._write_entry_file(file_path, contents)
+      try:
+         entry = json.loads(contents.decode('utf-8'))
+         test_case_results = [tuple(result) for result in entry['test_cases']]
+         stderr = entry['stderr']
+      except (ValueError, KeyError, TypeError):
+         return None
+      return test_case_results, stderr
+
+   def store(self, key, test_case_results, stderr):
+      """Stores the results of a passing run of a test.
+
+      str key
+         Key, as returned by TestResultCache.get_key().
+      iterable(tuple(str, int, int)*) test_case_results
+         Results of the test cases, as (title, total assertions, failed assertions) tuples.
+      bytes stderr
+         Error output of the test.
+      """
+
+      log = self._log
+      log(log.HIGH, 'test-cache: storing results as {}', key)
+      contents = json.dumps({
+         'test_cases': [list(result) for result in test_case_results],
+         'stderr'    : stderr.decode(locale.getpreferredencoding(), 'replace'),
+      }, sort_keys=True).encode('utf-8')
+      self._write_entry_file(self._get_entry_file_path(key), contents)
+      if self._remote_cache:
+         self._remote_cache.put(key + '.json', contents)
+
+   def _write_entry_file(self, file_path, contents):
+      """Writes the file storing an entry.
+
+      str file_path
+         Path to the file.
+      bytes contents
+         Contents of the file.
+      """
+
+      try:
+         comk.makedirs(os.path.dirname(file_path))
+         # Entries with the same key have the same contents, so replacing the file atomically is enough to
+         # allow concurrent use.
+         temp_file_path = '{}.{}.tmp'.format(file_path, os.getpid())
+         with io.open(temp_file_path, 'wb') as file:
+            file.write(contents)
+         comk.replace_file(temp_file_path, file_path)
+      except (IOError, OSError) as x:
+         log = self._log
+         log(log.QUIET, 'complemake: unable to store test results in the test cache: {}', x)
+
+##############################################################################################################
+
+class CachedTestJob(comk.job.SynchronousJob):
+   """Stands in for a test run whose results were found in the test cache, replaying them."""
+
+   # Logger instance.
+   _log = None
+   # Name of the test.
+   _name = None
+   # Error output of the test.
+   _stderr = None
+   # Path to the file where the error output will be saved.
+   _stderr_file_path = None
+   # Results of the test cases.
+   _test_case_results = None
+
+   def __init__(self, on_complete_fn, name, log, test_case_results, stderr, stderr_file_path):
+      """Constructor.
+
+      callable on_complete_fn
+         Function to be called when the job completes.
+      str name
+         Name of the test.
+      comk.logging.Logger log
+         Object to which the test case results will be reported.
+      iterable(tuple(str, int, int)*) test_case_results
+         Results of the test cases, as (title, total assertions, failed assertions) tuples.
+      str stderr
+         Error output of the test.
+      str stderr_file_path
+         Path to the file where the error output will be saved.
+      """
+
+      comk.job.SynchronousJob.__init__(self, on_complete_fn)
+
+      self._log = log
+      self._name = name
+      self._stderr = stderr
+      self._stderr_file_path = stderr_file_path
+      self._test_case_results = test_case_results
+
+   def get_quiet_command(self):
+      """See SynchronousJob.get_quiet_command()."""
+
+      return 'CACHED', self._name
+
+   def get_verbose_command(self):
+      """See SynchronousJob.get_verbose_command()."""
+
+      return 'replay cached results of test {}'.format(self._name)
+
+   def run(self):
+      """See SynchronousJob.run()."""
+
+      log = self._log
+      # Only save the error output to the build log instead of showing it again, since the test is known to
+      # pass.
+      with log.open_build_log(self._stderr_file_path) as stderr:
+         for line in self._stderr.splitlines(True):
+            stderr.write(line)
+      for title, total_assertions, failed_assertions in self._test_case_results:
+         log.add_testcase_result(title, total_assertions, failed_assertions)
+      return 0
@@ -0,0 +1,62 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.testcache."""
+
+import io
+import os
+import unittest
+
+import comk.logging
+import comk.testcache as ctc
+import comk.testing
+
+
+##############################################################################################################
+
+class TestResultCacheTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache = ctc.TestResultCache(log, os.path.join(self._dir, 'cache'))
+      exe_file_path = os.path.join(self._dir, 'test')
+      with io.open(exe_file_path, 'wb') as exe:
+         exe.write(b'v1')
+      args = [exe_file_path]
+      env = {'PATH': '/bin', 'SHLVL': '1'}
+
+      key = cache.get_key(args, env, [exe_file_path], ['filter:.*'])
+      self.assertIsNone(cache.lookup(key))
+      cache.store(key, [('case 1', 3, 0), ('case 2', 1, 0)], b'note\n')
+
+      # Another instance should find the results.
+      cache = ctc.TestResultCache(log, os.path.join(self._dir, 'cache'))
+      self.assertEqual(cache.get_key(args, env, [exe_file_path], ['filter:.*']), key)
+      self.assertEqual(cache.lookup(key), ([('case 1', 3, 0), ('case 2', 1, 0)], 'note\n'))
+
+      # Volatile environment variables don’t affect the key, but other changes do.
+      volatile_env = {'PATH': '/bin', 'SHLVL': '2'}
+      self.assertEqual(cache.get_key(args, volatile_env, [exe_file_path], ['filter:.*']), key)
+      self.assertNotEqual(cache.get_key(args, {'PATH': '/usr/bin'}, [exe_file_path], ['filter:.*']), key)
+      self.assertNotEqual(cache.get_key(args, env, [exe_file_path], ['filter:x']), key)
+      self.assertNotEqual(cache.get_key(args + ['-x'], env, [exe_file_path], ['filter:.*']), key)
+      with io.open(exe_file_path, 'wb') as exe:
+         exe.write(b'version 2')
+      self.assertNotEqual(cache.get_key(args, env, [exe_file_path], ['filter:.*']), key)
+
+      # A missing file makes the run uncacheable.
+      self.assertIsNone(cache.get_key(args, env, [os.path.join(self._dir, 'missing')], []))
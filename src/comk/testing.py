@@ -0,0 +1,77 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Fixtures shared by the test cases of the comk package (comk.*_test)."""
+
+import shutil
+import tempfile
+import threading
+
+
+##############################################################################################################
+
+class TempDirMixIn(object):
+   """Mixin for unittest.TestCase subclasses that gives each test a temporary directory, self._dir, deleted
+   after the test.
+   """
+
+   # Path to the temporary directory.
+   _dir = None
+
+   def setUp(self):
+      self._dir = tempfile.mkdtemp()
+
+   def tearDown(self):
+      shutil.rmtree(self._dir)
+
+##############################################################################################################
+
+class ServerMixIn(TempDirMixIn):
+   """Mixin for unittest.TestCase subclasses that runs a server, self._server, in a separate thread for the
+   duration of each test. The server is created by _create_server(), which can use the temporary directory
+   (self._dir) to store its data.
+   """
+
+   # Server instance, a subclass of SocketServer.BaseServer.
+   _server = None
+   # Thread running _server.
+   _server_thread = None
+
+   def _create_server(self):
+      """Creates the server to run.
+
+      SocketServer.BaseServer return
+         Server instance.
+      """
+
+      raise NotImplementedError('ServerMixIn._create_server() must be overridden in ' + type(self).__name__)
+
+   def setUp(self):
+      TempDirMixIn.setUp(self)
+
+      self._server = self._create_server()
+      self._server_thread = threading.Thread(target=self._server.serve_forever)
+      self._server_thread.daemon = True
+      self._server_thread.start()
+
+   def tearDown(self):
+      self._server.shutdown()
+      self._server.server_close()
+      self._server_thread.join()
+
+      TempDirMixIn.tearDown(self)
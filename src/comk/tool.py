@@ -20,13 +20,17 @@
 very different implementations.
 """
 
+import io
 import os
 import re
 import shlex
 import subprocess
+import threading
 
 import comk
+import comk.configuration
 import comk.core
+import comk.distcompile
 import comk.job
 import comk.logging
 import comk.version
@@ -80,6 +84,8 @@ class ToolFactory(object):
    _args = None
    # Name by which the tool shall be invoked.
    _file_path = None
+   # See ToolFactory.helper_file_paths.
+   _helper_file_paths = None
    # Tool subclass that the factory will instantiate.
    _product_cls = None
    # Target system type.
@@ -87,7 +93,7 @@ class ToolFactory(object):
    # Tool version.
    _ver = None
 
-   def __init__(self, product_cls, file_path, target_system_type, ver, args = None):
+   def __init__(self, product_cls, file_path, target_system_type, ver, args = None, helper_file_paths = None):
       """Constructor.
 
       type product_cls
@@ -100,10 +106,13 @@ class ToolFactory(object):
          Version of the tool.
       iterable(str*) args
          Optional list of additional arguments to be provided to the tool.
+      iterable(str*) helper_file_paths
+         Optional list of names of, or paths to, other executables that affected the detection of the tool.
       """
 
       self._args = args
       self._file_path = file_path
+      self._helper_file_paths = helper_file_paths
       self._product_cls = product_cls
       self._target_system_type = target_system_type
       self._ver = ver
@@ -117,6 +126,40 @@ class ToolFactory(object):
 
       return self._product_cls(self._file_path, self._ver, self._args)
 
+   def _get_args(self):
+      return self._args
+
+   args = property(_get_args, doc="""Additional arguments to be provided to the tool, or None.""")
+
+   def _get_file_path(self):
+      return self._file_path
+
+   file_path = property(_get_file_path, doc="""Path to the tool’s executable.""")
+
+   def _get_helper_file_paths(self):
+      return self._helper_file_paths
+
+   helper_file_paths = property(_get_helper_file_paths, doc="""
+      Names of, or paths to, other executables that affected the detection of the tool (e.g. linkers that a
+      linker driver was found to be able to use, or not), or None. Installing, removing or changing any of
+      them invalidates the detection.
+   """)
+
+   def _get_product_cls(self):
+      return self._product_cls
+
+   product_cls = property(_get_product_cls, doc="""Tool subclass that the factory instantiates.""")
+
+   def _get_target_system_type(self):
+      return self._target_system_type
+
+   target_system_type = property(_get_target_system_type, doc="""Target system type.""")
+
+   def _get_ver(self):
+      return self._ver
+
+   ver = property(_get_ver, doc="""Version of the tool.""")
+
 ##############################################################################################################
 
 class Tool(object):
@@ -124,6 +167,8 @@ class Tool(object):
 
    # Abstract tool flags (*FLAG_*).
    _abstract_flags = None
+   # See Tool.args_template.
+   _args_template = None
    # Additional arguments provided by a ToolFactory.
    _factory_args = None
    # Name by which the tool’s executable can be invoked.
@@ -135,6 +180,9 @@ class Tool(object):
    # Short name of the tool, to be displayed in quiet mode. If None, the tool file name will be
    # displayed.
    _quiet_mode_name = None
+   # True if the tool can read command-line arguments from a response file (“@file”), which is used when the
+   # command line gets too long.
+   _supports_response_files = False
    # Environment block (dictionary) modified to force programs to display output in US English.
    _en_us_env = None
    # Version.
@@ -144,6 +192,10 @@ class Tool(object):
    # intuitive meaning.
    FLAG_OUTPUT_PATH_FORMAT = AbstractFlag()
 
+   # Length, in characters, above which a command line is moved to a response file, if the tool supports
+   # them. Well below the shortest limit among supported platforms (8191 characters for Windows’ cmd.exe).
+   RESPONSE_FILE_THRESHOLD = 8000
+
    def __init__(self, file_path, ver, factory_args):
       """Constructor.
 
@@ -154,6 +206,7 @@ class Tool(object):
       """
 
       self._abstract_flags = set()
+      self._args_template = None
       self._factory_args = factory_args
       self._file_path = file_path
       self._input_file_paths = []
@@ -181,6 +234,25 @@ class Tool(object):
 
       self._input_file_paths.append(input_file_path)
 
+   def _get_abstract_flags(self):
+      return frozenset(self._abstract_flags)
+
+   abstract_flags = property(_get_abstract_flags, doc="""
+      Abstract flags (*FLAG_*) added with Tool.add_flags(), as a frozenset.
+   """)
+
+   def _get_args_template(self):
+      return self._args_template
+
+   def _set_args_template(self, args_template):
+      self._args_template = args_template
+
+   args_template = property(_get_args_template, _set_args_template, doc="""
+      Command line returned by Tool.get_args_template() for an identically-configured instance of the same
+      tool; if set, Tool.create_jobs() will use it instead of generating it again, so configuring this instance
+      becomes unnecessary. Defaults to None.
+   """)
+
    def _create_job_add_flags(self, core, args):
       """Builds the flags portion of the tool’s command line.
 
@@ -228,6 +300,27 @@ class Tool(object):
       if self._input_file_paths:
          args.extend(self._input_file_paths)
 
+   def _create_job_add_output(self, core, args):
+      """Builds the output file portion of the tool’s command line.
+
+      The default implementation ensures that the output directory exists, and adds the output file path
+      using Tool.FLAG_OUTPUT_PATH_FORMAT.
+
+      comk.Core core
+         Core instance.
+      list(str*) args
+         Arguments list.
+      """
+
+      if self._output_file_path:
+         if not core.dry_run:
+            # Make sure that the output directory exists.
+            comk.makedirs(os.path.dirname(self._output_file_path))
+         # Get the compiler-specific command-line argument to specify an output file path.
+         format = self._translate_abstract_flag(self.FLAG_OUTPUT_PATH_FORMAT)
+         # Add the output file path.
+         args.append(format.format(path=self._output_file_path))
+
    def _create_job_instance(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path):
       """Returns an new comk.job.ExternalCmdJob instance constructed with the provided arguments. It allows
       subclasses to customize the job creation.
@@ -251,8 +344,9 @@ class Tool(object):
    def create_jobs(self, core, target, on_complete_fn):
       """Returns a job that, when run, results in the execution of the tool.
 
-      The default implementation schedules a job whose command line is composed by calling
-      Tool._create_job_add_flags() and Tool._create_job_add_inputs().
+      The default implementation schedules a job whose command line is composed by Tool.args_template or
+      Tool.get_args_template(), followed by the output and input files added by Tool._create_job_add_output()
+      and Tool._create_job_add_inputs().
 
       comk.Core core
          Core instance.
@@ -265,21 +359,13 @@ class Tool(object):
       """
 
       # Build the arguments list.
-      args = [self._file_path]
-
-      self._create_job_add_flags(core, args)
-      type(self)._create_job_add_flags_from_env_overrides(args)
-
-      if self._output_file_path:
-         if not core.dry_run:
-            # Make sure that the output directory exists.
-            comk.makedirs(os.path.dirname(self._output_file_path))
-         # Get the compiler-specific command-line argument to specify an output file path.
-         format = self._translate_abstract_flag(self.FLAG_OUTPUT_PATH_FORMAT)
-         # Add the output file path.
-         args.append(format.format(path=self._output_file_path))
-
+      args = list(self._args_template or self.get_args_template(core))
+      self._create_job_add_output(core, args)
       self._create_job_add_inputs(args)
+      if self._supports_response_files and \
+         sum(len(arg) + 1 for arg in args) > self.RESPONSE_FILE_THRESHOLD \
+      :
+         args = self._create_job_use_response_file(core, args)
 
       popen_args = {
          'args': args,
@@ -293,6 +379,46 @@ class Tool(object):
          on_complete_fn, self._get_quiet_cmd(), popen_args, core.log, target.build_log_path
       )
 
+   def _create_job_use_response_file(self, core, args):
+      """Moves all the arguments following the tool’s executable to a response file, so that the command line
+      is not subject to any length limits.
+
+      The response file is written to the intermediate directory, in a path derived from the output file’s.
+
+      comk.Core core
+         Core instance.
+      list(str+) args
+         Arguments list.
+      list(str, str) return
+         Replacement arguments list, referencing the response file.
+      """
+
+      rsp_file_path = os.path.join(core.output_dir, core.INT_DIR, os.path.relpath(
+         self._output_file_path, core.output_dir or os.curdir
+      ) + '.rsp')
+      if not core.dry_run:
+         comk.makedirs(os.path.dirname(rsp_file_path))
+         contents = ''.join(self._quote_response_file_arg(arg) + '\n' for arg in args[1:])
+         with io.open(rsp_file_path, 'wb') as rsp_file:
+            rsp_file.write(contents.encode('utf-8'))
+      return [args[0], '@' + rsp_file_path]
+
+   def get_args_template(self, core):
+      """Returns the part of the tool’s command line that doesn’t depend on the files being processed: the
+      tool’s executable, followed by the flags generated by Tool._create_job_add_flags() and the ones from
+      environment variables.
+
+      comk.Core core
+         Core instance.
+      tuple(str+) return
+         Command-line arguments.
+      """
+
+      args = [self._file_path]
+      self._create_job_add_flags(core, args)
+      type(self)._create_job_add_flags_from_env_overrides(args)
+      return tuple(args)
+
    @classmethod
    def _get_factory_if_exe_matches_tool_and_target(cls, file_path, target_system_type):
       """Checks whether the specified tool executable file is modeled by cls and that executable supports
@@ -337,6 +463,21 @@ class Tool(object):
          # Could not execute the program.
          return None, None
 
+   @staticmethod
+   def _quote_response_file_arg(arg):
+      """Quotes a command-line argument so that it can be written to a response file.
+
+      The default implementation escapes whitespace, quotes and backslashes with a backslash, as expected by
+      GNU tools.
+
+      str arg
+         Argument to quote.
+      str return
+         Quoted argument.
+      """
+
+      return re.sub(r'([\s\'"\\])', r'\\\1', arg)
+
    def _get_quiet_cmd(self):
       """Returns an iterable containing the short name and relevant (input or output) files for the tool, to
       be displayed in quiet mode.
@@ -347,6 +488,11 @@ class Tool(object):
 
       return self._quiet_mode_name, (self._output_file_path or '')
 
+   def _get_file_path(self):
+      return self._file_path
+
+   file_path = property(_get_file_path, doc="""Path to the tool’s executable.""")
+
    @classmethod
    def get_factory(cls, file_path_override = None, target_system_type = None):
       """Detects if a tool of the type of this non-leaf subclass (e.g. a C++ compiler for
@@ -376,18 +522,50 @@ class Tool(object):
          ))
       else:
          # Attempt to detect whether the tool is available by checking for a supported executable.
-         for supported in cls._get_supported():
-            file_name = supported[0]
-            for derived_cls in supported[1:]:
-               tool_factory = derived_cls._get_factory_if_exe_matches_tool_and_target(
-                  file_name, target_system_type
-               )
-               if tool_factory:
-                  return tool_factory
+         tool_factory = Tool.get_factories((cls, ), target_system_type)[cls]
+         if tool_factory:
+            return tool_factory
          raise Exception('unable to detect {} tool{}'.format(
             cls.__name__, ' for system type ' + str(target_system_type) if target_system_type else ''
          ))
 
+   @staticmethod
+   def get_factories(tool_clss, target_system_type = None):
+      """Detects tools of multiple types at once, like Tool.get_factory() without file_path_override would.
+
+      The candidate executables for all the tool types are probed concurrently, since each probe may need to
+      run more than one process; the results are then examined in the same order of preference used by
+      Tool.get_factory().
+
+      iterable(type+) tool_clss
+         Non-leaf subclasses of Tool.
+      comk.platform.SystemType target_system_type
+         See Tool.get_factory().
+      dict(type: comk.tool.ToolFactory) return
+         Factory for each of tool_clss, or None for tools that could not be detected.
+      """
+
+      # Start all the probes.
+      all_probes = []
+      for tool_cls in tool_clss:
+         probes = []
+         for supported in tool_cls._get_supported():
+            file_name = supported[0]
+            for derived_cls in supported[1:]:
+               probes.append(_ToolProbe(derived_cls, file_name, target_system_type))
+         all_probes.append((tool_cls, probes))
+      # Pick the first match for each tool type, without waiting for less preferred probes to complete.
+      tool_factories = {}
+      for tool_cls, probes in all_probes:
+         for probe in probes:
+            tool_factory = probe.get_result()
+            if tool_factory:
+               break
+         else:
+            tool_factory = None
+         tool_factories[tool_cls] = tool_factory
+      return tool_factories
+
    @staticmethod
    def _get_supported():
       """Returns a tuple containing tuples where the first element is a tool name to try and execute and the
@@ -426,18 +604,89 @@ class Tool(object):
 
 ##############################################################################################################
 
+class _ToolProbe(object):
+   """Runs Tool._get_factory_if_exe_matches_tool_and_target() for a candidate executable in a separate thread.
+   """
+
+   # Exception raised by the probe, if any.
+   _exception = None
+   # Tool factory returned by the probe.
+   _result = None
+   # Thread running the probe.
+   _thread = None
+
+   def __init__(self, tool_cls, file_path, target_system_type):
+      """Constructor. Starts the probe.
+
+      type tool_cls
+         Leaf Tool subclass to check the executable against.
+      str file_path
+         Path to the executable.
+      comk.platform.SystemType target_system_type
+         Target system type.
+      """
+
+      self._exception = None
+      self._result = None
+      self._thread = threading.Thread(target=self._run, args=(tool_cls, file_path, target_system_type))
+      # Don’t keep Complemake running for probes whose result is not needed.
+      self._thread.daemon = True
+      self._thread.start()
+
+   def get_result(self):
+      """Waits for the probe to complete and returns its result.
+
+      comk.tool.ToolFactory return
+         Return value of Tool._get_factory_if_exe_matches_tool_and_target().
+      """
+
+      self._thread.join()
+      if self._exception:
+         raise self._exception
+      return self._result
+
+   def _run(self, tool_cls, file_path, target_system_type):
+      """Thread function."""
+
+      try:
+         self._result = tool_cls._get_factory_if_exe_matches_tool_and_target(file_path, target_system_type)
+      except Exception as x:
+         self._exception = x
+
+##############################################################################################################
+
 class CxxCompiler(Tool):
    """Abstract C++ compiler."""
 
+   # Dependency file to generate, if any.
+   _depfile_path = None
    # Additional include directories.
    _include_dirs = None
    # Macros defined via command-line arguments.
    _macros = None
+   # Precompiled header to use, if any.
+   _pch_file_path = None
+   # Header from which _pch_file_path was generated.
+   _pch_header_file_path = None
+   # True if the output of CFLAG_PREPROCESS_DIRECTIVES lacks the macros defined on the command line, which
+   # then need to be passed along with CFLAG_COMPILE_PREPROCESSED.
+   _preprocess_directives_drops_macros = False
    # See Tool._quiet_mode_name.
    _quiet_mode_name = 'C++'
+   # True if the compiler can compile its own preprocessed output without any of the original files, so that
+   # compile jobs can be sent to the workers of a comk.distcompile.WorkerPool.
+   _supports_distribution = False
 
    # Forces the compiler to only run the source file through the preprocessor.
    CFLAG_PREPROCESS_ONLY = AbstractFlag()
+   # Along with CFLAG_PREPROCESS_ONLY, limits preprocessing to the handling of directives, most importantly
+   # #include, leaving macros unexpanded and comments in place; since columns and comments such as
+   # “fallthrough” markers are preserved, compiling the output generates the same object as compiling the
+   # source. Must be a tuple of strings, each of them resulting in a separate argument.
+   CFLAG_PREPROCESS_DIRECTIVES = AbstractFlag()
+   # Makes the compiler accept the output of CFLAG_PREPROCESS_DIRECTIVES. Must be a tuple of strings, each
+   # of them resulting in a separate argument.
+   CFLAG_COMPILE_PREPROCESSED = AbstractFlag()
    # Causes the compiler to generate code suitable for a dynamic library.
    CFLAG_DYNLIB = AbstractFlag()
    # Defines a preprocessor macro. Must be in str.format() syntax and include replacements “name” and
@@ -446,14 +695,28 @@ class CxxCompiler(Tool):
    # Adds a directory to the include search path. Must be in str.format() syntax and include a replacement
    # “dir” with the intuitive meaning.
    CFLAG_ADD_INCLUDE_DIR_FORMAT = AbstractFlag()
+   # Causes the compiler to generate a precompiled header from the input (header) file.
+   CFLAG_CREATE_PCH = AbstractFlag()
+   # Uses a precompiled header. Must be a tuple of strings in str.format() syntax, each of them resulting in
+   # a separate argument, that may include replacements “header” (path to the header the precompiled header
+   # was generated from), “pch” (path to the precompiled header) and “pch_stem” (same as “pch”, minus the
+   # file name suffix).
+   CFLAG_USE_PCH_FORMATS = AbstractFlag()
+   # Generates a makefile-style dependency file listing the source and all the headers it includes, as a side
+   # effect of compiling it. Must be a tuple of strings in str.format() syntax, each of them resulting in a
+   # separate argument, that may include a replacement “path” with the intuitive meaning.
+   CFLAG_GENERATE_DEPFILE_FORMATS = AbstractFlag()
 
    def __init__(self, file_path, ver, factory_args):
       """See Tool.__init__()."""
 
       Tool.__init__(self, file_path, ver, factory_args)
 
+      self._depfile_path = None
       self._include_dirs = []
       self._macros = {}
+      self._pch_file_path = None
+      self._pch_header_file_path = None
 
    def add_include_dir(self, include_dir_path):
       """Adds an include directory to the compiler’s command line.
@@ -479,7 +742,10 @@ class CxxCompiler(Tool):
       """See Tool._create_job_add_flags()."""
 
       for dep in core.get_external_dependencies_incl_transitive():
-         self.add_include_dir(dep.get_path(core.INCLUDE_DIR))
+         include_dir = dep.get_path(core.INCLUDE_DIR)
+         if core.reproducible:
+            include_dir = core.get_reproducible_path(include_dir)
+         self.add_include_dir(include_dir)
       self.add_include_dir(core.INCLUDE_DIR)
 
       Tool._create_job_add_flags(self, core, args)
@@ -498,6 +764,17 @@ class CxxCompiler(Tool):
          for dir in self._include_dirs:
             args.append(format.format(dir=dir))
 
+      # Add the precompiled header, if any.
+      if self._pch_file_path:
+         # Get the compiler-specific command-line arguments to use a precompiled header.
+         formats = self._translate_abstract_flag(self.CFLAG_USE_PCH_FORMATS)
+         for format in formats:
+            args.append(format.format(
+               header   = self._pch_header_file_path,
+               pch      = self._pch_file_path,
+               pch_stem = os.path.splitext(self._pch_file_path)[0],
+            ))
+
    @staticmethod
    def _create_job_add_flags_from_env_overrides(args):
       """Adds to the tool’s command line the contents of the CXXFLAGS environment variable.
@@ -508,6 +785,112 @@ class CxxCompiler(Tool):
 
       Tool._create_job_add_flags_from_env_overrides('CXXFLAGS', args)
 
+   def _create_job_add_output(self, core, args):
+      """See Tool._create_job_add_output(). Overridden to also add the dependency file, which is specific to
+      each source and therefore can’t be part of Tool.args_template.
+      """
+
+      Tool._create_job_add_output(self, core, args)
+      self._create_job_add_depfile(args)
+
+   def _create_job_add_depfile(self, args):
+      """Adds to the compiler’s command line the arguments to generate the dependency file, if requested via
+      CxxCompiler.generate_depfile().
+
+      list(str*) args
+         Arguments list.
+      """
+
+      if self._depfile_path:
+         # Get the compiler-specific command-line arguments to generate a dependency file.
+         formats = self._translate_abstract_flag(self.CFLAG_GENERATE_DEPFILE_FORMATS)
+         for format in formats:
+            args.append(format.format(path=self._depfile_path))
+
+   def create_jobs(self, core, target, on_complete_fn):
+      """See Tool.create_jobs(). Overridden to return a comk.distcompile.DistributedCompileJob if
+      core.job_runner has a worker pool, and the compiler and the arguments allow compiling the preprocessed
+      source without any other files.
+      """
+
+      job = Tool.create_jobs(self, core, target, on_complete_fn)
+      worker_pool = core.job_runner.worker_pool
+      if not worker_pool or core.dry_run or not type(self)._supports_distribution or \
+         self._file_path != worker_pool.compiler_file_path or not self._output_file_path or \
+         self.CFLAG_CREATE_PCH in self._abstract_flags or \
+         self.CFLAG_PREPROCESS_ONLY in self._abstract_flags or \
+         core.pgo or (core.split_dwarf and core.configuration.debug_info) \
+      :
+         # Profile data and split debug info are additional files that the worker wouldn’t have or return.
+         return job
+
+      args_template = list(self._args_template or self.get_args_template(core))
+      output_format = self._translate_abstract_flag(self.FLAG_OUTPUT_PATH_FORMAT)
+      preprocessed_file_path = os.path.splitext(self._output_file_path)[0] + self.preprocessed_suffix
+      # Preprocessing also generates the dependency file, if any.
+      preprocess_args = args_template + [self._translate_abstract_flag(self.CFLAG_PREPROCESS_ONLY)]
+      preprocess_args.extend(self._translate_abstract_flag(self.CFLAG_PREPROCESS_DIRECTIVES))
+      preprocess_args.append(output_format.format(path=preprocessed_file_path))
+      self._create_job_add_depfile(preprocess_args)
+      self._create_job_add_inputs(preprocess_args)
+
+      input_name = 'source' + self.preprocessed_suffix
+      output_name = 'object' + self.object_suffix
+      # The worker looks the compiler up in its own PATH, and adds the output and input files itself.
+      remote_args = [os.path.basename(args_template[0])]
+      remote_args.extend(self._get_args_without_preprocessor_args(args_template[1:]))
+      remote_args.extend(self._translate_abstract_flag(self.CFLAG_COMPILE_PREPROCESSED))
+
+      return comk.distcompile.DistributedCompileJob(
+         on_complete_fn, job.get_quiet_command(), {
+            'args': job.get_command_args(),
+            'cwd' : core.project_path,
+         }, core.log, target.build_log_path, worker_pool, preprocess_args, preprocessed_file_path,
+         remote_args, input_name, output_name, self._output_file_path
+      )
+
+   def _get_args_without_preprocessor_args(self, args):
+      """Returns a copy of a command line without the arguments that only affect the preprocessor, which may
+      reference files that are not available when compiling the preprocessed source.
+
+      iterable(str*) args
+         Command-line arguments.
+      list(str*) return
+         Filtered command-line arguments.
+      """
+
+      # Arguments in the format of an include directory or, unless still needed, of a macro definition.
+      flags = [self.CFLAG_ADD_INCLUDE_DIR_FORMAT]
+      if not type(self)._preprocess_directives_drops_macros:
+         flags.append(self.CFLAG_DEFINE_FORMAT)
+      prefixes = tuple(self._translate_abstract_flag(flag).partition('{')[0] for flag in flags)
+      # Arguments that use a precompiled header, which start with a fixed argument.
+      pch_formats = self._translate_abstract_flag(self.CFLAG_USE_PCH_FORMATS)
+      filtered_args = []
+      skip = 0
+      for arg in args:
+         if skip:
+            skip -= 1
+         elif arg == pch_formats[0]:
+            skip = len(pch_formats) - 1
+         elif not arg.startswith(prefixes):
+            filtered_args.append(arg)
+      return filtered_args
+
+   def generate_depfile(self, depfile_path):
+      """Makes the compiler generate a dependency file along with the object file, if supported.
+
+      str depfile_path
+         Path to the dependency file to generate.
+      bool return
+         True if the compiler will generate the dependency file, or False if it doesn’t support that.
+      """
+
+      if self.CFLAG_GENERATE_DEPFILE_FORMATS not in type(self)._abstact_to_impl_flags:
+         return False
+      self._depfile_path = depfile_path
+      return True
+
    def _get_quiet_cmd(self):
       """See Tool._get_quiet_cmd(). This override substitutes the output file path with the inputs, to show
       the source file path instead of the intermediate one.
@@ -517,6 +900,75 @@ class CxxCompiler(Tool):
 
       return [quiet_cmd[0]] + self._input_file_paths
 
+   def get_pgo_profile_file_path(self, core, object_file_path):
+      """Returns the path to the profile data file used to optimize the specified object file, when building
+      with profile-guided optimization.
+
+      comk.core.Core core
+         Core instance.
+      str object_file_path
+         Path to the object file.
+      str return
+         Path to the profile data file, or None if the compiler doesn’t support profile-guided optimization.
+      """
+
+      return None
+
+   def check_pgo_support(self, core):
+      """Checks whether the compiler can build instrumented and optimized binaries whose profile data files
+      match, logging the reason if it can’t. The default implementation returns True.
+
+      comk.core.Core core
+         Core instance.
+      bool return
+         True if the compiler supports profile-guided optimization, or False otherwise.
+      """
+
+      return True
+
+   def get_pgo_training_environ(self, core, test_name, env):
+      """Prepares for running a test target as part of the training workload of profile-guided optimization,
+      returning the environment the test should run in. The default implementation returns env unchanged.
+
+      comk.core.Core core
+         Core instance that built the instrumented binaries.
+      str test_name
+         Name of the test target.
+      dict(str: str) env
+         Environment the test would run in, or None if it would run in os.environ.
+      dict(str: str) return
+         Environment to run the test in, or None to run it in os.environ.
+      """
+
+      return env
+
+   def merge_pgo_profile(self, core, training_target_names):
+      """Processes the profile data collected by instrumented binaries in core.pgo_profile_dir, generating
+      what get_pgo_profile_file_path() expects. The default implementation does nothing.
+
+      comk.core.Core core
+         Core instance that built and ran the instrumented binaries.
+      iterable(str+) training_target_names
+         Names of the test targets that were run as the training workload.
+      bool return
+         True if the profile data was successfully processed, or False otherwise.
+      """
+
+      return True
+
+   def use_pch(self, header_file_path, pch_file_path):
+      """Makes the compiler use a precompiled header, as if its header were included before the first line of
+      the source file.
+
+      str header_file_path
+         Path to the header from which the precompiled header was generated.
+      str pch_file_path
+         Path to the precompiled header.
+      """
+
+      self._pch_header_file_path = header_file_path
+      self._pch_file_path = pch_file_path
+
    @staticmethod
    def _get_supported():
       """See Tool._get_supported()."""
@@ -530,6 +982,14 @@ class CxxCompiler(Tool):
 
    # Name suffix for intermediate object files.
    object_suffix = None
+   # If not None, the compiler generates an object file along with each precompiled header, which must be
+   # linked into any binary using the precompiled header; its path is the precompiled header’s plus this
+   # suffix.
+   pch_object_suffix = None
+   # Name suffix for precompiled header files.
+   pch_suffix = None
+   # Name suffix for preprocessed sources.
+   preprocessed_suffix = None
 
 ##############################################################################################################
 
@@ -538,12 +998,22 @@ class ClangxxCompiler(CxxCompiler):
 
    # Mapping table between abstract (*FLAG_*) flags
    _abstact_to_impl_flags = {
-      Tool.FLAG_OUTPUT_PATH_FORMAT            : '-o{path}',
-      CxxCompiler.CFLAG_ADD_INCLUDE_DIR_FORMAT: '-I{dir}',
-      CxxCompiler.CFLAG_DEFINE_FORMAT         : '-D{name}={expansion}',
-      CxxCompiler.CFLAG_DYNLIB                : '-fPIC',
-      CxxCompiler.CFLAG_PREPROCESS_ONLY       : '-E',
+      Tool.FLAG_OUTPUT_PATH_FORMAT              : '-o{path}',
+      CxxCompiler.CFLAG_ADD_INCLUDE_DIR_FORMAT  : '-I{dir}',
+      CxxCompiler.CFLAG_CREATE_PCH              : '-xc++-header',
+      CxxCompiler.CFLAG_DEFINE_FORMAT           : '-D{name}={expansion}',
+      CxxCompiler.CFLAG_DYNLIB                  : '-fPIC',
+      CxxCompiler.CFLAG_GENERATE_DEPFILE_FORMATS: ('-MD', '-MF{path}'),
+      CxxCompiler.CFLAG_PREPROCESS_ONLY         : '-E',
+      CxxCompiler.CFLAG_USE_PCH_FORMATS         : ('-include-pch', '{pch}'),
+      # Only expand #include directives. The output is regular source, not to be taken as preprocessed.
+      CxxCompiler.CFLAG_PREPROCESS_DIRECTIVES   : ('-frewrite-includes', ),
+      CxxCompiler.CFLAG_COMPILE_PREPROCESSED    : ('-xc++', ),
    }
+   # See CxxCompiler._preprocess_directives_drops_macros.
+   _preprocess_directives_drops_macros = True
+   # See CxxCompiler._supports_distribution.
+   _supports_distribution = True
 
    # See CxxCompiler.object_suffix.
    def _create_job_add_flags(self, core, args):
@@ -558,11 +1028,52 @@ class ClangxxCompiler(CxxCompiler):
 
       CxxCompiler._create_job_add_flags(self, core, args)
 
-      args.extend([
-         '-ggdb',                  # Generate debug info compatible with GDB.
-         '-O0',                    # Disable code optimization.
-         '-DDEBUG=1',              # Enable debug code.
-      ])
+      configuration = core.configuration
+      if configuration.debug_info:
+         args.extend([
+            '-ggdb',               # Generate debug info compatible with GDB.
+         ])
+         if core.split_dwarf:
+            args.extend([
+               '-gsplit-dwarf',    # Store most debug info in a .dwo file instead of the object file, so the
+                                   # linker doesn’t need to process it.
+            ])
+      if core.reproducible:
+         # -ffile-prefix-map also affects __FILE__, but it’s only available since Clang 10.
+         if self._ver and self._ver >= comk.version.Version(10):
+            prefix_map_format = '-ffile-prefix-map={}={}'
+         else:
+            prefix_map_format = '-fdebug-prefix-map={}={}'
+         for prefix, replacement in core.get_path_prefix_map():
+            args.append(prefix_map_format.format(prefix, replacement))
+         args.extend([
+            '-Wdate-time',         # Warn about uses of __DATE__, __TIME__ and __TIMESTAMP__.
+         ])
+      if configuration.optimize:
+         args.extend([
+            '-O2',                 # Enable code optimization.
+            '-DNDEBUG',            # Disable debug code.
+         ])
+      else:
+         args.extend([
+            '-O0',                 # Disable code optimization.
+            '-DDEBUG=1',           # Enable debug code.
+         ])
+      if core.lto:
+         args.extend([
+            '-flto=thin',          # Generate bitcode for incremental (“thin”) link-time optimization.
+         ])
+      if core.pgo == comk.configuration.PGO_INSTRUMENT:
+         # Instrument the code to collect profile data; %m makes runs of the same binary merge their data.
+         # Training runs override the file name; see get_pgo_training_environ().
+         args.append('-fprofile-instr-generate=' + os.path.join(
+            os.path.abspath(core.inproject_path(core.pgo_profile_dir)), '%m.profraw'
+         ))
+      elif core.pgo == comk.configuration.PGO_OPTIMIZE:
+         # Optimize the code based on the profile data merged by merge_pgo_profile().
+         args.append('-fprofile-instr-use=' + os.path.abspath(core.inproject_path(
+            os.path.join(core.pgo_profile_dir, self.PGO_PROFILE_FILE)
+         )))
       args.extend([
          '-Wall',                  # Enable more warnings.
          '-Wextra',                # Enable extra warnings not enabled by -Wall.
@@ -619,7 +1130,98 @@ class ClangxxCompiler(CxxCompiler):
 
       return ToolFactory(cls, file_path, supported_system_type, ver, ('-target', str(supported_system_type)))
 
+   def get_pgo_profile_file_path(self, core, object_file_path):
+      """See CxxCompiler.get_pgo_profile_file_path()."""
+
+      # All objects share the same profile data.
+      return os.path.join(core.pgo_profile_dir, self.PGO_PROFILE_FILE)
+
+   def get_pgo_training_environ(self, core, test_name, env):
+      """See CxxCompiler.get_pgo_training_environ(). Overridden to have the test save its raw profile data to
+      files named after it, which merge_pgo_profile() can then tell apart from those of other tests. Since
+      each instrumented binary writes to a different file (see %m), the files of a previous run are deleted,
+      or those of binaries relinked since would pile up.
+      """
+
+      pgo_profile_dir = os.path.abspath(core.inproject_path(core.pgo_profile_dir))
+      prefix = test_name + self.PGO_RAW_PROFILE_TEST_SEPARATOR
+      try:
+         file_names = os.listdir(pgo_profile_dir)
+      except (comk.FileNotFoundErrorCompat, OSError):
+         file_names = ()
+      for file_name in file_names:
+         if file_name.startswith(prefix) and file_name.endswith('.profraw'):
+            os.remove(os.path.join(pgo_profile_dir, file_name))
+      if env is None:
+         env = os.environ.copy()
+      env['LLVM_PROFILE_FILE'] = os.path.join(pgo_profile_dir, prefix + '%m.profraw')
+      return env
+
+   def merge_pgo_profile(self, core, training_target_names):
+      """See CxxCompiler.merge_pgo_profile(). Merges the raw profile data files generated by the training
+      targets into a single file using llvm-profdata, ignoring any left by other tests.
+      """
+
+      log = core.log
+      pgo_profile_dir = core.inproject_path(core.pgo_profile_dir)
+      training_target_names = set(training_target_names)
+      try:
+         raw_file_names = [
+            file_name for file_name in sorted(os.listdir(pgo_profile_dir))
+            if file_name.endswith('.profraw') and
+               file_name.rpartition(self.PGO_RAW_PROFILE_TEST_SEPARATOR)[0] in training_target_names
+         ]
+      except (comk.FileNotFoundErrorCompat, OSError):
+         raw_file_names = []
+      if not raw_file_names:
+         # -fprofile-instr-use would fail on the missing merged profile data.
+         log(log.QUIET, 'pgo: the training targets generated no profile data')
+         return False
+      raw_file_paths = [os.path.join(pgo_profile_dir, file_name) for file_name in raw_file_names]
+      merged_file_path = os.path.join(pgo_profile_dir, self.PGO_PROFILE_FILE)
+      merged_inputs_file_path = merged_file_path + '.inputs'
+      merged_inputs = ('\n'.join(raw_file_names) + '\n').encode('utf-8')
+      try:
+         merged_mtime = os.path.getmtime(merged_file_path)
+         with io.open(merged_inputs_file_path, 'rb') as merged_inputs_file:
+            prev_merged_inputs = merged_inputs_file.read()
+      except (comk.FileNotFoundErrorCompat, OSError):
+         merged_mtime = None
+         prev_merged_inputs = None
+      if merged_mtime is not None and prev_merged_inputs == merged_inputs and \
+         all(os.path.getmtime(raw_file_path) <= merged_mtime for raw_file_path in raw_file_paths) \
+      :
+         # Leave the merged profile data untouched, so that optimized objects won’t be rebuilt.
+         log(log.HIGH, 'pgo: profile data up-to-date: {}', merged_file_path)
+         return True
+
+      # Prefer the llvm-profdata that comes with this Clang, since the raw profile data format is not stable
+      # across LLVM versions.
+      llvm_profdata_file_path = os.path.join(os.path.dirname(self._file_path), 'llvm-profdata')
+      if not os.path.isfile(llvm_profdata_file_path):
+         llvm_profdata_file_path = 'llvm-profdata'
+      args = [llvm_profdata_file_path, 'merge', '-output=' + merged_file_path]
+      args.extend(raw_file_paths)
+      log(log.LOW, '{}', ' '.join(args))
+      out, ret = Tool._get_cmd_output(args)
+      if ret != 0:
+         log(log.QUIET, 'pgo: unable to merge profile data: {}', out or 'could not execute llvm-profdata')
+         return False
+      # Remember which files were merged, to merge again if the set of training targets changes.
+      with io.open(merged_inputs_file_path, 'wb') as merged_inputs_file:
+         merged_inputs_file.write(merged_inputs)
+      return True
+
    object_suffix = '.o'
+   # See CxxCompiler.pch_suffix.
+   pch_suffix = '.pch'
+   # See CxxCompiler.preprocessed_suffix.
+   preprocessed_suffix = '.ii'
+
+   # Name of the file, in comk.core.Core.pgo_profile_dir, containing the merged profile data.
+   PGO_PROFILE_FILE = 'default.profdata'
+   # Separates the name of the test that generated a raw profile data file from the rest of the file name.
+   PGO_RAW_PROFILE_TEST_SEPARATOR = '#'
 
 ##############################################################################################################
 
@@ -628,12 +1230,22 @@ class GxxCompiler(CxxCompiler):
 
    # Mapping table between abstract (*FLAG_*) flags
    _abstact_to_impl_flags = {
-      Tool.FLAG_OUTPUT_PATH_FORMAT            : '-o{path}',
-      CxxCompiler.CFLAG_ADD_INCLUDE_DIR_FORMAT: '-I{dir}',
-      CxxCompiler.CFLAG_DEFINE_FORMAT         : '-D{name}={expansion}',
-      CxxCompiler.CFLAG_DYNLIB                : '-fPIC',
-      CxxCompiler.CFLAG_PREPROCESS_ONLY       : '-E',
+      Tool.FLAG_OUTPUT_PATH_FORMAT              : '-o{path}',
+      CxxCompiler.CFLAG_ADD_INCLUDE_DIR_FORMAT  : '-I{dir}',
+      CxxCompiler.CFLAG_CREATE_PCH              : '-xc++-header',
+      CxxCompiler.CFLAG_DEFINE_FORMAT           : '-D{name}={expansion}',
+      CxxCompiler.CFLAG_DYNLIB                  : '-fPIC',
+      CxxCompiler.CFLAG_GENERATE_DEPFILE_FORMATS: ('-MD', '-MF{path}'),
+      CxxCompiler.CFLAG_PREPROCESS_ONLY         : '-E',
+      # G++ looks for “pch_stem.gch” when asked to include “pch_stem”; -Winvalid-pch makes it complain if the
+      # precompiled header exists but can’t be used, instead of silently parsing the header (if it exists).
+      CxxCompiler.CFLAG_USE_PCH_FORMATS         : ('-include', '{pch_stem}', '-Winvalid-pch'),
+      # The output retains all macro definitions, including predefined ones and those from the command line.
+      CxxCompiler.CFLAG_PREPROCESS_DIRECTIVES   : ('-fdirectives-only', ),
+      CxxCompiler.CFLAG_COMPILE_PREPROCESSED    : ('-fpreprocessed', '-fdirectives-only'),
    }
+   # See CxxCompiler._supports_distribution.
+   _supports_distribution = True
 
    # See CxxCompiler.object_suffix.
    def _create_job_add_flags(self, core, args):
@@ -653,13 +1265,60 @@ class GxxCompiler(CxxCompiler):
 
       CxxCompiler._create_job_add_flags(self, core, args)
 
-      args.extend([
-         '-ggdb',                  # Generate debug info compatible with GDB.
-         '-O0',                    # Disable code optimization.
-         '-DDEBUG=1',              # Enable debug code.
+      configuration = core.configuration
+      if configuration.debug_info:
+         args.extend([
+            '-ggdb',               # Generate debug info compatible with GDB.
+         ])
+         if core.split_dwarf:
+            args.extend([
+               '-gsplit-dwarf',    # Store most debug info in a .dwo file instead of the object file, so the
+                                   # linker doesn’t need to process it.
+            ])
+         if core.job_runner.worker_pool:
+            args.extend([
+               '-gno-record-gcc-switches', # Don’t record the command line in the debug info, since it
+                                           # differs between objects compiled locally and by workers.
+            ])
+      if core.reproducible:
+         # -ffile-prefix-map also affects __FILE__, but it’s only available since G++ 8.
+         if self._ver and self._ver >= comk.version.Version(8):
+            prefix_map_format = '-ffile-prefix-map={}={}'
+         else:
+            prefix_map_format = '-fdebug-prefix-map={}={}'
+         for prefix, replacement in core.get_path_prefix_map():
+            args.append(prefix_map_format.format(prefix, replacement))
+         args.extend([
+            '-Wdate-time',         # Warn about uses of __DATE__, __TIME__ and __TIMESTAMP__.
+         ])
+      if configuration.optimize:
+         args.extend([
+            '-O2',                 # Enable code optimization.
+            '-DNDEBUG',            # Disable debug code.
+         ])
+      else:
+         args.extend([
+            '-O0',                 # Disable code optimization.
+            '-DDEBUG=1',           # Enable debug code.
 
-#        '-coverage',
-      ])
+#           '-coverage',
+         ])
+      if core.lto:
+         args.extend([
+            '-flto=auto',          # Generate bytecode for link-time optimization.
+         ])
+      if core.pgo:
+         pgo_profile_dir = os.path.abspath(core.inproject_path(core.pgo_profile_dir))
+         if core.pgo == comk.configuration.PGO_INSTRUMENT:
+            # Instrument the code to collect profile data.
+            args.append('-fprofile-generate=' + pgo_profile_dir)
+         else:
+            # Optimize the code based on the collected profile data.
+            args.append('-fprofile-use=' + pgo_profile_dir)
+         # Name profile data files after the path of the object relative to the output directory, instead of
+         # its absolute path, so that instrumented and optimized objects, which are built in different output
+         # directories, share the same profile data. See check_pgo_support() and get_pgo_profile_file_path().
+         args.append('-fprofile-prefix-path=' + os.path.abspath(core.inproject_path(core.output_dir)))
       args.extend([
          '-Wall',                  # Enable more warnings.
          '-Wextra',                # Enable extra warnings not enabled by -Wall.
@@ -706,7 +1365,33 @@ class GxxCompiler(CxxCompiler):
 
       return ToolFactory(cls, file_path, supported_system_type, ver)
 
+   def check_pgo_support(self, core):
+      """See CxxCompiler.check_pgo_support()."""
+
+      # Without -fprofile-prefix-path, G++ names profile data files after the absolute path of each object,
+      # which differs between the instrumented and the optimized output directories, so -fprofile-use would
+      # never find them.
+      if not self._ver or self._ver < comk.version.Version(11):
+         log = core.log
+         log(log.QUIET, 'pgo: {} {} is not supported; profile-guided optimization requires G++ 11 or later',
+            self._file_path, self._ver
+         )
+         return False
+      return True
+
+   def get_pgo_profile_file_path(self, core, object_file_path):
+      """See CxxCompiler.get_pgo_profile_file_path()."""
+
+      # G++ names each profile data file after the object file minus its suffix, with path separators replaced
+      # by “#”.
+      object_stem = os.path.splitext(os.path.relpath(object_file_path, core.output_dir or os.curdir))[0]
+      return os.path.join(core.pgo_profile_dir, object_stem.replace(os.sep, '#') + '.gcda')
+
    object_suffix = '.o'
+   # See CxxCompiler.pch_suffix.
+   pch_suffix = '.gch'
+   # See CxxCompiler.preprocessed_suffix.
+   preprocessed_suffix = '.ii'
 
 ##############################################################################################################
 
@@ -721,9 +1406,12 @@ class MscCompiler(CxxCompiler):
    _abstact_to_impl_flags = {
       Tool.FLAG_OUTPUT_PATH_FORMAT            : '/Fo{path}',
       CxxCompiler.CFLAG_ADD_INCLUDE_DIR_FORMAT: '/I{dir}',
+      # Without a file name, /Yc generates a precompiled header from the whole input file.
+      CxxCompiler.CFLAG_CREATE_PCH            : '/Yc',
       CxxCompiler.CFLAG_DEFINE_FORMAT         : '/D{name}={expansion}',
       CxxCompiler.CFLAG_DYNLIB                : '/LD',
       CxxCompiler.CFLAG_PREPROCESS_ONLY       : '/P',
+      CxxCompiler.CFLAG_USE_PCH_FORMATS       : ('/Yu{header}', '/Fp{pch}', '/FI{header}'),
    }
 
    def _create_job_add_flags(self, core, args):
@@ -732,32 +1420,70 @@ class MscCompiler(CxxCompiler):
       args.extend([
          '/c',         # Compile without linking.
          '/EHa',       # Allow catching synchronous (C++) and asynchronous (SEH) exceptions.
-#        '/MD',        # Use the multithreaded runtime DLL.
-         '/MDd',       # Use the multithreaded debug runtime DLL.
          '/nologo',    # Suppress brand banner display.
          '/TP',        # Force all sources to be compiled as C++.
       ])
 
+      configuration = core.configuration
+      if configuration.optimize:
+         args.append('/MD')  # Use the multithreaded runtime DLL.
+      else:
+         args.append('/MDd') # Use the multithreaded debug runtime DLL.
+
       CxxCompiler._create_job_add_flags(self, core, args)
 
       if CxxCompiler.CFLAG_PREPROCESS_ONLY in self._abstract_flags:
          args.extend([
-            '/Fi' + self._output_file_path, # cl.exe requires a separate argument to specify the preprocessed
-                       # output file path.
             '/wd4668', # Suppress “'macro' is not defined as a preprocessor macro, replacing with '0' for
                        # '#if/#elif'”. Somehow cl.exe /P will ignore a supposedly equivalent #pragma in a
                        # header file. This occurs in MS-provided header files.
          ])
 
-      args.extend([
-         '/DDEBUG=1',  # Enable debug code.
-         '/Od',        # Disable code optimization.
-         '/Z7',        # Generate debug info for PDB, stored in the .obj file.
-      ])
+      if configuration.optimize:
+         args.extend([
+            '/DNDEBUG', # Disable debug code.
+            '/O2',      # Optimize code for speed.
+         ])
+      else:
+         args.extend([
+            '/DDEBUG=1', # Enable debug code.
+            '/Od',       # Disable code optimization.
+         ])
+      if configuration.debug_info:
+         args.extend([
+            '/Z7',      # Generate debug info for PDB, stored in the .obj file.
+         ])
+      if core.reproducible:
+         args.extend([
+            '/Brepro',  # Don’t embed timestamps in the .obj file.
+         ])
+      if core.lto:
+         args.extend([
+            '/GL',      # Generate code for whole program optimization at link time.
+         ])
       args.extend([
          '/Wall',      # Enable all warnings.
       ])
 
+   def _create_job_add_output(self, core, args):
+      """See CxxCompiler._create_job_add_output()."""
+
+      if CxxCompiler.CFLAG_CREATE_PCH in self._abstract_flags:
+         if not core.dry_run:
+            # Make sure that the output directory exists.
+            comk.makedirs(os.path.dirname(self._output_file_path))
+         # cl.exe requires a separate argument to specify the precompiled header file path, and also
+         # generates an object file.
+         args.append('/Fp' + self._output_file_path)
+         args.append('/Fo' + self._output_file_path + self.pch_object_suffix)
+         return
+
+      CxxCompiler._create_job_add_output(self, core, args)
+
+      if CxxCompiler.CFLAG_PREPROCESS_ONLY in self._abstract_flags:
+         # cl.exe requires a separate argument to specify the preprocessed output file path.
+         args.append('/Fi' + self._output_file_path)
+
    def _create_job_instance(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path):
       """See CxxCompiler._create_job_instance()."""
 
@@ -811,18 +1537,29 @@ class MscCompiler(CxxCompiler):
 
    # See CxxCompiler.object_suffix.
    object_suffix = '.obj'
+   # See CxxCompiler.pch_object_suffix.
+   pch_object_suffix = '.obj'
+   # See CxxCompiler.pch_suffix.
+   pch_suffix = '.pch'
 
 ##############################################################################################################
 
 class Linker(Tool):
    """Abstract object code linker."""
 
+   # Whether a G++ or Clang linker driver can use a linker, keyed by the command line invoking the driver and
+   # the linker; see Linker._can_driver_use_gnu_linker().
+   _gnu_linkers_usable = {}
    # Additional libraries to link to.
    _input_libs = None
    # Directories to be included in the library search path.
    _lib_paths = None
+   # See Linker.lto_cache_dir.
+   _lto_cache_dir = None
    # See Tool._quiet_mode_name.
    _quiet_mode_name = 'LINK'
+   # See Tool._supports_response_files.
+   _supports_response_files = True
 
    # Tells the linker to generate a dynamic library instead of a stand-alone executable.
    LDFLAG_DYNLIB = AbstractFlag()
@@ -833,6 +1570,12 @@ class Linker(Tool):
    # intuitive meaning.
    LDFLAG_ADD_LIB_FORMAT = AbstractFlag()
 
+   # Size, in bytes, above which the link-time optimization cache (see Linker.lto_cache_dir) is pruned.
+   LTO_CACHE_SIZE_MAX = 1024 * 1024 * 1024
+   # Linkers that G++ and Clang can be told to use instead of GNU ld (BFD) via -fuse-ld, in order of
+   # preference. All of them link considerably faster than GNU ld, especially when handling debug info.
+   FAST_GNU_LINKERS = ('mold', 'lld', 'gold')
+
    def __init__(self, file_path, ver, factory_args):
       """See Tool.__init__()."""
 
@@ -840,6 +1583,7 @@ class Linker(Tool):
 
       self._input_libs = []
       self._lib_paths = []
+      self._lto_cache_dir = None
 
    def add_input_lib(self, input_lib_file_path):
       """Appends a library to the linker’s command line.
@@ -875,6 +1619,25 @@ class Linker(Tool):
          for dir in self._lib_paths:
             args.append(format.format(dir=dir))
 
+   def _create_job_add_flags_for_split_dwarf(self, core, args):
+      """Adds to the command line of a G++ or Clang linker driver the flags needed when Core.split_dwarf is
+      True.
+
+      comk.Core core
+         Core instance.
+      list(str*) args
+         Arguments list.
+      """
+
+      if core.split_dwarf and core.configuration.debug_info:
+         args.extend([
+            '-Wl,--compress-debug-sections=zlib', # Compress the debug info left in the binary.
+         ])
+         if self._get_fuse_ld(args) in Linker.FAST_GNU_LINKERS:
+            args.extend([
+               '-Wl,--gdb-index',                 # Index debug info, allowing GDB to load it faster.
+            ])
+
    def _create_job_add_inputs(self, args):
       """See Tool._create_job_add_inputs()."""
 
@@ -887,6 +1650,18 @@ class Linker(Tool):
          for lib in self._input_libs:
             args.append(format.format(lib=lib))
 
+   def _get_lto_cache_dir(self):
+      return self._lto_cache_dir
+
+   def _set_lto_cache_dir(self, lto_cache_dir):
+      self._lto_cache_dir = lto_cache_dir
+
+   lto_cache_dir = property(_get_lto_cache_dir, _set_lto_cache_dir, doc="""
+      Directory where the linker can cache the outcome of link-time optimization of each module, so that
+      subsequent links only need to optimize modules that changed. Only used when link-time optimization is
+      enabled, and only by linkers that support it.
+   """)
+
    @staticmethod
    def _create_job_add_flags_from_env_overrides(args):
       """Adds to the tool’s command line the contents of the LDFLAGS environment variable.
@@ -897,6 +1672,69 @@ class Linker(Tool):
 
       Tool._create_job_add_flags_from_env_overrides('LDFLAGS', args)
 
+   @staticmethod
+   def _can_driver_use_gnu_linker(driver_args, linker):
+      """Checks whether a G++ or Clang linker driver is able to use the specified linker. The outcome is
+      remembered for the rest of the run.
+
+      iterable(str+) driver_args
+         Command line invoking the driver, without any linker-related arguments.
+      str linker
+         Linker to check for, as accepted by -fuse-ld, e.g. “lld”.
+      bool return
+         True if the driver can use the linker, or False otherwise.
+      """
+
+      key = (tuple(driver_args), linker)
+      usable = Linker._gnu_linkers_usable.get(key)
+      if usable is None:
+         # Drivers reject -fuse-ld values they don’t know, as well as ones for which no linker is installed.
+         out, ret = Tool._get_cmd_output(key[0] + ('-fuse-ld=' + linker, '-Wl,--version'))
+         usable = bool(out) and ret == 0
+         Linker._gnu_linkers_usable[key] = usable
+      return usable
+
+   @staticmethod
+   def _detect_fast_gnu_linker(driver_args):
+      """Checks which of Linker.FAST_GNU_LINKERS, if any, a G++ or Clang linker driver is able to use.
+
+      iterable(str+) driver_args
+         Command line invoking the driver, without any linker-related arguments.
+      tuple(str*) return
+         Arguments that make the driver use the first linker found, or an empty tuple if none was found.
+      """
+
+      for fast_linker in Linker.FAST_GNU_LINKERS:
+         if Linker._can_driver_use_gnu_linker(driver_args, fast_linker):
+            return ('-fuse-ld=' + fast_linker, )
+      return ()
+
+   @staticmethod
+   def _get_fast_gnu_linker_file_paths():
+      """Returns the names of the executables of Linker.FAST_GNU_LINKERS, as looked for by G++ and Clang.
+
+      tuple(str+) return
+         Executable names.
+      """
+
+      return tuple('ld.' + fast_linker for fast_linker in Linker.FAST_GNU_LINKERS)
+
+   @staticmethod
+   def _get_fuse_ld(args):
+      """Returns the linker that a G++ or Clang linker driver will use, based on the last -fuse-ld argument.
+
+      iterable(str*) args
+         Arguments list.
+      str return
+         Linker, e.g. “lld”, or None if the driver will use its default linker.
+      """
+
+      fuse_ld = None
+      for arg in args:
+         if arg.startswith('-fuse-ld='):
+            fuse_ld = arg[len('-fuse-ld='):]
+      return fuse_ld
+
    @staticmethod
    def _get_supported():
       """See Tool._get_supported()."""
@@ -928,9 +1766,42 @@ class ClangGnuLdLinker(Linker):
       args.extend([
          '-Wl,--as-needed', # Only link to libraries containing symbols actually used.
       ])
-      args.extend([
-         '-ggdb',           # Generate debug info compatible with GDB.
-      ])
+      if core.configuration.debug_info:
+         args.extend([
+            '-ggdb',        # Generate debug info compatible with GDB.
+         ])
+      if core.lto:
+         args.extend([
+            '-flto=thin',   # Perform incremental (“thin”) link-time optimization.
+         ])
+         fuse_ld = self._get_fuse_ld(args)
+         if fuse_ld != 'lld':
+            driver_args = [self._file_path]
+            driver_args.extend(arg for arg in self._factory_args or () if not arg.startswith('-fuse-ld='))
+            if self._can_driver_use_gnu_linker(driver_args, 'lld'):
+               # lld performs ThinLTO natively, while other linkers need to load the LLVM gold plugin.
+               fuse_ld = 'lld'
+               args.append('-fuse-ld=lld')
+         if self._lto_cache_dir:
+            # Reuse the optimized code of modules that haven’t changed since the last link, keeping the cache
+            # from growing indefinitely.
+            if fuse_ld == 'lld':
+               args.extend([
+                  '-Wl,--thinlto-cache-dir=' + self._lto_cache_dir,
+                  '-Wl,--thinlto-cache-policy=cache_size_bytes={}'.format(self.LTO_CACHE_SIZE_MAX),
+               ])
+            elif fuse_ld in ('gold', 'mold'):
+               # Options for the LLVM gold plugin, which these linkers pass through.
+               args.extend([
+                  '-Wl,--plugin-opt=cache-dir=' + self._lto_cache_dir,
+                  '-Wl,--plugin-opt=cache-policy=cache_size_bytes={}'.format(self.LTO_CACHE_SIZE_MAX),
+               ])
+            # With GNU ld (BFD), nothing is cached.
+      if core.pgo == comk.configuration.PGO_INSTRUMENT:
+         args.extend([
+            '-fprofile-instr-generate', # Link to the profiling runtime.
+         ])
+      self._create_job_add_flags_for_split_dwarf(core, args)
 
       # TODO: add support for os.environ['LDFLAGS'] ?
 
@@ -954,7 +1825,13 @@ class ClangGnuLdLinker(Linker):
 
       ver = comk.version.Version.parse(match.group('ver'))
 
-      return ToolFactory(cls, file_path, target_system_type, ver, ('-target', str(target_system_type)))
+      # Prefer a faster linker, if one is available.
+      factory_args = ('-target', str(target_system_type))
+      factory_args += Linker._detect_fast_gnu_linker(args[:-1])
+
+      return ToolFactory(
+         cls, file_path, target_system_type, ver, factory_args, Linker._get_fast_gnu_linker_file_paths()
+      )
 
 ##############################################################################################################
 
@@ -974,9 +1851,26 @@ class ClangMachOLdLinker(Linker):
 
       Linker._create_job_add_flags(self, core, args)
 
-      args.extend([
-         '-ggdb',           # Generate debug info compatible with GDB.
-      ])
+      if core.configuration.debug_info:
+         args.extend([
+            '-ggdb',        # Generate debug info compatible with GDB.
+         ])
+      if core.lto:
+         args.extend([
+            '-flto=thin',   # Perform incremental (“thin”) link-time optimization.
+         ])
+         if self._lto_cache_dir:
+            args.extend([
+               # Reuse the optimized code of modules that haven’t changed since the last link.
+               '-Wl,-cache_path_lto,' + self._lto_cache_dir,
+               # Keep the cache from taking more than this percentage of the available disk space; ld64
+               # doesn’t support an absolute size limit.
+               '-Wl,-max_relative_cache_size_lto,10',
+            ])
+      if core.pgo == comk.configuration.PGO_INSTRUMENT:
+         args.extend([
+            '-fprofile-instr-generate', # Link to the profiling runtime.
+         ])
 
       # TODO: add support for os.environ['LDFLAGS'] ?
 
@@ -1066,9 +1960,25 @@ class GxxGnuLdLinker(Linker):
       args.extend([
          '-Wl,--as-needed', # Only link to libraries containing symbols actually used.
       ])
+      if core.configuration.debug_info:
+         args.extend([
+            '-ggdb',        # Generate debug info compatible with GDB.
+         ])
+      if core.lto:
+         args.extend([
+            '-flto=auto',   # Perform link-time optimization, using the make jobserver if available, or
+                            # else as many parallel jobs as there are CPUs.
+         ])
+         if self._get_fuse_ld(args) == 'lld':
+            args.extend([
+               '-fuse-ld=bfd', # lld can’t load GCC’s link-time optimization plugin.
+            ])
+      if core.pgo == comk.configuration.PGO_INSTRUMENT:
+         args.extend([
+            '-fprofile-generate', # Link to the profiling runtime.
+         ])
+      self._create_job_add_flags_for_split_dwarf(core, args)
       args.extend([
-         '-ggdb',           # Generate debug info compatible with GDB.
-
 #        '-coverage',
 #        '-lgcov',
       ])
@@ -1100,7 +2010,13 @@ class GxxGnuLdLinker(Linker):
          # If the tuple can’t be parsed, assume it’s not supported.
          return None
 
-      return ToolFactory(cls, file_path, supported_system_type, ver)
+      # Prefer a faster linker, if one is available.
+      factory_args = Linker._detect_fast_gnu_linker((file_path, ))
+
+      return ToolFactory(
+         cls, file_path, supported_system_type, ver, factory_args or None,
+         Linker._get_fast_gnu_linker_file_paths()
+      )
 
 ##############################################################################################################
 
@@ -1128,11 +2044,21 @@ class MsLinker(Linker):
 
       Linker._create_job_add_flags(self, core, args)
 
-      pdb_file_path = os.path.splitext(self._output_file_path)[0] + '.pdb'
-      args.extend([
-         '/DEBUG',                # Keep debug info.
-         '/PDB:' + pdb_file_path, # Create a program database file (PDB).
-      ])
+      if core.configuration.debug_info:
+         pdb_file_path = os.path.splitext(self._output_file_path)[0] + '.pdb'
+         args.extend([
+            '/DEBUG',                # Keep debug info.
+            '/PDB:' + pdb_file_path, # Create a program database file (PDB).
+         ])
+      if core.lto:
+         args.extend([
+            '/LTCG:INCREMENTAL',     # Perform link-time code generation, only regenerating code for
+                                     # modules that changed since the last link.
+         ])
+      if core.reproducible:
+         args.extend([
+            '/Brepro',               # Replace timestamps in the binary with a hash of its contents.
+         ])
 
    def _create_job_instance(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path):
       """See Linker._create_job_instance()."""
@@ -1149,6 +2075,16 @@ class MsLinker(Linker):
 
       return Linker._create_job_instance(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path)
 
+   @staticmethod
+   def _quote_response_file_arg(arg):
+      """See Linker._quote_response_file_arg(). Overridden to use double quotes, as expected by Microsoft
+      tools, which don’t treat backslashes as escape characters.
+      """
+
+      if re.search(r'[\s"]', arg):
+         return '"{}"'.format(arg.replace('"', '\\"'))
+      return arg
+
    @classmethod
    def _get_factory_if_exe_matches_tool_and_target(cls, file_path, target_system_type):
       """See Linker._get_factory_if_exe_matches_tool_and_target()."""
@@ -1193,3 +2129,172 @@ class MsLinker(Linker):
       else:
          machine = None
       return ToolFactory(cls, file_path, target_system_type, ver, machine)
+
+##############################################################################################################
+
+class Archiver(Tool):
+   """Abstract static library archiver."""
+
+   # See Tool._quiet_mode_name.
+   _quiet_mode_name = 'AR'
+   # See Tool._supports_response_files.
+   _supports_response_files = True
+
+   @staticmethod
+   def _create_job_add_flags_from_env_overrides(args):
+      """Does nothing, since there’s no environment variable holding additional flags for archivers: ARFLAGS,
+      used by make, replaces the archiver’s operation and modifiers instead.
+
+      list(str*) args
+         Arguments list.
+      """
+
+      pass
+
+   @staticmethod
+   def _get_supported():
+      """See Tool._get_supported()."""
+
+      return (
+         ('ar',      GnuArchiver, LlvmArchiver),
+         ('llvm-ar', LlvmArchiver),
+         ('lib.exe', MsArchiver)
+      )
+
+##############################################################################################################
+
+class GnuArchiver(Archiver):
+   """GNU archiver (ar)."""
+
+   # Mapping table between abstract (*FLAG_*) flags
+   _abstact_to_impl_flags = {
+      Tool.FLAG_OUTPUT_PATH_FORMAT: '{path}',
+   }
+
+   def _create_job_add_flags(self, core, args):
+      """See Archiver._create_job_add_flags()."""
+
+      # Replace or insert (r) members, creating (c) a thin (T) archive with a symbol index (s). Thin archives
+      # only reference the object files instead of copying them.
+      modifiers = 'rcsT'
+      if core.reproducible:
+         # Store zero for the timestamps, owners and permissions of members (D).
+         modifiers += 'D'
+      args.append(modifiers)
+
+      Archiver._create_job_add_flags(self, core, args)
+
+   def _create_job_add_output(self, core, args):
+      """See Archiver._create_job_add_output(). Overridden to delete any existing archive, which would
+      otherwise retain members for objects that are no longer part of it.
+      """
+
+      if not core.dry_run:
+         try:
+            os.unlink(self._output_file_path)
+         except (comk.FileNotFoundErrorCompat, OSError):
+            pass
+
+      Archiver._create_job_add_output(self, core, args)
+
+   @classmethod
+   def _get_factory_if_exe_matches_tool_and_target(cls, file_path, target_system_type):
+      """See Archiver._get_factory_if_exe_matches_tool_and_target()."""
+
+      out, ret = Tool._get_cmd_output((file_path, '--version'))
+      if not out or ret != 0:
+         return None
+
+      # “GNU ar (GNU Binutils for Debian) 2.40”
+      match = re.search(r'^GNU ar .*?(?P<ver>[.0-9]+)$', out, re.MULTILINE)
+      if not match:
+         return None
+
+      ver = comk.version.Version.parse(match.group('ver'))
+
+      return ToolFactory(cls, file_path, target_system_type, ver)
+
+##############################################################################################################
+
+class LlvmArchiver(GnuArchiver):
+   """LLVM archiver (llvm-ar). Accepts the same arguments as GNU ar."""
+
+   @classmethod
+   def _get_factory_if_exe_matches_tool_and_target(cls, file_path, target_system_type):
+      """See GnuArchiver._get_factory_if_exe_matches_tool_and_target()."""
+
+      out, ret = Tool._get_cmd_output((file_path, '--version'))
+      if not out or ret != 0:
+         return None
+
+      # “LLVM (http://llvm.org/):\n  LLVM version 14.0.6”
+      # “Ubuntu LLVM version 15.0.7”
+      match = re.search(r'LLVM version (?P<ver>[.0-9]+)', out)
+      if not match:
+         return None
+
+      ver = comk.version.Version.parse(match.group('ver'))
+
+      return ToolFactory(cls, file_path, target_system_type, ver)
+
+##############################################################################################################
+
+class MsArchiver(Archiver):
+   """Microsoft library manager (Lib).
+
+   For a list of recognized command-line arguments, see <https://docs.microsoft.com/en-us/cpp/build/
+   reference/running-lib>.
+   """
+
+   # Mapping table between abstract (*FLAG_*) flags
+   _abstact_to_impl_flags = {
+      Tool.FLAG_OUTPUT_PATH_FORMAT: '/OUT:{path}',
+   }
+
+   def _create_job_add_flags(self, core, args):
+      """See Archiver._create_job_add_flags()."""
+
+      args.extend([
+         '/NOLOGO', # Suppress brand banner display.
+      ])
+
+      Archiver._create_job_add_flags(self, core, args)
+
+      if core.lto:
+         args.extend([
+            '/LTCG',   # Allow archiving objects compiled for whole program optimization.
+         ])
+
+   @classmethod
+   def _get_factory_if_exe_matches_tool_and_target(cls, file_path, target_system_type):
+      """See Archiver._get_factory_if_exe_matches_tool_and_target()."""
+
+      out, ret = Tool._get_cmd_output((file_path, '/?'))
+      if not out:
+         return None
+
+      # “Microsoft (R) Library Manager Version 14.29.30133.0”
+      match = re.search(r'^Microsoft .*? Library Manager Version (?P<ver>[.0-9]+)$', out, re.MULTILINE)
+      if not match:
+         return None
+
+      ver = comk.version.Version.parse(match.group('ver'))
+
+      return ToolFactory(cls, file_path, target_system_type, ver)
+
+   def _create_job_instance(self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path):
+      """See Archiver._create_job_instance()."""
+
+      # Like link.exe, lib.exe logs to stdout instead of stderr.
+      popen_args['stderr'] = subprocess.STDOUT
+
+      return Archiver._create_job_instance(
+         self, on_complete_fn, quiet_cmd, popen_args, log, stderr_file_path
+      )
+
+   @staticmethod
+   def _quote_response_file_arg(arg):
+      """See Archiver._quote_response_file_arg()."""
+
+      # Same rules as link.exe.
+      return MsLinker._quote_response_file_arg(arg)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.tool."""
+
+import os
+import time
+import unittest
+
+import comk
+import comk.core
+import comk.testing
+import comk.tool
+
+
+##############################################################################################################
+
+class ProbedTool(comk.tool.Tool):
+   @staticmethod
+   def _get_supported():
+      return (
+         ('slow', ProbedToolImpl),
+         ('fast', ProbedToolImpl),
+         ('none', ProbedToolImpl),
+      )
+
+class ProbedToolImpl(ProbedTool):
+   @classmethod
+   def _get_factory_if_exe_matches_tool_and_target(cls, file_path, target_system_type):
+      if file_path == 'slow':
+         time.sleep(0.2)
+      if file_path == 'none':
+         return None
+      return comk.tool.ToolFactory(cls, file_path, target_system_type, None)
+
+##############################################################################################################
+
+class GetFactoriesTest(unittest.TestCase):
+   def runTest(self):
+      # The most preferred candidate wins, even if it’s the slowest to probe.
+      tool_factories = comk.tool.Tool.get_factories((ProbedTool, ))
+      self.assertEqual(tool_factories[ProbedTool].file_path, 'slow')
+
+##############################################################################################################
+
+@unittest.skipIf(comk.os_is_windows(), 'requires a POSIX shell')
+class ClangGnuLdLinkerLtoTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def create_driver(self, name, linkers):
+      """Creates a fake Clang linker driver that only accepts -fuse-ld for the specified linkers."""
+
+      file_path = os.path.join(self._dir, name)
+      with open(file_path, 'w') as driver:
+         driver.write(
+            '#!/bin/sh\n' +
+            'for arg; do case $arg in -fuse-ld=*) ld=${arg#-fuse-ld=};; esac; done\n' +
+            'case " ' + ' '.join(linkers) + ' " in *" $ld "*) echo "$ld 1.0"; exit 0;; esac\n' +
+            'exit 1\n'
+         )
+      os.chmod(file_path, 0o755)
+      return file_path
+
+   def get_lto_args(self, driver_file_path):
+      core = comk.core.Core()
+      core.lto = True
+      factory_args = ('-target', 'x86_64-pc-linux-gnu')
+      factory_args += comk.tool.Linker._detect_fast_gnu_linker((driver_file_path, ) + factory_args)
+      lnk = comk.tool.ClangGnuLdLinker(driver_file_path, None, factory_args)
+      lnk.lto_cache_dir = 'lto-cache'
+      return lnk.get_args_template(core)
+
+   def runTest(self):
+      # lld is preferred for ThinLTO over the faster linker detected.
+      args = self.get_lto_args(self.create_driver('clang++-mold-lld', ('mold', 'lld')))
+      self.assertEqual(comk.tool.Linker._get_fuse_ld(args), 'lld')
+      self.assertIn('-Wl,--thinlto-cache-dir=lto-cache', args)
+
+      # Without lld, the detected linker is kept, and ThinLTO is cached through the plugin.
+      args = self.get_lto_args(self.create_driver('clang++-gold', ('gold', )))
+      self.assertEqual(comk.tool.Linker._get_fuse_ld(args), 'gold')
+      self.assertIn('-Wl,--plugin-opt=cache-dir=lto-cache', args)
+      self.assertFalse([arg for arg in args if arg.startswith('-Wl,--thinlto-')])
+
+      # With GNU ld, nothing is cached.
+      args = self.get_lto_args(self.create_driver('clang++', ()))
+      self.assertIsNone(comk.tool.Linker._get_fuse_ld(args))
+      self.assertFalse([arg for arg in args if 'cache' in arg])
+
+##############################################################################################################
+
+@unittest.skipIf(comk.os_is_windows(), 'requires a POSIX shell')
+class ClangxxCompilerPgoMergeTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def touch_raw_profile(self, file_name):
+      with open(os.path.join(self._dir, file_name), 'w') as raw_profile:
+         raw_profile.write(file_name)
+
+   def get_merged_file_names(self):
+      with open(os.path.join(self._dir, comk.tool.ClangxxCompiler.PGO_PROFILE_FILE), 'r') as merged_profile:
+         return [os.path.basename(file_path) for file_path in merged_profile.read().split()]
+
+   def runTest(self):
+      # A fake llvm-profdata, next to the fake compiler, that saves the names of the files it merges.
+      llvm_profdata_file_path = os.path.join(self._dir, 'llvm-profdata')
+      with open(llvm_profdata_file_path, 'w') as llvm_profdata:
+         llvm_profdata.write(
+            '#!/bin/sh\n' +
+            'shift; out=${1#-output=}; shift; echo "$@" >"$out"\n'
+         )
+      os.chmod(llvm_profdata_file_path, 0o755)
+      cxx = comk.tool.ClangxxCompiler(os.path.join(self._dir, 'clang++'), None, ())
+      core = comk.core.Core()
+      core._pgo_profile_dir = self._dir
+
+      # Without raw profile data there’s nothing to optimize with.
+      self.assertFalse(cxx.merge_pgo_profile(core, ('test-a', )))
+
+      # Each training run replaces the raw profile data of the previous one.
+      self.touch_raw_profile('test-a#stale.profraw')
+      env = cxx.get_pgo_training_environ(core, 'test-a', {})
+      self.assertFalse(os.path.exists(os.path.join(self._dir, 'test-a#stale.profraw')))
+      self.assertEqual(env['LLVM_PROFILE_FILE'], os.path.join(self._dir, 'test-a#%m.profraw'))
+
+      # Only raw profile data from the training targets is merged.
+      self.touch_raw_profile('test-a#1.profraw')
+      self.touch_raw_profile('test-b#2.profraw')
+      self.touch_raw_profile('3.profraw')
+      self.assertTrue(cxx.merge_pgo_profile(core, ('test-a', )))
+      self.assertEqual(self.get_merged_file_names(), ['test-a#1.profraw'])
+
+      # A different set of training targets causes a new merge, even if no raw profile data is newer.
+      self.assertTrue(cxx.merge_pgo_profile(core, ('test-a', 'test-b')))
+      self.assertEqual(self.get_merged_file_names(), ['test-a#1.profraw', 'test-b#2.profraw'])
@@ -0,0 +1,517 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Persistent cache of detected tools.
+
+Detecting a tool (see comk.tool.Tool.get_factory()) requires running candidate executables, which is slow
+compared to the rest of Complemake’s startup. comk.toolcache.ToolCache stores the outcome of each detection in
+the shared directory, along with the real path, size and modification time of the executable that was
+detected, so that following runs only need to check that the tool still resolves to the same, unchanged
+executable. The same is recorded for any helper executables that affected the detection (see
+comk.tool.ToolFactory.helper_file_paths), including the fact that one could not be found.
+"""
+
+import hashlib
+import os
+import sys
+import yaml
+import yaml.generator
+import yaml.parser
+
+import comk
+import comk.platform
+import comk.tool
+import comk.version
+
+if sys.hexversion >= 0x03000000:
+   basestring = str
+
+
+##############################################################################################################
+
+class ToolCacheParser(yaml.parser.Parser):
+   """Parser of Complemake’s tool cache files."""
+
+   # Logger instance.
+   _log = None
+
+   def __init__(self, log):
+      """Constructor.
+
+      comk.logging.Logger log
+         Logger to make accessible via self.log .
+      """
+
+      yaml.parser.Parser.__init__(self)
+
+      self._log = log
+
+   def _get_log(self):
+      return self._log
+
+   log = property(_get_log, doc="""Returns the Logger instance used by objects created by the parser.""")
+
+##############################################################################################################
+
+def get_exe_signature(file_path):
+   """Returns the information used to check whether an executable has changed.
+
+   str file_path
+      Name of, or path to, the executable.
+   tuple(str, int, int) return
+      Real path, modification time in microseconds, and size of the executable; or None if it could not be
+      found.
+   """
+
+   file_path = comk.which(file_path)
+   if not file_path:
+      return None
+   real_file_path = os.path.realpath(file_path)
+   try:
+      st = os.stat(real_file_path)
+   except (comk.FileNotFoundErrorCompat, OSError):
+      return None
+   return real_file_path, int(st.st_mtime * 1000000), st.st_size
+
+@ToolCacheParser.local_tag('complemake/tool-cache/tool', yaml.Kind.MAPPING)
+class CachedTool(object):
+   """Outcome of the detection of a tool."""
+
+   __slots__ = (
+      # Additional arguments stored in the tool factory.
+      '_args',
+      # Modification time of _exe_path, in microseconds.
+      '_exe_mtime',
+      # Real path to the detected executable.
+      '_exe_path',
+      # Size of _exe_path.
+      '_exe_size',
+      # Name by which the tool is invoked.
+      '_file_path',
+      # Signature of each helper executable, as returned by get_exe_signature(), keyed by the name by which
+      # it’s looked for (str -> tuple(str, int, int)); None if the tool has no helpers.
+      '_helper_exe_signatures',
+      # See CachedTool.key.
+      '_key',
+      # Name of the comk.tool.Tool leaf subclass to instantiate.
+      '_product_cls_name',
+      # String representation of the target system type.
+      '_system_type',
+      # String representation of the tool version.
+      '_ver',
+   )
+
+   def __init__(self, *args):
+      """Constructor.
+
+      comk.toolcache.ToolCacheParser parser
+         Parser instantiating the object.
+      dict(object: object) parsed
+         Parsed YAML object to be used to construct the new instance.
+
+      - OR -
+
+      str key
+         Key of the tool, as returned by ToolCache.get_key().
+      comk.tool.ToolFactory tool_factory
+         Factory returned by comk.tool.Tool.get_factory().
+      tuple(str, int, int) exe_signature
+         Return value of get_exe_signature() for the tool’s executable.
+      dict(str: tuple(str, int, int)) helper_exe_signatures
+         Return value of get_exe_signature() for each of tool_factory.helper_file_paths, or None.
+      """
+
+      if isinstance(args[0], ToolCacheParser):
+         parser, parsed = args
+
+         def get_str(name, optional=False, source=parsed):
+            value = source.get(name)
+            if not isinstance(value, basestring) and not (optional and value is None):
+               parser.raise_parsing_error('missing or invalid “{}” attribute'.format(name))
+            return value
+
+         def get_int(name, source=parsed):
+            value = source.get(name)
+            if not isinstance(value, int):
+               parser.raise_parsing_error('missing or invalid “{}” attribute'.format(name))
+            return value
+
+         self._key = get_str('key')
+         self._product_cls_name = get_str('product')
+         self._file_path = get_str('path')
+         self._exe_path = get_str('exe')
+         self._exe_mtime = get_int('exe-mtime')
+         self._exe_size = get_int('exe-size')
+         self._ver = get_str('version', optional=True)
+         self._system_type = get_str('system-type', optional=True)
+         args = parsed.get('args')
+         if args is not None:
+            if not isinstance(args, list) or not all(isinstance(arg, basestring) for arg in args):
+               parser.raise_parsing_error('attribute “args” must be a sequence of strings')
+            args = tuple(args)
+         self._args = args
+         helpers = parsed.get('helpers')
+         if helpers is not None:
+            if not isinstance(helpers, list) or not all(isinstance(helper, dict) for helper in helpers):
+               parser.raise_parsing_error('attribute “helpers” must be a sequence of mappings')
+            helper_exe_signatures = {}
+            for helper in helpers:
+               # A helper that could not be found has no “exe” attribute.
+               if get_str('exe', optional=True, source=helper) is None:
+                  signature = None
+               else:
+                  signature = (
+                     get_str('exe', source=helper), get_int('exe-mtime', source=helper),
+                     get_int('exe-size', source=helper)
+                  )
+               helper_exe_signatures[get_str('path', source=helper)] = signature
+            helpers = helper_exe_signatures
+         self._helper_exe_signatures = helpers
+      else:
+         self._key, tool_factory, exe_signature, self._helper_exe_signatures = args
+
+         self._product_cls_name = tool_factory.product_cls.__name__
+         self._file_path = tool_factory.file_path
+         self._exe_path, self._exe_mtime, self._exe_size = exe_signature
+         self._ver = str(tool_factory.ver) if tool_factory.ver else None
+         if tool_factory.target_system_type:
+            self._system_type = str(tool_factory.target_system_type)
+         else:
+            self._system_type = None
+         self._args = tuple(tool_factory.args) if tool_factory.args else None
+
+   def __yaml__(self, yg):
+      """Generates YAML for the object; see yaml.generator.Generator.produce_from_object()."""
+
+      yg.write_mapping_begin('!complemake/tool-cache/tool')
+      yg.produce_from_object('key')
+      yg.produce_from_object(self._key)
+      yg.produce_from_object('product')
+      yg.produce_from_object(self._product_cls_name)
+      yg.produce_from_object('path')
+      yg.produce_from_object(self._file_path)
+      yg.produce_from_object('exe')
+      yg.produce_from_object(self._exe_path)
+      yg.produce_from_object('exe-mtime')
+      yg.produce_from_object(self._exe_mtime)
+      yg.produce_from_object('exe-size')
+      yg.produce_from_object(self._exe_size)
+      if self._ver:
+         yg.produce_from_object('version')
+         yg.produce_from_object(self._ver)
+      if self._system_type:
+         yg.produce_from_object('system-type')
+         yg.produce_from_object(self._system_type)
+      if self._args:
+         yg.produce_from_object('args')
+         yg.produce_from_object(self._args)
+      if self._helper_exe_signatures:
+         helpers = []
+         for helper_file_path, signature in sorted(self._helper_exe_signatures.items()):
+            helper = {'path': helper_file_path}
+            if signature:
+               helper['exe'], helper['exe-mtime'], helper['exe-size'] = signature
+            helpers.append(helper)
+         yg.produce_from_object('helpers')
+         yg.produce_from_object(helpers)
+      yg.write_mapping_end()
+
+   def create_factory(self, tool_cls):
+      """Recreates the tool factory, unless the executable changed since it was detected.
+
+      type tool_cls
+         Non-leaf comk.tool.Tool subclass that was requested.
+      comk.tool.ToolFactory return
+         Tool factory, or None if the cached information is no longer valid.
+      """
+
+      # This is the only check that touches the file system. The invoked path is resolved again, since it
+      # could now lead to a different executable (e.g. a symlink retargeted by update-alternatives) even if
+      # the one detected is unchanged.
+      if get_exe_signature(self._file_path) != (self._exe_path, self._exe_mtime, self._exe_size):
+         return None
+      if self._helper_exe_signatures:
+         # A helper being installed or removed counts as a change too.
+         for helper_file_path, signature in self._helper_exe_signatures.items():
+            if get_exe_signature(helper_file_path) != signature:
+               return None
+         helper_file_paths = tuple(sorted(self._helper_exe_signatures.keys()))
+      else:
+         helper_file_paths = None
+      for derived_cls in comk.derived_classes(tool_cls):
+         if derived_cls.__name__ == self._product_cls_name:
+            product_cls = derived_cls
+            break
+      else:
+         # The class was removed or renamed.
+         return None
+      try:
+         ver = comk.version.Version.parse(self._ver) if self._ver else None
+         if self._system_type:
+            system_type = comk.platform.SystemType.parse_tuple(self._system_type)
+         else:
+            system_type = None
+      except (comk.version.InvalidVersionError, comk.platform.SystemTypeTupleError):
+         return None
+      return comk.tool.ToolFactory(
+         product_cls, self._file_path, system_type, ver, self._args, helper_file_paths
+      )
+
+   def _get_key(self):
+      return self._key
+
+   key = property(_get_key, doc="""Hash of the parameters of the detection; see ToolCache.get_key().""")
+
+##############################################################################################################
+
+@ToolCacheParser.local_tag('complemake/tool-cache/store', yaml.Kind.MAPPING)
+class ToolCache(object):
+   """Stores detected tools in a file, so that they don’t have to be detected again by following runs."""
+
+   # Cached tools (str -> CachedTool).
+   _cached_tools = None
+   # Persistent storage file path.
+   _file_path = None
+   # Output log.
+   _log = None
+
+   def __init__(self, *args):
+      """Constructor.
+
+      comk.toolcache.ToolCacheParser parser
+         Parser instantiating the object.
+      dict(object: object) parsed
+         Parsed YAML object to be used to construct the new instance.
+
+      - OR -
+
+      comk.logging.Logger log
+         Output log.
+      str file_path
+         Tool cache file.
+      """
+
+      if isinstance(args[0], ToolCacheParser):
+         parser, parsed = args
+         log = parser.log
+         file_path = parser.source_name
+      else:
+         parsed = None
+         log, file_path = args
+
+      self._cached_tools = {}
+      self._file_path = file_path
+      self._log = log
+
+      if parsed:
+         cached_tools = parsed.get('tools')
+         if not isinstance(cached_tools, list):
+            parser.raise_parsing_error('attribute “tools” must be a sequence')
+         for i, o in enumerate(cached_tools):
+            if not isinstance(o, CachedTool):
+               parser.raise_parsing_error((
+                  'elements of the “tools” attribute must be of type !complemake/tool-cache/tool, but ' +
+                  'element [{}] is not'
+               ).format(i))
+            self._cached_tools[o.key] = o
+
+   def __yaml__(self, yg):
+      """Generates YAML for the object; see yaml.generator.Generator.produce_from_object()."""
+
+      yg.write_mapping_begin('!complemake/tool-cache/store')
+      yg.produce_from_object('tools')
+      yg.produce_from_object(sorted(self._cached_tools.values(), key=lambda cached_tool: cached_tool.key))
+      yg.write_mapping_end()
+
+   def get_factory(self, tool_cls, file_path_override=None, target_system_type=None):
+      """Returns a cached tool factory for the specified tool, falling back to
+      comk.tool.Tool.get_factory() and caching its result.
+
+      type tool_cls
+         Non-leaf comk.tool.Tool subclass.
+      str file_path_override
+         See comk.tool.Tool.get_factory().
+      comk.platform.SystemType target_system_type
+         See comk.tool.Tool.get_factory().
+      comk.tool.ToolFactory return
+         Factory able to instantiate a tool_cls subclass matching the tool.
+      """
+
+      key = self.get_key(tool_cls, file_path_override, target_system_type)
+      tool_factory = self._get_cached_factory(tool_cls, key)
+      if not tool_factory:
+         tool_factory = tool_cls.get_factory(file_path_override, target_system_type)
+         if self._store(key, tool_factory):
+            self.write()
+      return tool_factory
+
+   def get_factory_if_cached(self, tool_cls, file_path_override = None, target_system_type = None):
+      """Returns a cached tool factory, without attempting to detect the tool if it’s not in the cache.
+
+      type tool_cls
+         Non-leaf comk.tool.Tool subclass.
+      str file_path_override
+         See comk.tool.Tool.get_factory().
+      comk.platform.SystemType target_system_type
+         See comk.tool.Tool.get_factory().
+      comk.tool.ToolFactory return
+         Tool factory, or None if the tool is not cached or its cache entry is no longer valid.
+      """
+
+      return self._get_cached_factory(
+         tool_cls, self.get_key(tool_cls, file_path_override, target_system_type)
+      )
+
+   def get_factories(self, tool_clss, target_system_type=None):
+      """Returns cached tool factories for the specified tools, detecting any that are not cached with
+      comk.tool.Tool.get_factories() and caching the results.
+
+      iterable(type+) tool_clss
+         Non-leaf comk.tool.Tool subclasses.
+      comk.platform.SystemType target_system_type
+         See comk.tool.Tool.get_factories().
+      dict(type: comk.tool.ToolFactory) return
+         See comk.tool.Tool.get_factories().
+      """
+
+      tool_factories = {}
+      keys = {}
+      for tool_cls in tool_clss:
+         keys[tool_cls] = self.get_key(tool_cls, None, target_system_type)
+         tool_factory = self._get_cached_factory(tool_cls, keys[tool_cls])
+         if tool_factory:
+            tool_factories[tool_cls] = tool_factory
+      uncached_tool_clss = [tool_cls for tool_cls in tool_clss if tool_cls not in tool_factories]
+      if uncached_tool_clss:
+         dirty = False
+         for tool_cls, tool_factory in comk.tool.Tool.get_factories(
+            uncached_tool_clss, target_system_type
+         ).items():
+            tool_factories[tool_cls] = tool_factory
+            if tool_factory and self._store(keys[tool_cls], tool_factory):
+               dirty = True
+         if dirty:
+            self.write()
+      return tool_factories
+
+   def _get_cached_factory(self, tool_cls, key):
+      """Returns a tool factory from the cache, if it has a valid entry for the specified key.
+
+      type tool_cls
+         Non-leaf comk.tool.Tool subclass.
+      str key
+         Key returned by ToolCache.get_key().
+      comk.tool.ToolFactory return
+         Tool factory, or None if not cached or no longer valid.
+      """
+
+      log = self._log
+      cached_tool = self._cached_tools.get(key)
+      if not cached_tool:
+         return None
+      tool_factory = cached_tool.create_factory(tool_cls)
+      if tool_factory:
+         log(log.HIGH, 'tool-cache: using {} as {}', tool_factory.file_path, tool_cls.__name__)
+      else:
+         log(log.HIGH, 'tool-cache: stale entry for {}', tool_cls.__name__)
+      return tool_factory
+
+   @staticmethod
+   def get_key(tool_cls, file_path_override, target_system_type):
+      """Returns a key that identifies the parameters of a tool detection.
+
+      The PATH environment variable is part of the key, since it affects which executables are found when no
+      file_path_override is specified.
+
+      type tool_cls
+         Non-leaf comk.tool.Tool subclass.
+      str file_path_override
+         See comk.tool.Tool.get_factory().
+      comk.platform.SystemType target_system_type
+         See comk.tool.Tool.get_factory().
+      str return
+         Key.
+      """
+
+      key_source = '\0'.join((
+         tool_cls.__name__,
+         file_path_override or '',
+         str(target_system_type) if target_system_type else '',
+         os.environ.get('PATH', ''),
+      ))
+      return hashlib.sha1(key_source.encode('utf-8')).hexdigest()
+
+   @classmethod
+   def load(cls, file_path, log):
+      """Loads the tool cache from the specified file, or creates an empty one if the file doesn’t exist or
+      can’t be parsed.
+
+      str file_path
+         Tool cache file.
+      comk.logging.Logger log
+         Output log.
+      comk.toolcache.ToolCache return
+         Tool cache.
+      """
+
+      try:
+         tool_cache = ToolCacheParser(log).parse_file(file_path)
+         if isinstance(tool_cache, cls):
+            return tool_cache
+         log(log.HIGH, 'tool-cache: ignoring invalid store: {}', file_path)
+      except (comk.FileNotFoundErrorCompat, OSError):
+         pass
+      except yaml.parser.SyntaxError as x:
+         log(log.HIGH, 'tool-cache: ignoring invalid store: {}', x)
+      return cls(log, file_path)
+
+   def _store(self, key, tool_factory):
+      """Adds a tool factory to the cache, unless its executable can’t be found.
+
+      str key
+         Key returned by ToolCache.get_key().
+      comk.tool.ToolFactory tool_factory
+         Tool factory to store.
+      bool return
+         True if the cache was changed and needs to be written, or False otherwise.
+      """
+
+      exe_signature = get_exe_signature(tool_factory.file_path)
+      if not exe_signature:
+         return False
+      if tool_factory.helper_file_paths:
+         helper_exe_signatures = dict(
+            (helper_file_path, get_exe_signature(helper_file_path))
+            for helper_file_path in tool_factory.helper_file_paths
+         )
+      else:
+         helper_exe_signatures = None
+      self._cached_tools[key] = CachedTool(key, tool_factory, exe_signature, helper_exe_signatures)
+      return True
+
+   def write(self):
+      """Stores the cache to the file from which it was loaded. The file is replaced atomically, so that
+      concurrent runs never see a partially written file.
+      """
+
+      log = self._log
+      log(log.HIGH, 'tool-cache: writing store: {}', self._file_path)
+      comk.makedirs(os.path.dirname(self._file_path))
+      temp_file_path = '{}.{}.tmp'.format(self._file_path, os.getpid())
+      yaml.generator.generate_file(temp_file_path, self)
+      comk.replace_file(temp_file_path, self._file_path)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Test cases for comk.toolcache."""
+
+import os
+import unittest
+
+import comk.logging
+import comk.testing
+import comk.tool
+import comk.toolcache as ctc
+import comk.version
+
+
+##############################################################################################################
+
+class FakeTool(comk.tool.Tool):
+   detections = 0
+
+   @classmethod
+   def get_factory(cls, file_path_override = None, target_system_type = None):
+      cls.detections += 1
+      return comk.tool.ToolFactory(
+         FakeToolImpl, file_path_override, target_system_type, comk.version.Version(1, 2), ('-x', )
+      )
+
+class FakeToolImpl(FakeTool):
+   pass
+
+##############################################################################################################
+
+class ToolCacheTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache_file_path = os.path.join(self._dir, 'cache', 'tool-cache.yml')
+      exe_file_path = os.path.join(self._dir, 'tool')
+      with open(exe_file_path, 'wb') as exe:
+         exe.write(b'v1')
+
+      tool_factory = ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, exe_file_path)
+      self.assertEqual(FakeTool.detections, 1)
+
+      # A new instance should find the tool in the file.
+      cached_tool_factory = ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, exe_file_path)
+      self.assertEqual(FakeTool.detections, 1)
+      self.assertIs(cached_tool_factory.product_cls, FakeToolImpl)
+      self.assertEqual(cached_tool_factory.file_path, tool_factory.file_path)
+      self.assertEqual(cached_tool_factory.ver, tool_factory.ver)
+      self.assertEqual(cached_tool_factory.args, ('-x', ))
+      tool_cache = ctc.ToolCache.load(cache_file_path, log)
+      self.assertIsNotNone(tool_cache.get_factory_if_cached(FakeTool, exe_file_path))
+      self.assertIsNone(tool_cache.get_factory_if_cached(FakeTool, 'other'))
+      self.assertEqual(FakeTool.detections, 1)
+
+      # Changing the executable invalidates the entry.
+      with open(exe_file_path, 'wb') as exe:
+         exe.write(b'version 2')
+      ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, exe_file_path)
+      self.assertEqual(FakeTool.detections, 2)
+
+      # A corrupt file is ignored.
+      with open(cache_file_path, 'w') as cache_file:
+         cache_file.write('%YAML 1.2\n--- !complemake/tool-cache/store\ntools: 1\n')
+      ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, exe_file_path)
+      self.assertEqual(FakeTool.detections, 3)
+
+##############################################################################################################
+
+@unittest.skipUnless(hasattr(os, 'symlink'), 'requires symbolic links')
+class ToolCacheRetargetTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache_file_path = os.path.join(self._dir, 'cache', 'tool-cache.yml')
+      link_file_path = os.path.join(self._dir, 'tool')
+      # Two identical executables, as far as their size and modification time go.
+      for version, contents in ('1', b'v1'), ('2', b'v2'):
+         exe_file_path = os.path.join(self._dir, 'tool-' + version)
+         with open(exe_file_path, 'wb') as exe:
+            exe.write(contents)
+         os.utime(exe_file_path, (1000000000, 1000000000))
+      os.symlink(os.path.join(self._dir, 'tool-1'), link_file_path)
+
+      detections = FakeTool.detections
+      # Don’t affect the counts checked by other tests.
+      self.addCleanup(setattr, FakeTool, 'detections', detections)
+      ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, link_file_path)
+      ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, link_file_path)
+      self.assertEqual(FakeTool.detections, detections + 1)
+
+      # Retargeting the link, as update-alternatives would, invalidates the entry.
+      os.remove(link_file_path)
+      os.symlink(os.path.join(self._dir, 'tool-2'), link_file_path)
+      ctc.ToolCache.load(cache_file_path, log).get_factory(FakeTool, link_file_path)
+      self.assertEqual(FakeTool.detections, detections + 2)
+
+##############################################################################################################
+
+class FakeHelpedTool(comk.tool.Tool):
+   detections = 0
+   helper_file_path = None
+
+   @classmethod
+   def get_factory(cls, file_path_override = None, target_system_type = None):
+      cls.detections += 1
+      return comk.tool.ToolFactory(
+         FakeHelpedToolImpl, file_path_override, target_system_type, None, None, (cls.helper_file_path, )
+      )
+
+class FakeHelpedToolImpl(FakeHelpedTool):
+   pass
+
+##############################################################################################################
+
+class ToolCacheHelperTest(comk.testing.TempDirMixIn, unittest.TestCase):
+   def runTest(self):
+      log = comk.logging.Logger(comk.logging.LogGenerator())
+      cache_file_path = os.path.join(self._dir, 'cache', 'tool-cache.yml')
+      exe_file_path = os.path.join(self._dir, 'tool')
+      with open(exe_file_path, 'wb') as exe:
+         exe.write(b'v1')
+      helper_file_path = os.path.join(self._dir, 'helper')
+      FakeHelpedTool.helper_file_path = helper_file_path
+
+      def get_factory():
+         return ctc.ToolCache.load(cache_file_path, log).get_factory(FakeHelpedTool, exe_file_path)
+
+      # The helper doesn’t exist yet, and that is cached too.
+      get_factory()
+      tool_factory = get_factory()
+      self.assertEqual(FakeHelpedTool.detections, 1)
+      self.assertEqual(tool_factory.helper_file_paths, (helper_file_path, ))
+
+      # Installing the helper invalidates the entry.
+      with open(helper_file_path, 'wb') as helper:
+         helper.write(b'v1')
+      get_factory()
+      get_factory()
+      self.assertEqual(FakeHelpedTool.detections, 2)
+
+      # So does changing it…
+      with open(helper_file_path, 'wb') as helper:
+         helper.write(b'version 2')
+      get_factory()
+      self.assertEqual(FakeHelpedTool.detections, 3)
+
+      # …or removing it.
+      os.remove(helper_file_path)
+      get_factory()
+      get_factory()
+      self.assertEqual(FakeHelpedTool.detections, 4)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; mode: python; tab-width: 3; indent-tabs-mode: nil -*-
+#
+# Copyright 2017 Raffaello D. Di Napoli
+#
+# This file is part of Complemake.
+#
+# Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License along with Complemake. If not, see
+# <http://www.gnu.org/licenses/>.
+#-------------------------------------------------------------------------------------------------------------
+
+"""Runs compile jobs sent by Complemake’s --worker option."""
+
+import argparse
+import sys
+
+import comk.distcompile
+
+
+##############################################################################################################
+
+def main(args):
+   """Implementation of __main__.
+
+   iterable(str*) args
+      Command-line arguments.
+   int return
+      Command return status.
+   """
+
+   argparser = argparse.ArgumentParser(add_help=False)
+   argparser.add_argument(
+      '--address', default='127.0.0.1',
+      help='Address to listen on. Defaults to 127.0.0.1, i.e. only accept local connections, since the ' +
+           'worker doesn’t perform any authentication.'
+   )
+   argparser.add_argument(
+      '-c', '--compiler', metavar='NAME', action='append', dest='compilers',
+      help='Specify once or more to only allow running the specified compiler executables, looked up in ' +
+           'the PATH. If omitted, the usual names of GCC and Clang (e.g. g++, clang++-15) are allowed.'
+   )
+   argparser.add_argument(
+      '--help', action='help',
+      help='Show this informative message and exit.'
+   )
+   argparser.add_argument(
+      '-j', '--jobs', default=None, metavar='N', type=int,
+      help='Run at most N compile jobs at the same time. Defaults to the number of processors.'
+   )
+   argparser.add_argument(
+      '-p', '--port', type=int, default=0,
+      help='Port to listen on. If omitted, any available port will be used.'
+   )
+   argparser.add_argument(
+      '-v', '--verbose', action='store_true',
+      help='Log every request to stderr.'
+   )
+   args = argparser.parse_args()
+
+   server = comk.distcompile.WorkerServer((args.address, args.port), args.jobs, args.compilers, args.verbose)
+   # Print the address to pass to --worker, also letting scripts know when the worker is ready.
+   sys.stdout.write('{}\n'.format(server.address))
+   sys.stdout.flush()
+   try:
+      server.serve_forever()
+   except KeyboardInterrupt:
+      pass
+   finally:
+      server.server_close()
+   return 0
+
+if __name__ == '__main__':
+   sys.exit(main(sys.argv))
@@ -34,7 +34,15 @@ import sys
 
 import comk
 import comk.argparser
+import comk.compilecache
+import comk.configuration
 import comk.core
+import comk.distcompile
+import comk.logging
+import comk.plan
+import comk.remotecache
+import comk.target
+import comk.testcache
 import comk.tool
 
 
@@ -62,11 +70,26 @@ def main(args):
 
    core = comk.core.Core()
    core.dry_run = args.dry_run
-   core.output_dir = args.output_dir
+   core.configuration = comk.configuration.Configuration.from_name(args.configuration)
+   core.lto = args.lto
+   if args.pgo_train:
+      core.pgo = comk.configuration.PGO_OPTIMIZE
+      pgo_instr_output_dir = core.configuration.get_output_dir(
+         args.output_dir, core.lto, comk.configuration.PGO_INSTRUMENT
+      )
+      core.pgo_profile_dir = os.path.join(pgo_instr_output_dir, core.INT_DIR, core.PGO_PROFILE_DIR)
+   core.output_dir = core.configuration.get_output_dir(args.output_dir, core.lto, core.pgo)
    core.project_path = os.getcwd()
+   core.reproducible = args.reproducible
+   if args.reproducible:
+      # Make compilers expand __DATE__ and __TIME__ to a fixed time (see -Wdate-time).
+      os.environ.setdefault('SOURCE_DATE_EPOCH', '0')
    core.shared_dir = args.shared_dir
+   core.split_dwarf = args.split_dwarf
    if args.system_type:
       core.set_target_platform(args.system_type)
+   if args.tool_ar:
+      core.target_platform.set_tool(comk.tool.Archiver, args.tool_ar)
    if args.tool_cxx:
       core.target_platform.set_tool(comk.tool.CxxCompiler, args.tool_cxx)
       if not args.tool_ld:
@@ -92,12 +115,44 @@ def main(args):
    if args.command is comk.argparser.Command.BUILD:
       if args.jobs:
          core.job_runner.running_jobs_max = args.jobs
+      if args.workers:
+         worker_pool = comk.distcompile.WorkerPool(core.log, args.workers)
+         # Only use workers whose compiler matches the local one.
+         cxx = core.target_platform.get_tool(comk.tool.CxxCompiler)
+         if worker_pool.probe(cxx.file_path):
+            core.job_runner.worker_pool = worker_pool
+      if args.remote_cache:
+         remote_cache = comk.remotecache.RemoteCache(
+            core.log, args.remote_cache, args.remote_cache_mode, args.remote_cache_timeout
+         )
+      else:
+         remote_cache = None
+      if args.compile_cache:
+         core.compile_cache = comk.compilecache.CompileCache(
+            core.log, os.path.join(core.shared_dir, core.COMPILE_CACHE_DIR), args.compile_cache_size,
+            remote_cache
+         )
       core.force_build = args.force_build
       core.force_test = args.force_test
       core.keep_going = args.keep_going
+      core.log.build_log_size_max = args.log_size_max
+      core.log.compress_build_logs = args.log_compress
+      core.log.output_sync = args.output_sync
+      if args.test_cache:
+         core.test_cache = comk.testcache.TestResultCache(
+            core.log, os.path.join(core.shared_dir, core.TEST_CACHE_DIR), remote_cache
+         )
+      if args.plan:
+         core.dry_run = True
+         core.build_plan = comk.plan.BuildPlan(core)
 
       core.prepare_external_dependencies(update=args.update_deps)
 
+      if core.pgo:
+         # Run the training targets to collect the profile data used to optimize the targets built below.
+         if not core.train_pgo_profile(args.project, pgo_instr_output_dir, args.pgo_train):
+            return 1
+
       # If any targets were specified, only a subset of the targets should be built; otherwise all named
       # targets will be built.
       targets = []
@@ -111,7 +166,17 @@ def main(args):
       # Build the selected targets.
       all_succeeded = core.build_targets(targets)
 
-      core.log.test_summary()
+      if not core.dry_run and (args.log_prune_age is not None or args.log_prune_size is not None):
+         if args.log_prune_age is None:
+            age_max = None
+         else:
+            age_max = args.log_prune_age * 24 * 60 * 60
+         core.prune_build_logs(age_max, args.log_prune_size)
+
+      if core.build_plan:
+         core.build_plan.write_json(sys.stdout)
+      else:
+         core.log.test_summary()
       return 0 if all_succeeded else 1
    elif args.command is comk.argparser.Command.CLEAN:
       core.clean()
@@ -129,7 +194,24 @@ def main(args):
          os.execve(args.exec_exe, exec_args, env)
          return 0
    elif args.command is comk.argparser.Command.QUERY:
-      if args.query_exec_env:
+      if args.query_build_log:
+         # Accept a target name or file path, falling back to a path to a log.
+         target = core.get_named_target(args.query_build_log, None)
+         if not target:
+            target = core.get_file_target(os.path.normpath(args.query_build_log), None)
+         if isinstance(target, comk.target.FileTarget):
+            build_log_path = target.build_log_path
+         else:
+            build_log_path = args.query_build_log
+         build_log = comk.logging.read_build_log(build_log_path)
+         if build_log is None:
+            if target:
+               # The target’s jobs didn’t output anything.
+               return 0
+            sys.stderr.write('error: no build log found at {}\n'.format(build_log_path))
+            return 1
+         getattr(sys.stdout, 'buffer', sys.stdout).write(build_log)
+      elif args.query_exec_env:
          core.prepare_external_dependencies()
          for name, value in core.get_exec_environ(dict()).items():
             print('{}={}'.format(name, value))
@@ -142,8 +142,8 @@ class Parser(object):
       'str'      : (yaml.Kind.SCALAR,   lambda yp, s: s),
       'timestamp': (yaml.Kind.SCALAR,   lambda yp, s: yp._construct_builtin_tag(_SCALAR_TIMESTAMP, 'timestamp', s)),
    }
-   # Matches a comment.
-   _comment_re = re.compile(r'[\t ]*#.*$')
+   # Matches a comment. A “#” only starts a comment if it’s at the start of a line or preceded by whitespace.
+   _comment_re = re.compile(r'(?:^|[\t ]+)#.*$')
    # Matches a document start mark.
    _doc_start_re = re.compile(r'^---(?: +|$)')
    # Matches trailing horizontal whitespace.
@@ -909,6 +909,12 @@ class QuotedStringTest(unittest.TestCase):
          "a "
       ''')), 'a ')
 
+      self.assertEqual(yp.parse_string(textwrap.dedent('''
+         %YAML 1.2
+         ---
+         "a#b"
+      ''')), 'a#b')
+
       self.assertRaises(yp.SyntaxError, yp.parse_string, textwrap.dedent('''
          %YAML 1.2
          ---
@@ -1193,6 +1199,18 @@ class StringTest(unittest.TestCase):
          b
       ''')), 'a b')
 
+      self.assertEqual(yp.parse_string(textwrap.dedent('''
+         %YAML 1.2
+         ---
+         a#b
+      ''')), 'a#b')
+
+      self.assertEqual(yp.parse_string(textwrap.dedent('''
+         %YAML 1.2
+         ---
+         a #b
+      ''')), 'a')
+
 class TagKindValidationTest(unittest.TestCase):
    def runTest(self):
       class TagKindValidationTestParser(yp.Parser):
@@ -19,11 +19,13 @@
 
 """Runs Complemake through a series of test projects."""
 
+import json
 import os
 import tempfile
 import platform
 import shutil
 import subprocess
+import sys
 import unittest
 
 
@@ -50,6 +52,16 @@ class ComplemakeTest(unittest.TestCase):
       need_shell = platform.system() == 'Windows'
       return subprocess.call(self.complemake_args(*args), cwd=self.project_path, shell=need_shell)
 
+   def run_complemake_output(self, *args):
+      need_shell = platform.system() == 'Windows'
+      return subprocess.check_output(self.complemake_args(*args), cwd=self.project_path, shell=need_shell)
+
+   def run_complemake_log(self, *args):
+      need_shell = platform.system() == 'Windows'
+      return subprocess.check_output(
+         self.complemake_args(*args), cwd=self.project_path, shell=need_shell, stderr=subprocess.STDOUT
+      ).decode('utf-8')
+
    def run_git(self, cwd, *args):
       all_args = ['git']
       all_args.extend(args)
@@ -65,6 +77,44 @@ class ComplemakeTest(unittest.TestCase):
 
 ##############################################################################################################
 
+class DeepChainTest(ComplemakeTest):
+   # Longer than the recursion limit, so building the chain recursively would overflow the stack.
+   chain_length = sys.getrecursionlimit() + 100
+
+   def setUp(self):
+      # Generate a project with a chain of dynamic libraries, each one linked to the previous one.
+      self.project_path = tempfile.mkdtemp()
+      os.mkdir(os.path.join(self.project_path, 'src'))
+      with open(os.path.join(self.project_path, 'chain.comk'), 'w') as project_file:
+         project_file.write('%YAML 1.2\n--- !complemake/project\ntargets:\n')
+         for i in range(self.chain_length):
+            project_file.write(
+               '   - !complemake/target/dynlib\n      name: chain{0}\n      sources:\n' \
+               '      -  src/chain{0}.cxx\n'.format(i)
+            )
+            if i > 0:
+               project_file.write('      libraries:\n      -  chain{}\n'.format(i - 1))
+            with open(os.path.join(self.project_path, 'src', 'chain{}.cxx'.format(i)), 'w'):
+               pass
+      ComplemakeTest.setUp(self)
+
+   def tearDown(self):
+      ComplemakeTest.tearDown(self)
+      shutil.rmtree(self.project_path)
+
+   def runTest(self):
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      self.assertEqual(len(plan['jobs']), self.chain_length * 2)
+      # Each library must be linked after the previous one.
+      link_jobs = [job for job in plan['jobs'] if job['tool'] == 'LINK']
+      self.assertEqual(
+         [job['target'] for job in link_jobs], ['chain{}'.format(i) for i in range(self.chain_length)]
+      )
+      for prev_link_job, link_job in zip(link_jobs, link_jobs[1:]):
+         self.assertIn(prev_link_job['id'], link_job['depends'])
+
+##############################################################################################################
+
 class Exe1Test(ComplemakeTest):
    project_path = 'test/exe1'
 
@@ -74,6 +124,233 @@ class Exe1Test(ComplemakeTest):
 
 ##############################################################################################################
 
+class Exe1PlanTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      plan = json.loads(self.run_complemake_output('build', '--jobs', '2', '--plan', 'json').decode('utf-8'))
+      self.assertEqual([job['tool'] for job in plan['jobs']], ['C++', 'LINK'])
+      self.assertEqual([job['depends'] for job in plan['jobs']], [[], [0]])
+      self.assertEqual(plan['jobs_max'], 2)
+      self.assertEqual(plan['unknown_durations'], 2)
+      # A dry run must not have built anything.
+      self.assertFalse(os.path.exists(os.path.join(self.project_path, 'bin/exe1')))
+
+      # After a real build, the plan for a forced rebuild should know how long each job takes.
+      self.assertEqual(self.run_complemake('build'), 0)
+      plan = json.loads(self.run_complemake_output('build', '--force', '--plan', 'json').decode('utf-8'))
+      self.assertEqual(plan['unknown_durations'], 0)
+      self.assertTrue(all(job['reason'] == 'forced rebuild' for job in plan['jobs']))
+      self.assertEqual(
+         plan['critical_path'], round(sum(job['expected_duration'] for job in plan['jobs']), 3)
+      )
+
+##############################################################################################################
+
+class Exe1ReleaseTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      self.assertEqual(self.run_complemake('build'), 0)
+      self.assertEqual(self.run_complemake('-c', 'release', 'build'), 0)
+      self.assertTrue(os.path.exists(os.path.join(self.project_path, 'release/bin/exe1')))
+      self.assertEqual(self.run_complemake('-c', 'release', 'exec', 'release/bin/exe1'), 0)
+      # Building the release configuration must not have invalidated the debug build.
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      self.assertEqual(plan['jobs'], [])
+
+   def tearDown(self):
+      self.run_complemake('-c', 'release', 'clean')
+      shutil.rmtree(os.path.join(self.project_path, 'release'), ignore_errors=True)
+      ComplemakeTest.tearDown(self)
+
+##############################################################################################################
+
+class Exe1CompileCacheTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      self.assertEqual(self.run_complemake('build', '--compile-cache'), 0)
+      self.assertTrue(os.path.isdir(os.path.join(self._shared_dir, 'compile-cache')))
+      # After a clean, the object must be restored from the cache instead of being compiled again.
+      self.assertEqual(self.run_complemake('clean'), 0)
+      output = self.run_complemake_log('build', '--compile-cache')
+      self.assertIn('src/main.cxx', output)
+      self.assertNotIn('C++', output)
+      self.assertEqual(self.run_complemake('exec', 'bin/exe1'), 0)
+
+##############################################################################################################
+
+class Exe1RemoteCacheTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      need_shell = platform.system() == 'Windows'
+      server_dir = tempfile.mkdtemp()
+      server = subprocess.Popen(
+         [os.path.abspath('src/complemake-cache-server.py'), server_dir], stdout=subprocess.PIPE,
+         shell=need_shell
+      )
+      try:
+         url = server.stdout.readline().decode('utf-8').strip()
+         self.assertEqual(self.run_complemake('build', '--compile-cache', '--remote-cache', url), 0)
+         # Simulate another machine: without the local cache, the object must come from the remote one.
+         self.assertEqual(self.run_complemake('clean'), 0)
+         shutil.rmtree(self._shared_dir)
+         output = self.run_complemake_log('build', '--compile-cache', '--remote-cache', url)
+         self.assertIn('src/main.cxx', output)
+         self.assertNotIn('C++', output)
+         self.assertEqual(self.run_complemake('exec', 'bin/exe1'), 0)
+      finally:
+         server.terminate()
+         server.wait()
+         server.stdout.close()
+         shutil.rmtree(server_dir)
+
+      # With the server gone, the build must fall back to compiling locally.
+      self.assertEqual(self.run_complemake('clean'), 0)
+      shutil.rmtree(self._shared_dir)
+      output = self.run_complemake_log('build', '--compile-cache', '--remote-cache', url)
+      self.assertIn('unreachable', output)
+      self.assertIn('C++', output)
+
+      # Without any local cache to share, --remote-cache would have no effect, so it must be rejected.
+      with open(os.devnull, 'w') as devnull:
+         self.assertNotEqual(subprocess.call(
+            self.complemake_args('build', '--remote-cache', url), cwd=self.project_path, stderr=devnull
+         ), 0)
+
+##############################################################################################################
+
+class Exe1DistributedTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      need_shell = platform.system() == 'Windows'
+      workers = []
+      try:
+         for i in range(2):
+            workers.append(subprocess.Popen(
+               [os.path.abspath('src/complemake-worker.py'), '--jobs', '1'], stdout=subprocess.PIPE,
+               shell=need_shell
+            ))
+         worker_args = []
+         for worker in workers:
+            worker_args.extend(('--worker', worker.stdout.readline().decode('utf-8').strip()))
+         output = self.run_complemake_log('-v', 'build', '--jobs', '1', *worker_args)
+         self.assertIn('[worker 127.0.0.1:', output)
+         # The workers must have accepted every job.
+         self.assertNotIn('unavailable', output)
+         self.assertEqual(self.run_complemake('exec', 'bin/exe1'), 0)
+      finally:
+         for worker in workers:
+            worker.terminate()
+            worker.wait()
+            worker.stdout.close()
+
+      # With the workers gone, the build must fall back to compiling locally.
+      self.assertEqual(self.run_complemake('clean'), 0)
+      output = self.run_complemake_log('-v', 'build', *worker_args)
+      self.assertIn('unavailable', output)
+      self.assertNotIn('[worker ', output)
+      self.assertEqual(self.run_complemake('exec', 'bin/exe1'), 0)
+
+##############################################################################################################
+
+class Exe1DistributedObjectTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      need_shell = platform.system() == 'Windows'
+      worker = subprocess.Popen(
+         [os.path.abspath('src/complemake-worker.py'), '--jobs', '1'], stdout=subprocess.PIPE,
+         shell=need_shell
+      )
+      try:
+         worker_args = ('--worker', worker.stdout.readline().decode('utf-8').strip())
+         plan = json.loads(
+            self.run_complemake_output('build', '--plan', 'json', *worker_args).decode('utf-8')
+         )
+         output = self.run_complemake_log('-v', 'build', *worker_args)
+         self.assertIn('[worker 127.0.0.1:', output)
+      finally:
+         worker.terminate()
+         worker.wait()
+         worker.stdout.close()
+
+      # Compile the source locally with the same command line, just to a different object file.
+      args, = [job['args'] for job in plan['jobs'] if job['tool'] == 'C++']
+      self.assertEqual(args[-2], '-oint/src/main.cxx.o')
+      args[-2] = '-oint/src/main.cxx.local.o'
+      subprocess.check_call(args, cwd=self.project_path)
+      # The worker must have generated the same object, debug info included.
+      with open(os.path.join(self.project_path, 'int/src/main.cxx.o'), 'rb') as object_file:
+         remote_object = object_file.read()
+      with open(os.path.join(self.project_path, 'int/src/main.cxx.local.o'), 'rb') as object_file:
+         self.assertEqual(object_file.read(), remote_object)
+
+##############################################################################################################
+
+class Exe1ReproducibleTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      # Build three copies of the project in different directories: the first two are compiled, the first one
+      # also filling the compile cache, and the third one should find its object in the cache.
+      copies_dir = tempfile.mkdtemp()
+      try:
+         outputs = []
+         object_contents = []
+         for i, args in enumerate((('--compile-cache', ), (), ('--compile-cache', ))):
+            copy_path = os.path.join(copies_dir, 'copy{}'.format(i), 'exe1')
+            shutil.copytree(self.project_path, copy_path)
+            outputs.append(subprocess.check_output(
+               self.complemake_args('--reproducible', 'build', *args), cwd=copy_path, stderr=subprocess.STDOUT
+            ).decode('utf-8'))
+            with open(os.path.join(copy_path, 'int/src/main.cxx.o'), 'rb') as object_file:
+               object_contents.append(object_file.read())
+         for output in outputs[:2]:
+            self.assertIn('C++', output)
+            self.assertNotIn('CACHED', output)
+         # The objects compiled in different directories must not embed their location, and therefore be
+         # identical.
+         self.assertEqual(object_contents[0], object_contents[1])
+         self.assertNotIn(copies_dir.encode('utf-8'), object_contents[0])
+         # The compile cache must be able to share objects between copies of the project.
+         self.assertIn('CACHED', outputs[2])
+         self.assertNotIn('C++', outputs[2])
+         self.assertEqual(object_contents[2], object_contents[0])
+      finally:
+         shutil.rmtree(copies_dir)
+
+##############################################################################################################
+
+class Exe1LtoTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      self.assertEqual(self.run_complemake('-c', 'release', '--lto', 'build'), 0)
+      self.assertTrue(os.path.exists(os.path.join(self.project_path, 'release-lto/bin/exe1')))
+      self.assertEqual(self.run_complemake('-c', 'release', '--lto', 'exec', 'release-lto/bin/exe1'), 0)
+
+   def tearDown(self):
+      self.run_complemake('-c', 'release', '--lto', 'clean')
+      shutil.rmtree(os.path.join(self.project_path, 'release-lto'), ignore_errors=True)
+      ComplemakeTest.tearDown(self)
+
+##############################################################################################################
+
+class Exe1SplitDwarfTest(ComplemakeTest):
+   project_path = 'test/exe1'
+
+   def runTest(self):
+      self.assertEqual(self.run_complemake('--split-dwarf', 'build'), 0)
+      # Most of the debug info must have been left out of the object file.
+      self.assertTrue(os.path.exists(os.path.join(self.project_path, 'int/src/main.cxx.dwo')))
+      self.assertEqual(self.run_complemake('exec', 'bin/exe1'), 0)
+
+##############################################################################################################
+
 class Exe2Test(ComplemakeTest):
    project_path = 'test/exe2'
    project_file = 'exe2.comk'
@@ -108,5 +385,119 @@ class Exe2WithGitDepTest(ComplemakeTest):
 
 ##############################################################################################################
 
+class Pch1Test(ComplemakeTest):
+   project_path = 'test/pch1'
+
+   def runTest(self):
+      self.assertEqual(self.run_complemake('build'), 0)
+      self.assertEqual(self.run_complemake('exec', 'bin/pch1'), 0)
+
+      # Changing the header must cause the precompiled header and every object file to be rebuilt.
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      self.assertEqual(plan['jobs'], [])
+      header_path = os.path.join(self.project_path, 'include/pch1.hxx')
+      os.utime(header_path, (os.path.getatime(header_path), os.path.getmtime(header_path) + 10))
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      self.assertEqual([job['tool'] for job in plan['jobs']], ['C++', 'C++', 'C++', 'LINK'])
+
+##############################################################################################################
+
+class Pgo1Test(ComplemakeTest):
+   project_path = 'test/pgo1'
+
+   def runTest(self):
+      pgo_args = ('-c', 'release', '--pgo-train', 'pgo1-train')
+      self.assertEqual(self.run_complemake(*(pgo_args + ('build', ))), 0)
+      # The training target must have generated profile data, used to build the optimized outputs.
+      self.assertTrue(os.listdir(os.path.join(self.project_path, 'release-pgo-instr/int/pgo-profile')))
+      self.assertTrue(os.path.exists(os.path.join(self.project_path, 'release-pgo/bin/test/pgo1-train')))
+      # pgo1-untrained has no profile data, which must not prevent the stored metadata from being loaded.
+      self.assertTrue(os.path.exists(os.path.join(self.project_path, 'release-pgo/bin/pgo1-untrained')))
+      self.assertEqual(self.run_complemake(*(pgo_args + ('build', ))), 0)
+      # Since neither the instrumented binaries nor the profile data changed, nothing should be rebuilt.
+      plan = json.loads(self.run_complemake_output(*(pgo_args + ('build', '--plan', 'json'))).decode('utf-8'))
+      self.assertEqual(plan['jobs'], [])
+
+   def tearDown(self):
+      for dir in 'release-pgo', 'release-pgo-instr':
+         shutil.rmtree(os.path.join(self.project_path, dir), ignore_errors=True)
+      ComplemakeTest.tearDown(self)
+
+##############################################################################################################
+
+class Pgo1TestCacheTest(ComplemakeTest):
+   project_path = 'test/pgo1'
+
+   def runTest(self):
+      self.assertIn('TEST', self.run_complemake_log('build', '--test-cache'))
+      # After a clean, the relinked test is identical, so its results must be replayed instead of running it.
+      self.assertEqual(self.run_complemake('clean'), 0)
+      output = self.run_complemake_log('build', '--test-cache')
+      self.assertIn('CACHED', output)
+      self.assertNotIn('TEST', output)
+      # --force-test must bypass the cache.
+      self.assertEqual(self.run_complemake('clean'), 0)
+      self.assertIn('TEST', self.run_complemake_log('build', '--test-cache', '--force-test'))
+
+##############################################################################################################
+
+class Staticlib1Test(ComplemakeTest):
+   project_path = 'test/staticlib1'
+
+   def runTest(self):
+      self.assertEqual(self.run_complemake('build'), 0)
+      self.assertTrue(os.path.exists(os.path.join(self.project_path, 'lib/libstaticlib1.a')))
+      self.assertEqual(self.run_complemake('exec', 'bin/staticlib1-client'), 0)
+
+      # Changing a source of the library must cause the archive and its client to be rebuilt.
+      source_path = os.path.join(self.project_path, 'src/add.cxx')
+      os.utime(source_path, (os.path.getatime(source_path), os.path.getmtime(source_path) + 10))
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      self.assertEqual([job['tool'] for job in plan['jobs']], ['C++', 'AR', 'LINK'])
+
+##############################################################################################################
+
+class Staticlib1CompilerArgsTest(ComplemakeTest):
+   project_path = 'test/staticlib1'
+
+   def runTest(self):
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      args_by_object = dict((job['target'], job['args']) for job in plan['jobs'] if job['tool'] == 'C++')
+      sources = ('src/add.cxx', 'src/mul.cxx', 'src/main.cxx')
+      objects = tuple('int/{}.o'.format(source) for source in sources)
+      self.assertEqual(sorted(args_by_object.keys()), sorted(objects))
+      args_templates = {}
+      for source, object in zip(sources, objects):
+         args = args_by_object[object]
+         # Each object gets its own input and output paths, and no other source or object.
+         self.assertEqual(args[-2:], ['-o' + object, source])
+         self.assertFalse(set(args[:-2]) & set(sources + objects + tuple('-o' + o for o in objects)))
+         args_templates[object] = args[:-2]
+      # Both objects of the library share the same command line template.
+      self.assertEqual(args_templates['int/src/add.cxx.o'], args_templates['int/src/mul.cxx.o'])
+
+##############################################################################################################
+
+class Unity1Test(ComplemakeTest):
+   project_path = 'test/unity1'
+
+   def runTest(self):
+      plan = json.loads(self.run_complemake_output('build', '--plan', 'json').decode('utf-8'))
+      # One object for the excluded source, two generated sources with their objects, and the executable.
+      self.assertEqual(
+         sorted(job['tool'] for job in plan['jobs']), ['C++', 'C++', 'C++', 'GEN', 'GEN', 'LINK']
+      )
+
+      self.assertEqual(self.run_complemake('build'), 0)
+      self.assertEqual(self.run_complemake('exec', 'bin/unity1'), 0)
+
+      # Generated sources must not be rewritten unless the list of sources changes.
+      unity_source_path = os.path.join(self.project_path, 'int/unity/unity1-1.cxx')
+      os.utime(unity_source_path, (0, 0))
+      self.assertEqual(self.run_complemake('build', '--force'), 0)
+      self.assertEqual(os.path.getmtime(unity_source_path), 0)
+
+##############################################################################################################
+
 if __name__ == '__main__':
    unittest.main()
@@ -0,0 +1,28 @@
+/* -*- coding: utf-8; mode: c++; tab-width: 3; indent-tabs-mode: nil -*-
+
+Copyright 2017 Raffaello D. Di Napoli
+
+This file is part of Complemake.
+
+Complemake is free software: you can redistribute it and/or modify it under the terms of the GNU General
+Public License as published by the Free Software Foundation, either version 3 of the License, or (at your
+option) any later version.
+
+Complemake is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License along with Complemake. If not, see
+<http://www.gnu.org/licenses/>.
+------------------------------------------------------------------------------------------------------------*/
+
+
+#ifndef PCH1_HXX
+#define PCH1_HXX
+
+#include <string>
+#include <vector>
+
+int pch1_count_words(std::string const & s);
+
+#endif //ifndef PCH1_HXX